@@ -0,0 +1,244 @@
+"""
+ASGI front end shared by the Flask APIs
+
+Native coroutine handlers serve the requests that would otherwise hold a
+thread while waiting; every other request runs in the Flask app on a
+thread pool. The images copy this module next to their API; outside Docker
+put this directory on PYTHONPATH.
+"""
+
+import asyncio
+import io
+import json
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from werkzeug.wsgi import FileWrapper
+
+ASGI_FILE_CHUNK = 1024 * 1024  # read size for files sent through the ASGI front end
+
+
+class AsgiRequest:
+    """The parts of an ASGI HTTP request the native handlers need"""
+    def __init__(self, scope, body):
+        self.scope = scope
+        self.body = body
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {}
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin-1').lower()
+            value = value.decode('latin-1')
+            self.headers[name] = f"{self.headers[name]},{value}" if name in self.headers else value
+        self.args = {key: values[-1] for key, values in
+                     parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+
+    def get_json(self):
+        """Return the decoded JSON body, or None"""
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+    @property
+    def client(self):
+        """Fair scheduling key, as current_client() computes it under Flask"""
+        client = self.scope.get('client')
+        return self.headers.get('x-client-id') or (client[0] if client else None) or 'unknown'
+
+
+class AsgiFileWrapper(FileWrapper):
+    """wsgi.file_wrapper for the ASGI front end: large reads, and the path for pathsend"""
+    def __init__(self, file, buffer_size=ASGI_FILE_CHUNK):
+        super().__init__(file, max(buffer_size, ASGI_FILE_CHUNK))
+
+
+class AsgiServer:
+    """
+    ASGI front end for a Flask app
+
+    Only the handlers registered with route() run as coroutines, so only
+    they wait on subprocesses and timers without holding a thread. Every
+    other request is passed to the Flask app on a pool of `threads`
+    threads, so endpoint contracts are unchanged, but a view still holds
+    its thread for as long as it waits on a blocking call.
+
+    Args:
+        wsgi_app (Flask): App serving every request the native handlers do not take
+        threads (int): Threads running Flask views
+        on_startup (callable): Called once the event loop and thread pools are up
+        executors (dict): Extra thread pools to start, name -> max workers;
+            available in self.executors after startup
+    """
+    def __init__(self, wsgi_app, threads, on_startup=None, executors=None):
+        self.wsgi_app = wsgi_app
+        self.threads = threads
+        self.on_startup = on_startup
+        self.executor_sizes = executors or {}
+        self.executor = None
+        self.executors = {}
+        self.loop = None
+        self._routes = []  # (method, path regex, handler)
+
+    def route(self, method, pattern):
+        """Register a native handler; it returns False to defer to Flask"""
+        def decorator(handler):
+            self._routes.append((method, re.compile(f'^{pattern}$'), handler))
+            return handler
+        return decorator
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body.extend(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+
+        request = AsgiRequest(scope, bytes(body))
+        for method, pattern, handler in self._routes:
+            match = pattern.match(request.path)
+            if match and method == request.method:
+                if await handler(request, receive, send, **match.groupdict()) is not False:
+                    return
+                break
+        await self._call_wsgi(request, send)
+
+    async def _lifespan(self, receive, send):
+        """Set up the thread pools and background services on startup"""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.loop = asyncio.get_running_loop()
+                self.executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='asgi')
+                self.loop.set_default_executor(self.executor)
+                for name, workers in self.executor_sizes.items():
+                    self.executors[name] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+                if self.on_startup is not None:
+                    self.on_startup()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                for executor in [self.executor, *self.executors.values()]:
+                    if executor is not None:
+                        executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _environ(self, request):
+        """Build a WSGI environ for a buffered request"""
+        scope = request.scope
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': request.method,
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': request.path.encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'REMOTE_ADDR': client[0],
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(request.body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            'wsgi.file_wrapper': AsgiFileWrapper,
+        }
+        for name, value in request.headers.items():
+            key = name.upper().replace('-', '_')
+            if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                key = f'HTTP_{key}'
+            environ[key] = value
+        return environ
+
+    async def _call_wsgi(self, request, send):
+        """Run the Flask app for one request on the thread pool"""
+        loop = asyncio.get_running_loop()
+        environ = self._environ(request)
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                  for name, value in headers]
+            return lambda data: None
+
+        def run():
+            # Iterate the response on the worker thread; chunks are handed to the loop
+            result = self.wsgi_app(environ, start_response)
+            try:
+                if isinstance(result, AsgiFileWrapper) and 'http.response.pathsend' in \
+                        request.scope.get('extensions', {}) and isinstance(getattr(result.file, 'name', None), str):
+                    # A whole file from send_file(): let the server send it without reading it here
+                    asyncio.run_coroutine_threadsafe(send({
+                        'type': 'http.response.start',
+                        'status': started['status'],
+                        'headers': started['headers']
+                    }), loop).result()
+                    asyncio.run_coroutine_threadsafe(send({
+                        'type': 'http.response.pathsend',
+                        'path': os.path.abspath(result.file.name)
+                    }), loop).result()
+                    return
+                sent_start = False
+                for chunk in result:
+                    if not sent_start:
+                        asyncio.run_coroutine_threadsafe(send({
+                            'type': 'http.response.start',
+                            'status': started['status'],
+                            'headers': started['headers']
+                        }), loop).result()
+                        sent_start = True
+                    if chunk:
+                        asyncio.run_coroutine_threadsafe(send({
+                            'type': 'http.response.body', 'body': chunk, 'more_body': True
+                        }), loop).result()
+                if not sent_start:
+                    asyncio.run_coroutine_threadsafe(send({
+                        'type': 'http.response.start',
+                        'status': started['status'],
+                        'headers': started['headers']
+                    }), loop).result()
+                asyncio.run_coroutine_threadsafe(send({
+                    'type': 'http.response.body', 'body': b''
+                }), loop).result()
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+
+        await loop.run_in_executor(self.executor, run)
+
+    async def send_json(self, request, send, payload, status, extra_headers=None):
+        """Send a JSON response from a native handler, serialized exactly like jsonify()"""
+        body = self.wsgi_app.json.response(payload).get_data()
+        headers = dict(extra_headers or {}, **{'Content-Length': len(body)})
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': asgi_response_headers(request, 'application/json', headers)
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+
+def asgi_response_headers(request, content_type, extra=None):
+    """Response headers for native handlers, including what flask-cors would add"""
+    headers = [(b'content-type', content_type.encode('latin-1'))]
+    if 'origin' in request.headers:
+        headers.append((b'access-control-allow-origin', b'*'))
+    for name, value in (extra or {}).items():
+        headers.append((name.lower().encode('latin-1'), str(value).encode('latin-1')))
+    return headers
@@ -4,15 +4,27 @@ Forensic Imaging API
 Provides REST endpoints for creating and verifying forensic disk images
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import subprocess
+import asyncio
+import contextlib
 import hashlib
+import json
+import mmap
 import os
+import re
+import shutil
+import sqlite3
+import stat
 import threading
+import time
 import uuid
 import logging
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+from asgi_server import AsgiServer, asgi_response_headers
 
 # Configure logging
 logging.basicConfig(
@@ -26,27 +38,136 @@ app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
 # Configuration
+SERVER_MODE = os.environ.get('API_SERVER', 'flask')  # 'flask' (development server) or 'asgi'
 EVIDENCE_DIR = '/evidence'
 OUTPUT_DIR = '/output'
-
-# Job tracking
+IMAGING_TIMEOUT = 7200  # seconds an imaging command may run
+ASGI_THREADS = 64  # threads running Flask views in ASGI mode
+HASH_WORKERS = os.cpu_count() or 2  # threads hashing files in ASGI mode
+HASH_ALGORITHMS = ('md5', 'sha1', 'sha256', 'sha512')  # digests the hashing engine can compute
+DEFAULT_HASH_ALGORITHMS = ('md5', 'sha1', 'sha256')  # digests computed when a request names none
+HASH_CHUNK_SIZE = 8 * 1024 * 1024  # bytes read per call; a multiple of the page size
+EWF_HASH_ALGORITHMS = ('md5', 'sha1', 'sha256')  # digests ewfacquire can compute while acquiring
+HASH_LOG_DIR = os.path.join(OUTPUT_DIR, 'hashlogs')  # per-job dcfldd hash logs
+DCFLDD_HASH_WINDOW = '1G'  # bytes per dcfldd hash window
+DCFLDD_BLOCK_SIZE = 4 * 1024 * 1024  # dcfldd bs=, in bytes
+DCFLDD_STATUS_INTERVAL = 16  # blocks between dcfldd progress lines
+MAX_IMAGING_JOBS = int(os.environ.get('IMAGING_MAX_JOBS', 4))  # imaging jobs running at once
+MAX_JOBS_PER_SOURCE = int(os.environ.get('IMAGING_MAX_PER_SOURCE', 1))  # jobs reading one physical device
+MAX_JOBS_PER_DESTINATION = int(os.environ.get('IMAGING_MAX_PER_DESTINATION', 2))  # jobs writing one filesystem
+JOB_DB_PATH = os.path.join(OUTPUT_DIR, 'imaging_jobs.db')
+JOB_RETENTION_DAYS = float(os.environ.get('IMAGING_JOB_RETENTION_DAYS', 90))  # days finished jobs are kept
+JOB_PAGE_SIZE = 50  # default jobs per /jobs page
+MAX_JOB_PAGE_SIZE = 500  # Maximum jobs per /jobs page
+EVENT_KEEPALIVE = 15  # seconds between keep-alive comments on /job-events
+DIGEST_THREADS = max(len(HASH_ALGORITHMS), os.cpu_count() or 2)  # threads updating digests
+
+# Job tracking; only jobs that are queued, running or being verified are kept in memory
 imaging_jobs = {}
 job_lock = threading.Lock()
 
+# Digest updates run here; hashlib releases the GIL while hashing large buffers
+digest_executor = ThreadPoolExecutor(max_workers=DIGEST_THREADS, thread_name_prefix='digest')
+
 
 class ImagingJob:
     """Represents a forensic imaging job"""
-    def __init__(self, job_id, source, destination, method):
+    def __init__(self, job_id, source, destination, method, hash_algorithms=DEFAULT_HASH_ALGORITHMS,
+                 verify=False, priority=0):
         self.job_id = job_id
         self.source = source
         self.destination = destination
         self.method = method
+        self.hash_algorithms = hash_algorithms
+        self.verify = verify
+        # ewfacquire appends the segment file extension to the target
+        self.image_path = f"{destination}.E01" if method == 'ewf' else destination
+        self.hash_log_dir = os.path.join(HASH_LOG_DIR, job_id)
+        self.priority = priority
+        self.source_device = source_device_key(source)
+        self.destination_filesystem = filesystem_key(destination)
+        self.queued_at = datetime.now().isoformat()
+        self._queued_clock = time.monotonic()
+        self.sequence = None  # queue order, set by the scheduler
+        self.wait_seconds = None  # set when the job leaves the queue
+        self.cancel_requested = False
+        self.kill = None  # stops the imaging subprocess while it runs
         self.status = 'pending'
         self.progress = 0
         self.error = None
         self.started_at = None
         self.completed_at = None
         self.hash_value = None
+        self.hashes = {}
+        self.hash_windows = []
+        self.verification = None
+        self.total_bytes = None
+        self.bytes_copied = 0
+        self.current_rate = None  # bytes per second between the last two progress updates
+        self.average_rate = None  # bytes per second since the job started
+        self.eta_seconds = None
+        self._clock_started = None
+        self._last_sample = None  # (monotonic time, bytes copied)
+        # Notified whenever progress or status changes; version counts the changes
+        self.changed = threading.Condition()
+        self.version = 0
+        self._subscribers = []  # (loop, asyncio.Event) set on every change, for coroutines
+
+    def start(self):
+        """Mark the job running and start measuring throughput"""
+        self.wait_seconds = time.monotonic() - self._queued_clock
+        self.status = 'running'
+        self.started_at = datetime.now().isoformat()
+        self.total_bytes = source_size(self.source)
+        self._clock_started = time.monotonic()
+        self._last_sample = (self._clock_started, 0)
+        self.touch()
+
+    def update_progress(self, copied):
+        """
+        Record the bytes copied so far and derive percent, throughput and ETA
+
+        Args:
+            copied (int): Bytes the imaging tool reports as copied
+        """
+        if self.total_bytes:
+            # dcfldd counts whole blocks, including the padded last one
+            copied = min(copied, self.total_bytes)
+        now = time.monotonic()
+        last_time, last_copied = self._last_sample
+        if copied == last_copied:
+            return  # the same progress line seen again
+        if now > last_time and copied >= last_copied:
+            self.current_rate = (copied - last_copied) / (now - last_time)
+        if now > self._clock_started:
+            self.average_rate = copied / (now - self._clock_started)
+        self._last_sample = (now, copied)
+        self.bytes_copied = copied
+
+        if self.total_bytes:
+            self.progress = min(99, int(copied * 100 / self.total_bytes))
+            if self.average_rate:
+                self.eta_seconds = max(0.0, (self.total_bytes - copied) / self.average_rate)
+        self.touch()
+
+    def touch(self):
+        """Wake up everything following this job's events"""
+        with self.changed:
+            self.version += 1
+            self.changed.notify_all()
+            subscribers = list(self._subscribers)
+        for loop, event in subscribers:
+            loop.call_soon_threadsafe(event.set)
+
+    def subscribe(self, event):
+        """Have touch() set an asyncio.Event of the running loop"""
+        with self.changed:
+            self._subscribers.append((asyncio.get_running_loop(), event))
+
+    def unsubscribe(self, event):
+        """Stop setting an event registered with subscribe()"""
+        with self.changed:
+            self._subscribers = [item for item in self._subscribers if item[1] is not event]
 
     def to_dict(self):
         """Convert job to dictionary for JSON response"""
@@ -60,9 +181,248 @@ class ImagingJob:
             'error': self.error,
             'started_at': self.started_at,
             'completed_at': self.completed_at,
-            'hash': self.hash_value
+            'hash': self.hash_value,
+            'hash_algorithms': list(self.hash_algorithms),
+            'verify': self.verify,
+            'hashes': self.hashes,
+            'hash_windows': self.hash_windows,
+            'hash_log': self.hash_log_dir if self.method == 'dcfldd' else None,
+            'image_path': self.image_path,
+            'verification': self.verification,
+            'bytes_copied': self.bytes_copied,
+            'total_bytes': self.total_bytes,
+            'percent': round(self.bytes_copied * 100 / self.total_bytes, 2) if self.total_bytes else None,
+            'current_mb_per_second': round(self.current_rate / 1e6, 2) if self.current_rate is not None else None,
+            'average_mb_per_second': round(self.average_rate / 1e6, 2) if self.average_rate is not None else None,
+            'eta_seconds': round(self.eta_seconds) if self.eta_seconds is not None else None,
+            'priority': self.priority,
+            'source_device': self.source_device,
+            'destination_filesystem': self.destination_filesystem,
+            'queued_at': self.queued_at,
+            'queue_position': imaging_scheduler.position(self),
+            'wait_seconds': round(self.wait_seconds if self.wait_seconds is not None
+                                  else time.monotonic() - self._queued_clock, 3)
         }
 
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a finished job from its to_dict() form, as kept in the job store"""
+        job = cls(data['job_id'], data['source'], data['destination'], data['method'],
+                  tuple(data['hash_algorithms']), data['verify'], data['priority'])
+        for name in ('status', 'progress', 'error', 'started_at', 'completed_at', 'hashes', 'hash_windows',
+                     'verification', 'bytes_copied', 'total_bytes', 'source_device',
+                     'destination_filesystem', 'queued_at', 'wait_seconds'):
+            setattr(job, name, data[name])
+        job.hash_value = data['hash']
+        if data['current_mb_per_second'] is not None:
+            job.current_rate = data['current_mb_per_second'] * 1e6
+        if data['average_mb_per_second'] is not None:
+            job.average_rate = data['average_mb_per_second'] * 1e6
+        return job
+
+    def is_settled(self):
+        """Return whether the job and any verify pass have finished"""
+        return self.status in ('completed', 'failed', 'cancelled', 'interrupted') and \
+            not (self.verification and self.verification['status'] in ('pending', 'running'))
+
+
+def _block_device_name(device):
+    """Return the whole-disk name of a block device number, or major:minor if sysfs has none"""
+    major, minor = os.major(device), os.minor(device)
+    sys_path = os.path.realpath(f'/sys/dev/block/{major}:{minor}')
+    if not os.path.isdir(sys_path):
+        return f'{major}:{minor}'
+    # A partition's sysfs directory sits inside its disk's
+    if os.path.exists(os.path.join(sys_path, 'partition')):
+        sys_path = os.path.dirname(sys_path)
+    return os.path.basename(sys_path)
+
+
+def source_device_key(path):
+    """
+    Name the physical device an imaging source is read from
+
+    Partitions map to their disk and regular files to the disk holding
+    their filesystem, so jobs reading the same spindle share one limit.
+
+    Args:
+        path (str): Source device or file path
+
+    Returns:
+        str: Device name such as 'sda', or major:minor
+    """
+    try:
+        info = os.stat(path)
+    except OSError:
+        return path
+    return _block_device_name(info.st_rdev if stat.S_ISBLK(info.st_mode) else info.st_dev)
+
+
+def filesystem_key(path):
+    """
+    Name the filesystem a destination path will be written to
+
+    Args:
+        path (str): Destination file path, which need not exist yet
+
+    Returns:
+        str: major:minor of the filesystem's device
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    while not os.path.exists(directory):
+        directory = os.path.dirname(directory)
+    device = os.stat(directory).st_dev
+    return f'{os.major(device)}:{os.minor(device)}'
+
+
+def source_size(path):
+    """
+    Return the size of an imaging source in bytes
+
+    Seeking to the end works for block devices as well as regular files.
+
+    Args:
+        path (str): Source device or file path
+
+    Returns:
+        int or None: Size, or None if it cannot be determined
+    """
+    try:
+        with open(path, 'rb') as f:
+            return f.seek(0, os.SEEK_END) or None
+    except OSError:
+        return None
+
+
+DCFLDD_PROGRESS = re.compile(r'(\d+) blocks \(\d+Mb\) written')
+EWF_PROGRESS = re.compile(r'acquired .*?\((\d+) bytes\)')
+
+
+class ProgressParser:
+    """
+    Incremental parser of an imaging tool's progress output
+
+    dcfldd reports "<n> blocks (<m>Mb) written." on stderr, rewriting the
+    line with carriage returns; ewfacquire reports "acquired <size>
+    (<n> bytes) of total ..." on stdout. Output is fed in whatever chunks
+    the pipe delivers and kept, since ewfacquire prints its digests on the
+    same stream.
+    """
+    def __init__(self, job):
+        self.job = job
+        self.pattern = DCFLDD_PROGRESS if job.method == 'dcfldd' else EWF_PROGRESS
+        self.chunks = []
+        self._partial = ''
+
+    def feed(self, data):
+        """Consume a chunk of output and update the job from every complete line"""
+        self.chunks.append(data)
+        lines = re.split(r'[\r\n]', self._partial + data.decode('utf-8', errors='replace'))
+        self._partial = lines[-1]
+        # Both patterns only match once the numbers are complete, so the unfinished line counts too
+        for line in reversed(lines):
+            match = self.pattern.search(line)
+            if match:
+                copied = int(match.group(1))
+                if self.job.method == 'dcfldd':
+                    copied *= DCFLDD_BLOCK_SIZE
+                self.job.update_progress(copied)
+                break
+
+    def output(self):
+        """Return everything fed so far as text"""
+        return b''.join(self.chunks).decode('utf-8', errors='replace')
+
+
+def parse_hash_algorithms(value):
+    """
+    Validate the digests named in a request
+
+    SHA-256 is always computed, since it is the hash jobs and /verify-image
+    have always reported.
+
+    Args:
+        value (list or None): Algorithm names; None selects DEFAULT_HASH_ALGORITHMS
+
+    Returns:
+        tuple: (algorithms, error_message); algorithms is None on error
+    """
+    if value is None:
+        return DEFAULT_HASH_ALGORITHMS, None
+    if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+        return None, 'hash_algorithms must be a list of algorithm names'
+
+    requested = {name.lower().replace('-', '') for name in value}
+    unknown = requested.difference(HASH_ALGORITHMS)
+    if unknown:
+        return None, f"Unsupported hash algorithms: {', '.join(sorted(unknown))} " \
+                     f"(supported: {', '.join(HASH_ALGORITHMS)})"
+    requested.add('sha256')
+    return tuple(name for name in HASH_ALGORITHMS if name in requested), None
+
+
+def calculate_file_hashes(filepath, algorithms=DEFAULT_HASH_ALGORITHMS, cancelled=None):
+    """
+    Calculate several digests of a file in a single read
+
+    The file is read unbuffered with readinto() into two preallocated,
+    page-aligned buffers of HASH_CHUNK_SIZE bytes. While one buffer is
+    hashed, every digest updating in parallel on digest_executor, the next
+    chunk is read into the other.
+
+    Args:
+        filepath (str): Path to file
+        algorithms (tuple): Names from HASH_ALGORITHMS
+        cancelled (callable): Checked before each chunk; stops hashing when it returns True
+
+    Returns:
+        dict: Algorithm name -> hash in hexadecimal
+
+    Raises:
+        JobCancelled: If cancelled() returned True
+    """
+    digests = {name: hashlib.new(name) for name in algorithms}
+    # Anonymous mappings are page-aligned
+    buffers = [mmap.mmap(-1, HASH_CHUNK_SIZE) for _ in range(2)]
+    views = [memoryview(buffer) for buffer in buffers]
+    pending = []  # digest updates of the chunk being hashed
+    chunk = None
+
+    try:
+        with open(filepath, 'rb', buffering=0) as f:
+            current = 0
+            while True:
+                if cancelled is not None and cancelled():
+                    raise JobCancelled()
+                size = f.readinto(views[current])
+                # The previous chunk must be hashed before its buffer is refilled
+                for future in pending:
+                    future.result()
+                if chunk is not None:
+                    chunk.release()
+                    chunk = None
+                if not size:
+                    break
+                chunk = views[current][:size]
+                pending = [digest_executor.submit(digest.update, chunk) for digest in digests.values()]
+                current = 1 - current
+
+        return {name: digest.hexdigest() for name, digest in digests.items()}
+    except JobCancelled:
+        raise
+    except Exception as e:
+        logger.error(f"Error calculating hash: {str(e)}")
+        raise
+    finally:
+        # Buffers can only be unmapped once no update is using them
+        wait(pending)
+        if chunk is not None:
+            chunk.release()
+        for view in views:
+            view.release()
+        for buffer in buffers:
+            buffer.close()
+
 
 def calculate_file_hash(filepath):
     """
@@ -74,18 +434,242 @@ def calculate_file_hash(filepath):
     Returns:
         str: SHA256 hash in hexadecimal
     """
-    sha256_hash = hashlib.sha256()
+    return calculate_file_hashes(filepath, ('sha256',))['sha256']
 
-    try:
-        with open(filepath, "rb") as f:
-            # Read and update hash in chunks for large files
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
 
-        return sha256_hash.hexdigest()
-    except Exception as e:
-        logger.error(f"Error calculating hash: {str(e)}")
+def build_imaging_command(job):
+    """
+    Build the imaging command for a job
+
+    Args:
+        job (ImagingJob): Job to build the command for
+
+    Returns:
+        list: Command and arguments
+    """
+    if job.method == 'dcfldd':
+        # Use dcfldd for imaging with hashing; each digest gets its own log in the job's directory.
+        # hashconv=after hashes the bytes written, so the digests match the image file.
+        return [
+            'dcfldd',
+            f'if={job.source}',
+            f'of={job.destination}',
+            f"hash={','.join(job.hash_algorithms)}",
+            f'hashwindow={DCFLDD_HASH_WINDOW}',
+            'hashconv=after',
+            *[f"{name}log={os.path.join(job.hash_log_dir, f'{name}.log')}" for name in job.hash_algorithms],
+            f'bs={DCFLDD_BLOCK_SIZE // (1024 * 1024)}M',
+            'conv=noerror,sync',
+            'status=on',
+            f'statusinterval={DCFLDD_STATUS_INTERVAL}'
+        ]
+    if job.method == 'ewf':
+        # Use ewfacquire for E01 format; it always computes MD5 of the acquired data
+        extra_digests = [name for name in job.hash_algorithms if name != 'md5']
+        return [
+            'ewfacquire',
+            *(['-d', ','.join(extra_digests)] if extra_digests else []),
+            '-t', job.destination,
+            '-u',  # unattended mode
+            '-C', 'case',
+            '-D', 'description',
+            '-E', 'evidence',
+            '-e', 'examiner',
+            '-m', 'fixed',
+            '-M', 'logical',
+            '-N', 'notes',
+            '-c', 'deflate',
+            '-f', 'encase6',
+            job.source
+        ]
+    raise ValueError(f"Unknown imaging method: {job.method}")
+
+
+DCFLDD_WINDOW_LINE = re.compile(r'^\s*(\d+)\s*-\s*(\d+)\s*:\s*([0-9a-fA-F]+)\s*$')
+DCFLDD_TOTAL_LINE = re.compile(r'^\s*Total(?:\s*\((\w+)\))?\s*:\s*([0-9a-fA-F]+)\s*$')
+EWF_DIGEST_LINE = re.compile(r'^\s*(MD5|SHA1|SHA256)\s+hash calculated over data:\s*([0-9a-fA-F]+)\s*$',
+                             re.MULTILINE)
+
+
+def parse_dcfldd_hash_logs(log_dir, algorithms):
+    """
+    Read the per-digest hash logs dcfldd wrote for a job
+
+    Each log holds one "start - end: digest" line per hash window and a
+    "Total (algorithm): digest" line for the whole image.
+
+    Args:
+        log_dir (str): Job hash log directory
+        algorithms (tuple): Digests dcfldd was asked for
+
+    Returns:
+        tuple: (hashes, windows); windows are dicts with start, end and the
+            digest of each algorithm
+    """
+    hashes = {}
+    windows = {}  # (start, end) -> {algorithm: digest}
+    for name in algorithms:
+        path = os.path.join(log_dir, f'{name}.log')
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            for line in f:
+                window = DCFLDD_WINDOW_LINE.match(line)
+                if window:
+                    start, end, digest = window.groups()
+                    windows.setdefault((int(start), int(end)), {})[name] = digest.lower()
+                    continue
+                total = DCFLDD_TOTAL_LINE.match(line)
+                if total:
+                    hashes[name] = total.group(2).lower()
+
+    return hashes, [{'start': start, 'end': end, 'hashes': digests}
+                    for (start, end), digests in sorted(windows.items())]
+
+
+def parse_ewf_digests(output):
+    """
+    Parse the "<ALGORITHM> hash calculated over data" lines of ewfacquire or ewfverify
+
+    Args:
+        output (str): Tool output
+
+    Returns:
+        dict: Algorithm name -> hash in hexadecimal
+    """
+    return {name.lower(): digest.lower() for name, digest in EWF_DIGEST_LINE.findall(output)}
+
+
+def record_acquisition_hashes(job, output):
+    """
+    Take a finished job's digests from what the imaging tool computed
+
+    Args:
+        job (ImagingJob): Finished job
+        output (str): Imaging tool stdout
+
+    Raises:
+        Exception: If the tool did not report every requested digest
+    """
+    if job.method == 'dcfldd':
+        job.hashes, job.hash_windows = parse_dcfldd_hash_logs(job.hash_log_dir, job.hash_algorithms)
+    else:
+        job.hashes = {name: digest for name, digest in parse_ewf_digests(output).items()
+                      if name in job.hash_algorithms}
+
+    missing = [name for name in job.hash_algorithms if name not in job.hashes]
+    if missing:
+        raise Exception(f"Imaging tool did not report {', '.join(missing)} digests")
+    job.hash_value = job.hashes['sha256']
+
+
+def verify_job_image(job):
+    """
+    Re-read a finished job's image and compare its digests with the acquisition digests
+
+    Raw images are hashed with calculate_file_hashes(); E01 images are
+    checked with ewfverify, which hashes the media data they contain.
+    Cancelling a job during the verify pass stops it.
+
+    Args:
+        job (ImagingJob): Completed job, or a running job whose imaging command succeeded
+
+    Returns:
+        bool: Whether every digest matched
+
+    Raises:
+        JobCancelled: If the job was cancelled during the verify pass
+    """
+    job.verification = {'status': 'running', 'started_at': datetime.now().isoformat()}
+    job.touch()
+    persist_job(job)
+    logger.info(f"Verifying image of job {job.job_id}: {job.image_path}")
+    try:
+        if job.method == 'dcfldd':
+            hashes = calculate_file_hashes(job.image_path, job.hash_algorithms,
+                                           cancelled=lambda: job.cancel_requested)
+        else:
+            extra_digests = [name for name in job.hash_algorithms if name != 'md5']
+            process = subprocess.Popen(
+                ['ewfverify', '-q', *(['-d', ','.join(extra_digests)] if extra_digests else []),
+                 job.image_path],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True
+            )
+            job.kill = process.kill
+            if job.cancel_requested:
+                process.kill()
+            try:
+                stdout, stderr = process.communicate(timeout=IMAGING_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                raise
+            finally:
+                job.kill = None
+            if job.cancel_requested:
+                raise JobCancelled()
+            if process.returncode != 0 and not parse_ewf_digests(stdout):
+                raise Exception(f"Verification failed: {stderr}")
+            hashes = parse_ewf_digests(stdout)
+
+        mismatched = [name for name in job.hash_algorithms if hashes.get(name) != job.hashes.get(name)]
+        job.verification = {
+            'status': 'mismatch' if mismatched else 'verified',
+            'hashes': hashes,
+            'mismatched': mismatched,
+            'started_at': job.verification['started_at'],
+            'verified_at': datetime.now().isoformat()
+        }
+        job.touch()
+        persist_job(job)
+        if mismatched:
+            logger.error(f"Job {job.job_id} image does not match acquisition digests: {', '.join(mismatched)}")
+        return not mismatched
+
+    except JobCancelled:
+        job.verification = {'status': 'cancelled', 'started_at': job.verification['started_at']}
         raise
+    except Exception as e:
+        job.verification = {
+            'status': 'failed',
+            'error': str(e),
+            'started_at': job.verification['started_at'],
+            'verified_at': datetime.now().isoformat()
+        }
+        logger.error(f"Verification of job {job.job_id} failed: {str(e)}")
+        job.touch()
+        persist_job(job)
+        return False
+
+
+def finish_imaging_job(job, output):
+    """
+    Record the digests of a job whose imaging command succeeded, verify if asked, and complete it
+
+    The job stays running until it completes, so it can still be cancelled
+    while its digests are recorded and its image is verified.
+
+    Args:
+        job (ImagingJob): Job to finish
+        output (str): Imaging tool stdout
+
+    Raises:
+        JobCancelled: If the job was cancelled before it completed
+    """
+    record_acquisition_hashes(job, output)
+    if job.cancel_requested:
+        raise JobCancelled()
+
+    if job.verify and not verify_job_image(job):
+        raise Exception(f"Image verification {job.verification['status']}")
+
+    if not imaging_scheduler.complete(job):
+        raise JobCancelled()
+    job.progress = 100
+    job.completed_at = datetime.now().isoformat()
+    logger.info(f"Job {job.job_id} completed successfully. Hash: {job.hash_value}")
 
 
 def run_imaging_job(job):
@@ -96,67 +680,150 @@ def run_imaging_job(job):
         job (ImagingJob): Job to execute
     """
     try:
-        job.status = 'running'
-        job.started_at = datetime.now().isoformat()
+        job.start()
+        persist_job(job)
         logger.info(f"Starting imaging job {job.job_id}: {job.source} -> {job.destination}")
 
         # Build command based on method
+        command = build_imaging_command(job)
         if job.method == 'dcfldd':
-            # Use dcfldd for imaging with hashing
-            command = [
-                'dcfldd',
-                f'if={job.source}',
-                f'of={job.destination}',
-                'hash=sha256',
-                'hashwindow=1G',
-                'hashlog=/tmp/hash.log',
-                'bs=4M',
-                'conv=noerror,sync',
-                'status=on'
-            ]
-        elif job.method == 'ewf':
-            # Use ewfacquire for E01 format
-            command = [
-                'ewfacquire',
-                '-t', job.destination,
-                '-u',  # unattended mode
-                '-C', 'case',
-                '-D', 'description',
-                '-E', 'evidence',
-                '-e', 'examiner',
-                '-m', 'fixed',
-                '-M', 'logical',
-                '-N', 'notes',
-                '-c', 'deflate',
-                '-f', 'encase6',
-                job.source
-            ]
-        else:
-            raise ValueError(f"Unknown imaging method: {job.method}")
+            os.makedirs(job.hash_log_dir, exist_ok=True)
 
-        # Execute command
+        # Execute command, following its progress output as it arrives
         logger.info(f"Executing: {' '.join(command)}")
-        result = subprocess.run(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            timeout=7200  # 2 hour timeout
-        )
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        job.kill = process.kill
+        if job.cancel_requested:
+            process.kill()
+        timed_out = threading.Event()
+
+        def kill():
+            timed_out.set()
+            process.kill()
+
+        watchdog = threading.Timer(IMAGING_TIMEOUT, kill)
+        watchdog.start()
+        try:
+            parser = ProgressParser(job)
+            if job.method == 'dcfldd':
+                progress_stream, other_stream = process.stderr, process.stdout
+            else:
+                progress_stream, other_stream = process.stdout, process.stderr
+
+            # The other stream is drained on its own thread so neither pipe can fill up
+            other_output = []
+            drain = threading.Thread(target=lambda: other_output.append(other_stream.read()), daemon=True)
+            drain.start()
+            for chunk in iter(lambda: progress_stream.read1(65536), b''):
+                parser.feed(chunk)
+            drain.join()
+            process.wait()
+        finally:
+            watchdog.cancel()
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+        if job.cancel_requested:
+            raise JobCancelled()
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(command, IMAGING_TIMEOUT)
+
+        other_text = b''.join(other_output).decode('utf-8', errors='replace')
+        stdout, stderr = (other_text, parser.output()) if job.method == 'dcfldd' else (parser.output(), other_text)
+        if process.returncode != 0:
+            raise Exception(f"Imaging failed: {stderr}")
+
+        finish_imaging_job(job, stdout)
+
+    except JobCancelled:
+        job.status = 'cancelled'
+        job.error = 'Cancelled'
+        job.completed_at = datetime.now().isoformat()
+        remove_partial_output(job)
+        logger.info(f"Job {job.job_id} cancelled; partial output removed")
+    except subprocess.TimeoutExpired:
+        job.status = 'failed'
+        job.error = 'Imaging operation timed out after 2 hours'
+        logger.error(f"Job {job.job_id} timed out")
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+        logger.error(f"Job {job.job_id} failed: {str(e)}")
+    finally:
+        job.kill = None
+        job.touch()
+        persist_job(job)
+        imaging_scheduler.release(job)
 
-        if result.returncode != 0:
-            raise Exception(f"Imaging failed: {result.stderr}")
 
-        # Calculate hash of output file
-        logger.info(f"Calculating hash for {job.destination}")
-        job.hash_value = calculate_file_hash(job.destination)
+async def run_imaging_job_async(job):
+    """
+    Execute a forensic imaging job as an asyncio subprocess (ASGI mode)
 
-        job.status = 'completed'
-        job.progress = 100
-        job.completed_at = datetime.now().isoformat()
-        logger.info(f"Job {job.job_id} completed successfully. Hash: {job.hash_value}")
+    Behaves like run_imaging_job() but waits on the imaging tool and the
+    hash computation without holding a thread of its own.
 
-    except subprocess.TimeoutExpired:
+    Args:
+        job (ImagingJob): Job to execute
+    """
+    process = None
+    loop = asyncio.get_running_loop()
+    try:
+        job.start()
+        # SQLite writes can wait on the database lock, so they run off the event loop
+        await loop.run_in_executor(None, persist_job, job)
+        logger.info(f"Starting imaging job {job.job_id}: {job.source} -> {job.destination}")
+
+        command = build_imaging_command(job)
+        if job.method == 'dcfldd':
+            os.makedirs(job.hash_log_dir, exist_ok=True)
+        logger.info(f"Executing: {' '.join(command)}")
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+
+        def kill():
+            if process.returncode is None:
+                process.kill()
+
+        job.kill = lambda: loop.call_soon_threadsafe(kill)
+        if job.cancel_requested:
+            kill()
+
+        parser = ProgressParser(job)
+        if job.method == 'dcfldd':
+            progress_stream, other_stream = process.stderr, process.stdout
+        else:
+            progress_stream, other_stream = process.stdout, process.stderr
+
+        async def follow_progress():
+            while True:
+                chunk = await progress_stream.read(65536)
+                if not chunk:
+                    return
+                parser.feed(chunk)
+
+        _, other_output, _ = await asyncio.wait_for(
+            asyncio.gather(follow_progress(), other_stream.read(), process.wait()), IMAGING_TIMEOUT)
+
+        if job.cancel_requested:
+            raise JobCancelled()
+
+        other_text = other_output.decode('utf-8', errors='replace')
+        stdout, stderr = (other_text, parser.output()) if job.method == 'dcfldd' else (parser.output(), other_text)
+        if process.returncode != 0:
+            raise Exception(f"Imaging failed: {stderr}")
+
+        # Recording digests is quick; a verify pass re-reads the image, so both go to the hash executor
+        await loop.run_in_executor(asgi_app.executors['hash'], finish_imaging_job, job, stdout)
+
+    except JobCancelled:
+        job.status = 'cancelled'
+        job.error = 'Cancelled'
+        job.completed_at = datetime.now().isoformat()
+        remove_partial_output(job)
+        logger.info(f"Job {job.job_id} cancelled; partial output removed")
+    except asyncio.TimeoutError:
         job.status = 'failed'
         job.error = 'Imaging operation timed out after 2 hours'
         logger.error(f"Job {job.job_id} timed out")
@@ -164,6 +831,357 @@ def run_imaging_job(job):
         job.status = 'failed'
         job.error = str(e)
         logger.error(f"Job {job.job_id} failed: {str(e)}")
+    finally:
+        if process is not None and process.returncode is None:
+            process.kill()
+            await process.wait()
+        job.kill = None
+        job.touch()
+        await loop.run_in_executor(None, persist_job, job)
+        imaging_scheduler.release(job)
+
+
+def start_verification(job):
+    """Run an on-demand verify pass on the hash executor in ASGI mode, else on a thread"""
+    hash_executor = asgi_app.executors.get('hash')
+    if hash_executor is not None:
+        hash_executor.submit(verify_job_image, job)
+        return
+    thread = threading.Thread(target=verify_job_image, args=(job,))
+    thread.daemon = True
+    thread.start()
+
+
+class JobStore:
+    """
+    Persistent SQLite store of imaging jobs
+
+    Each row holds a job's to_dict() form plus the columns /jobs filters on
+    (status, queue time, source), each indexed together with the row
+    sequence so listing a page is an index range scan. Rows are written on
+    every state change; progress updates in between only live in memory.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Open a connection for one transaction and close it afterwards"""
+        with contextlib.closing(self._open()) as connection, connection:
+            yield connection
+
+    def _open(self):
+        """Open a connection, creating the schema on first use"""
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        if not self._ready:
+            with self._lock:
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.executescript("""
+                    CREATE TABLE IF NOT EXISTS jobs (
+                        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                        job_id TEXT UNIQUE NOT NULL,
+                        status TEXT NOT NULL,
+                        verification_status TEXT,
+                        source TEXT NOT NULL,
+                        queued_at TEXT NOT NULL,
+                        completed_at TEXT,
+                        data TEXT NOT NULL
+                    );
+                    CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, seq);
+                    CREATE INDEX IF NOT EXISTS jobs_source ON jobs (source, seq);
+                    CREATE INDEX IF NOT EXISTS jobs_queued_at ON jobs (queued_at);
+                    CREATE INDEX IF NOT EXISTS jobs_completed_at ON jobs (completed_at);
+                """)
+                self._ready = True
+        return connection
+
+    def save(self, job):
+        """Insert or update a job"""
+        data = job.to_dict()
+        verification = (job.verification or {}).get('status')
+        with self._connect() as connection:
+            connection.execute("""
+                INSERT INTO jobs (job_id, status, verification_status, source, queued_at, completed_at, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (job_id) DO UPDATE SET status = excluded.status,
+                    verification_status = excluded.verification_status,
+                    completed_at = excluded.completed_at, data = excluded.data
+            """, (job.job_id, job.status, verification, job.source, job.queued_at, job.completed_at,
+                  json.dumps(data)))
+
+    def get(self, job_id):
+        """Return a job's stored to_dict() form, or None"""
+        with self._connect() as connection:
+            row = connection.execute('SELECT data FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return json.loads(row['data']) if row else None
+
+    def page(self, statuses=None, source=None, since=None, until=None, cursor=None, limit=JOB_PAGE_SIZE):
+        """
+        Return one page of jobs, newest first
+
+        Args:
+            statuses (list, optional): Only jobs in these states
+            source (str, optional): Only jobs imaging this source
+            since (str, optional): Only jobs queued at or after this ISO time
+            until (str, optional): Only jobs queued before this ISO time
+            cursor (int, optional): next_cursor of the previous page
+            limit (int): Jobs per page
+
+        Returns:
+            tuple: (jobs, next_cursor); next_cursor is None on the last page
+        """
+        clauses = []
+        params = []
+        if statuses:
+            clauses.append(f"status IN ({', '.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if source:
+            clauses.append('source = ?')
+            params.append(source)
+        if since:
+            clauses.append('queued_at >= ?')
+            params.append(since)
+        if until:
+            clauses.append('queued_at < ?')
+            params.append(until)
+        if cursor is not None:
+            clauses.append('seq < ?')
+            params.append(cursor)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+        # One row more than the page tells whether another page follows
+        with self._connect() as connection:
+            rows = connection.execute(f'SELECT seq, data FROM jobs {where} ORDER BY seq DESC LIMIT ?',
+                                      params + [limit + 1]).fetchall()
+        next_cursor = rows[limit - 1]['seq'] if len(rows) > limit else None
+        return [json.loads(row['data']) for row in rows[:limit]], next_cursor
+
+    def purge(self, retention_days=JOB_RETENTION_DAYS):
+        """
+        Delete jobs that finished more than retention_days ago
+
+        Returns:
+            int: Jobs deleted
+        """
+        cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+        with self._connect() as connection:
+            return connection.execute("""
+                DELETE FROM jobs WHERE completed_at < ?
+                AND status IN ('completed', 'failed', 'cancelled', 'interrupted')
+                AND COALESCE(verification_status, '') NOT IN ('pending', 'running')
+            """, (cutoff,)).rowcount
+
+    def recover(self):
+        """
+        Mark jobs that were queued, running or verifying when the service stopped as interrupted
+
+        Returns:
+            int: Jobs marked
+        """
+        now = datetime.now().isoformat()
+        marked = 0
+        with self._connect() as connection:
+            rows = connection.execute("""
+                SELECT data FROM jobs WHERE status IN ('pending', 'running')
+                OR verification_status IN ('pending', 'running')
+            """).fetchall()
+            for row in rows:
+                job = ImagingJob.from_dict(json.loads(row['data']))
+                if job.status in ('pending', 'running'):
+                    state = 'queued' if job.status == 'pending' else 'running'
+                    job.status = 'interrupted'
+                    job.error = f"Service restarted while the job was {state}"
+                    job.completed_at = now
+                if job.verification and job.verification['status'] in ('pending', 'running'):
+                    job.verification = dict(job.verification, status='interrupted', verified_at=now)
+                data = job.to_dict()
+                connection.execute("""
+                    UPDATE jobs SET status = ?, verification_status = ?, completed_at = ?, data = ?
+                    WHERE job_id = ?
+                """, (job.status, (job.verification or {}).get('status'), job.completed_at,
+                      json.dumps(data), job.job_id))
+                marked += 1
+        return marked
+
+
+job_store = JobStore(JOB_DB_PATH)
+
+
+def persist_job(job):
+    """
+    Write a job's current state to the job store
+
+    Jobs that have settled are dropped from memory; later lookups read
+    them from the store.
+    """
+    job_store.save(job)
+    if job.is_settled():
+        with job_lock:
+            if imaging_jobs.get(job.job_id) is job:
+                del imaging_jobs[job.job_id]
+
+
+def find_job(job_id):
+    """
+    Return a job from memory, or rebuilt from the job store
+
+    Args:
+        job_id (str): Job ID
+
+    Returns:
+        ImagingJob or None
+    """
+    with job_lock:
+        job = imaging_jobs.get(job_id)
+    if job is not None:
+        return job
+    data = job_store.get(job_id)
+    return ImagingJob.from_dict(data) if data else None
+
+
+class JobCancelled(Exception):
+    """Raised inside a job runner when the job was cancelled"""
+
+
+def remove_partial_output(job):
+    """Delete what a cancelled job wrote: the image (every E01 segment) and its hash logs"""
+    paths = [job.destination]
+    if job.method == 'ewf':
+        directory = os.path.dirname(job.destination) or '.'
+        prefix = os.path.basename(job.destination) + '.'
+        paths.extend(os.path.join(directory, name) for name in os.listdir(directory)
+                     if name.startswith(prefix) and re.match(r'^[Ee][0-9A-Za-z]{2}$', name[len(prefix):]))
+    for path in paths:
+        if os.path.isfile(path):
+            os.remove(path)
+    shutil.rmtree(job.hash_log_dir, ignore_errors=True)
+
+
+class ImagingScheduler:
+    """
+    Priority queue for imaging jobs with per-device concurrency limits
+
+    Jobs start in priority order (higher first, then oldest) as long as
+    fewer than MAX_IMAGING_JOBS are running, their source device has fewer
+    than MAX_JOBS_PER_SOURCE readers and their destination filesystem
+    fewer than MAX_JOBS_PER_DESTINATION writers. A job whose device or
+    filesystem is busy waits without blocking jobs behind it that use
+    other devices.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queue = []  # pending jobs, kept sorted by (-priority, queue order)
+        self._running = set()
+        self._sequence = 0
+
+    def submit(self, job):
+        """Queue a job and start whatever can run"""
+        with self._lock:
+            self._sequence += 1
+            job.sequence = self._sequence
+            self._queue.append(job)
+            self._queue.sort(key=lambda queued: (-queued.priority, queued.sequence))
+        self._dispatch()
+
+    def release(self, job):
+        """Free a finished job's slots and start whatever can run"""
+        with self._lock:
+            self._running.discard(job)
+        self._dispatch()
+
+    def complete(self, job):
+        """
+        Mark a running job completed unless it was cancelled
+
+        Done under the scheduler lock so cancel() either reaches the job
+        before this or reports that it already finished.
+
+        Returns:
+            bool: False if cancellation was requested
+        """
+        with self._lock:
+            if job.cancel_requested:
+                return False
+            job.status = 'completed'
+            return True
+
+    def cancel(self, job):
+        """
+        Cancel a queued or running job
+
+        Returns:
+            bool: False if the job already finished
+        """
+        with self._lock:
+            if job in self._queue:
+                self._queue.remove(job)
+                job.status = 'cancelled'
+                job.error = 'Cancelled before it started'
+                job.completed_at = datetime.now().isoformat()
+                job.touch()
+                logger.info(f"Cancelled queued job {job.job_id}")
+                return True
+            if job not in self._running or job.status not in ('pending', 'running'):
+                return False
+            job.cancel_requested = True
+            kill = job.kill
+        # A job between start and launching its subprocess checks cancel_requested itself
+        if kill is not None:
+            kill()
+        logger.info(f"Cancelling running job {job.job_id}")
+        return True
+
+    def position(self, job):
+        """Return a pending job's 1-based place in the queue, or None"""
+        with self._lock:
+            try:
+                return self._queue.index(job) + 1
+            except ValueError:
+                return None
+
+    def stats(self):
+        """Return queue and running counts"""
+        with self._lock:
+            return {'queued': len(self._queue), 'running': len(self._running)}
+
+    def _dispatch(self):
+        with self._lock:
+            startable = []
+            sources = {}
+            destinations = {}
+            for running in self._running:
+                sources[running.source_device] = sources.get(running.source_device, 0) + 1
+                destinations[running.destination_filesystem] = \
+                    destinations.get(running.destination_filesystem, 0) + 1
+            for job in list(self._queue):
+                if len(self._running) >= MAX_IMAGING_JOBS:
+                    break
+                if sources.get(job.source_device, 0) >= MAX_JOBS_PER_SOURCE or \
+                        destinations.get(job.destination_filesystem, 0) >= MAX_JOBS_PER_DESTINATION:
+                    continue
+                self._queue.remove(job)
+                self._running.add(job)
+                sources[job.source_device] = sources.get(job.source_device, 0) + 1
+                destinations[job.destination_filesystem] = destinations.get(job.destination_filesystem, 0) + 1
+                startable.append(job)
+        for job in startable:
+            start_imaging_job(job)
+
+
+imaging_scheduler = ImagingScheduler()
+
+
+def start_imaging_job(job):
+    """Run a job on the ASGI event loop when serving in ASGI mode, else on a thread"""
+    if asgi_app.loop is not None:
+        asyncio.run_coroutine_threadsafe(run_imaging_job_async(job), asgi_app.loop)
+        return
+    thread = threading.Thread(target=run_imaging_job, args=(job,))
+    thread.daemon = True
+    thread.start()
 
 
 @app.route('/health', methods=['GET'])
@@ -202,7 +1220,8 @@ def health_check():
             },
             'evidence_dir': EVIDENCE_DIR,
             'output_dir': OUTPUT_DIR,
-            'active_jobs': len([j for j in imaging_jobs.values() if j.status == 'running'])
+            'active_jobs': len([j for j in imaging_jobs.values() if j.status == 'running']),
+            'queued_jobs': imaging_scheduler.stats()['queued']
         }), 200
 
     except Exception as e:
@@ -222,6 +1241,12 @@ def create_image():
         source (str): Source device or file path
         destination (str): Destination file path in output directory
         method (str): Imaging method ('dcfldd' or 'ewf')
+        hash_algorithms (list, optional): Digests computed while acquiring
+            (md5, sha1, sha256, sha512; default: md5, sha1, sha256; ewf
+            supports md5, sha1 and sha256)
+        verify (bool, optional): Re-read the finished image and compare its
+            digests with the acquisition digests (default: false)
+        priority (int, optional): Higher priorities start first (default: 0)
 
     Returns:
         Job information with job_id for tracking
@@ -252,6 +1277,26 @@ def create_image():
                 'error': 'method must be either "dcfldd" or "ewf"'
             }), 400
 
+        hash_algorithms, error = parse_hash_algorithms(data.get('hash_algorithms'))
+        if error:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+
+        priority = data.get('priority', 0)
+        if not isinstance(priority, int) or isinstance(priority, bool):
+            return jsonify({
+                'success': False,
+                'error': 'priority must be an integer'
+            }), 400
+
+        if method == 'ewf' and not set(hash_algorithms).issubset(EWF_HASH_ALGORITHMS):
+            return jsonify({
+                'success': False,
+                'error': f"ewf supports only these hash algorithms: {', '.join(EWF_HASH_ALGORITHMS)}"
+            }), 400
+
         # Validate source path (security check)
         if '..' in source or not os.path.exists(source):
             return jsonify({
@@ -266,23 +1311,24 @@ def create_image():
         job_id = str(uuid.uuid4())
 
         # Create job
-        job = ImagingJob(job_id, source, dest_path, method)
+        job = ImagingJob(job_id, source, dest_path, method, hash_algorithms, bool(data.get('verify')),
+                         priority)
 
-        # Store job
+        # Store job; finished jobs past their retention period are dropped first
+        job_store.purge()
         with job_lock:
             imaging_jobs[job_id] = job
+        persist_job(job)
 
-        # Start imaging in background thread
-        thread = threading.Thread(target=run_imaging_job, args=(job,))
-        thread.daemon = True
-        thread.start()
+        # Queue the job; the scheduler starts it when its devices have capacity
+        imaging_scheduler.submit(job)
 
         logger.info(f"Created imaging job {job_id}")
 
         return jsonify({
             'success': True,
             'job_id': job_id,
-            'message': 'Imaging job started',
+            'message': 'Imaging job queued',
             'job': job.to_dict()
         }), 202  # Accepted
 
@@ -307,8 +1353,7 @@ def get_job_status(job_id):
         Job status and details
     """
     try:
-        with job_lock:
-            job = imaging_jobs.get(job_id)
+        job = find_job(job_id)
 
         if not job:
             return jsonify({
@@ -330,62 +1375,244 @@ def get_job_status(job_id):
         }), 500
 
 
-@app.route('/verify-image', methods=['POST'])
-def verify_image():
+@app.route('/cancel-job/<job_id>', methods=['POST'])
+def cancel_job(job_id):
     """
-    Calculate SHA256 hash of an image file for verification
+    Cancel a queued or running imaging job
 
-    Request body:
-        filename (str): Filename in output directory
+    A queued job is removed from the queue. A running job's imaging
+    process or verify pass is stopped and its image and hash logs are
+    deleted. A job that has completed answers 409.
+
+    Args:
+        job_id (str): Job ID to cancel
 
     Returns:
-        SHA256 hash of the file
+        Job information; a running job reports 'cancelled' once its process or verify pass has stopped
     """
     try:
-        # Parse request
-        data = request.get_json()
-        if not data:
-            return jsonify({
-                'success': False,
-                'error': 'Request body required'
-            }), 400
-
-        filename = data.get('filename')
+        job = find_job(job_id)
 
-        if not filename:
+        if not job:
             return jsonify({
                 'success': False,
-                'error': 'filename is required'
-            }), 400
+                'error': 'Job not found'
+            }), 404
 
-        # Security: Prevent path traversal
-        if '..' in filename or filename.startswith('/'):
+        if not imaging_scheduler.cancel(job):
             return jsonify({
                 'success': False,
-                'error': 'Invalid filename'
-            }), 400
+                'error': f'Job is {job.status} and can no longer be cancelled'
+            }), 409
+        if job.status == 'cancelled':
+            persist_job(job)
 
-        # Construct full path
-        filepath = os.path.join(OUTPUT_DIR, filename)
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'message': 'Job cancelled' if job.status == 'cancelled' else 'Cancellation requested',
+            'job': job.to_dict()
+        }), 200
 
-        # Check if file exists
-        if not os.path.exists(filepath):
-            return jsonify({
-                'success': False,
-                'error': f'File not found: {filename}'
-            }), 404
+    except Exception as e:
+        logger.error(f"Error cancelling job: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
+
+def sse_event(event, payload):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@app.route('/job-events/<job_id>', methods=['GET'])
+def job_events(job_id):
+    """
+    Stream an imaging job's progress as server-sent events
+
+    A "progress" event carrying the job is sent on connect and whenever it
+    changes (bytes copied, throughput, ETA, status, verification), and a
+    final "done" event when the job and any verify pass have finished.
+    Comments are sent every EVENT_KEEPALIVE seconds to keep proxies from
+    closing an idle stream.
+
+    Args:
+        job_id (str): Job ID to follow
+    """
+    job = find_job(job_id)
+
+    if not job:
+        return jsonify({
+            'success': False,
+            'error': 'Job not found'
+        }), 404
+
+    def generate():
+        version = None
+        last_sent = time.monotonic()
+        while True:
+            with job.changed:
+                if job.version == version:
+                    job.changed.wait(EVENT_KEEPALIVE)
+                changed = job.version != version
+                version = job.version
+            if job.is_settled():
+                yield sse_event('done', job.to_dict())
+                return
+            if changed:
+                yield sse_event('progress', job.to_dict())
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= EVENT_KEEPALIVE:
+                yield ': keep-alive\n\n'
+                last_sent = time.monotonic()
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/verify-job/<job_id>', methods=['POST'])
+def verify_job(job_id):
+    """
+    Start a verify pass for a completed imaging job
+
+    The image is read back and its digests compared with the ones computed
+    during acquisition; the result appears in the job's verification field.
+
+    Args:
+        job_id (str): Job ID to verify
+
+    Returns:
+        Job information (202)
+    """
+    try:
+        with job_lock:
+            job = imaging_jobs.get(job_id)
+            if job is None:
+                # Finished jobs live in the job store; track this one in memory while it is verified
+                data = job_store.get(job_id)
+                job = ImagingJob.from_dict(data) if data else None
+
+            if not job:
+                return jsonify({
+                    'success': False,
+                    'error': 'Job not found'
+                }), 404
+
+            if job.status != 'completed':
+                return jsonify({
+                    'success': False,
+                    'error': f'Job is {job.status}; only completed jobs can be verified'
+                }), 409
+
+            if job.verification and job.verification['status'] in ('pending', 'running'):
+                return jsonify({
+                    'success': False,
+                    'error': 'Verification already running'
+                }), 409
+
+            job.verification = {'status': 'pending'}
+            imaging_jobs[job_id] = job
 
-        # Calculate hash
-        logger.info(f"Calculating hash for {filepath}")
-        hash_value = calculate_file_hash(filepath)
+        persist_job(job)
+        start_verification(job)
 
         return jsonify({
             'success': True,
-            'filename': filename,
-            'sha256': hash_value,
-            'algorithm': 'SHA256',
-            'verified_at': datetime.now().isoformat()
-        }), 200
+            'job_id': job_id,
+            'message': 'Verification started',
+            'job': job.to_dict()
+        }), 202  # Accepted
+
+    except Exception as e:
+        logger.error(f"Error starting verification: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
+
+def verify_image_path(data):
+    """
+    Validate a /verify-image request body
+
+    Args:
+        data (dict): Request body
+
+    Returns:
+        tuple: (filepath, algorithms, error_message, status_code); filepath is None on error
+    """
+    if not data:
+        return None, None, 'Request body required', 400
+
+    filename = data.get('filename')
+
+    if not filename:
+        return None, None, 'filename is required', 400
+
+    algorithms, error = parse_hash_algorithms(data.get('algorithms'))
+    if error:
+        return None, None, error, 400
+
+    # Security: Prevent path traversal
+    if '..' in filename or filename.startswith('/'):
+        return None, None, 'Invalid filename', 400
+
+    # Construct full path
+    filepath = os.path.join(OUTPUT_DIR, filename)
+
+    # Check if file exists
+    if not os.path.exists(filepath):
+        return None, None, f'File not found: {filename}', 404
+
+    return filepath, algorithms, None, 200
+
+
+def verify_image_payload(filename, hashes):
+    """Build the /verify-image response body"""
+    return {
+        'success': True,
+        'filename': filename,
+        'sha256': hashes['sha256'],
+        'algorithm': 'SHA256',
+        'hashes': hashes,
+        'verified_at': datetime.now().isoformat()
+    }
+
+
+@app.route('/verify-image', methods=['POST'])
+def verify_image():
+    """
+    Calculate hashes of an image file for verification
+
+    All digests are computed from a single read of the file.
+
+    Request body:
+        filename (str): Filename in output directory
+        algorithms (list, optional): Digests to compute (md5, sha1, sha256,
+            sha512; default: md5, sha1, sha256); SHA-256 is always included
+
+    Returns:
+        SHA256 hash of the file and every requested digest
+    """
+    try:
+        # Parse request
+        data = request.get_json()
+        filepath, algorithms, error, status = verify_image_path(data)
+        if filepath is None:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), status
+
+        # Calculate hashes
+        logger.info(f"Calculating {', '.join(algorithms)} for {filepath}")
+        hashes = calculate_file_hashes(filepath, algorithms)
+
+        return jsonify(verify_image_payload(data['filename'], hashes)), 200
 
     except Exception as e:
         logger.error(f"Error verifying image: {str(e)}")
@@ -399,19 +1626,61 @@ def verify_image():
 @app.route('/jobs', methods=['GET'])
 def list_jobs():
     """
-    List all imaging jobs
+    List imaging jobs, newest first, one page at a time
+
+    Query parameters:
+        status (str, optional): Comma-separated states to include (pending,
+            running, completed, failed, cancelled, interrupted)
+        source (str, optional): Only jobs imaging this source
+        since (str, optional): Only jobs queued at or after this ISO time
+        until (str, optional): Only jobs queued before this ISO time
+        limit (int, optional): Jobs per page (default: 50, max: 500)
+        cursor (int, optional): next_cursor from the previous page
 
     Returns:
-        Array of all jobs
+        Array of jobs and the cursor of the next page
     """
     try:
+        try:
+            limit = min(int(request.args.get('limit', JOB_PAGE_SIZE)), MAX_JOB_PAGE_SIZE)
+            cursor = int(request.args['cursor']) if request.args.get('cursor') else None
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'limit and cursor must be integers'
+            }), 400
+        if limit < 1:
+            return jsonify({
+                'success': False,
+                'error': 'limit must be positive'
+            }), 400
+
+        since = request.args.get('since')
+        until = request.args.get('until')
+        for value in (since, until):
+            if value:
+                try:
+                    datetime.fromisoformat(value)
+                except ValueError:
+                    return jsonify({
+                        'success': False,
+                        'error': f'Invalid ISO time: {value}'
+                    }), 400
+
+        statuses = [status for status in request.args.get('status', '').split(',') if status]
+        jobs, next_cursor = job_store.page(statuses, request.args.get('source'), since, until, cursor, limit)
+
+        # Jobs still in memory have fresher progress than their stored row
         with job_lock:
-            jobs = [job.to_dict() for job in imaging_jobs.values()]
+            live = {job_id: imaging_jobs[job_id] for job_id in (job['job_id'] for job in jobs)
+                    if job_id in imaging_jobs}
+        jobs = [live[job['job_id']].to_dict() if job['job_id'] in live else job for job in jobs]
 
         return jsonify({
             'success': True,
             'jobs': jobs,
-            'count': len(jobs)
+            'count': len(jobs),
+            'next_cursor': next_cursor
         }), 200
 
     except Exception as e:
@@ -441,6 +1710,95 @@ def internal_error(error):
     }), 500
 
 
+asgi_app = AsgiServer(app, ASGI_THREADS, executors={'hash': HASH_WORKERS})
+
+
+@asgi_app.route('POST', '/verify-image')
+async def verify_image_async(request, receive, send):
+    """
+    Hash an image on the hash executor without holding a request thread
+
+    Invalid requests are left to verify_image() so error responses stay
+    identical.
+    """
+    data = request.get_json()
+    filepath, algorithms, _, _ = verify_image_path(data if isinstance(data, dict) else None)
+    if filepath is None:
+        return False
+
+    logger.info(f"Calculating {', '.join(algorithms)} for {filepath}")
+    loop = asyncio.get_running_loop()
+    try:
+        hashes = await loop.run_in_executor(asgi_app.executors['hash'], calculate_file_hashes,
+                                            filepath, algorithms)
+    except Exception as e:
+        logger.error(f"Error verifying image: {str(e)}")
+        await asgi_app.send_json(request, send, {
+            'success': False,
+            'error': 'Internal server error',
+            'details': str(e)
+        }, 500)
+        return True
+
+    await asgi_app.send_json(request, send, verify_image_payload(data['filename'], hashes), 200)
+    return True
+
+
+@asgi_app.route('GET', '/job-events/(?P<job_id>[^/]+)')
+async def job_events_async(request, receive, send, job_id):
+    """
+    Stream job events from the event loop instead of a request thread
+
+    Unknown jobs are left to job_events() so the 404 response stays identical.
+    """
+    job = find_job(job_id)
+    if job is None:
+        return False
+
+    disconnected = asyncio.Event()
+    changed = asyncio.Event()  # set by job.touch() and on disconnect
+
+    async def watch_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        disconnected.set()
+        changed.set()
+
+    job.subscribe(changed)
+    watcher = asyncio.ensure_future(watch_disconnect())
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': asgi_response_headers(request, 'text/event-stream',
+                                         {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    })
+    try:
+        version = None
+        last_sent = time.monotonic()
+        while not disconnected.is_set():
+            changed.clear()
+            if job.is_settled():
+                await send({'type': 'http.response.body',
+                            'body': sse_event('done', job.to_dict()).encode('utf-8')})
+                return True
+            if job.version != version:
+                version = job.version
+                await send({'type': 'http.response.body', 'more_body': True,
+                            'body': sse_event('progress', job.to_dict()).encode('utf-8')})
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= EVENT_KEEPALIVE:
+                await send({'type': 'http.response.body', 'body': b': keep-alive\n\n', 'more_body': True})
+                last_sent = time.monotonic()
+            try:
+                await asyncio.wait_for(changed.wait(), max(0.0, EVENT_KEEPALIVE - (time.monotonic() - last_sent)))
+            except asyncio.TimeoutError:
+                pass
+        return True
+    finally:
+        job.unsubscribe(changed)
+        watcher.cancel()
+
+
 if __name__ == '__main__':
     logger.info("Starting Forensic Imaging API")
     logger.info(f"Evidence directory: {EVIDENCE_DIR}")
@@ -449,10 +1807,22 @@ if __name__ == '__main__':
     # Ensure directories exist
     os.makedirs(EVIDENCE_DIR, exist_ok=True)
     os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-    # Run Flask application
-    app.run(
-        host='0.0.0.0',
-        port=5002,
-        debug=False
-    )
+    os.makedirs(HASH_LOG_DIR, exist_ok=True)
+
+    # Jobs the previous run left unfinished can no longer complete
+    interrupted = job_store.recover()
+    if interrupted:
+        logger.warning(f"Marked {interrupted} unfinished jobs from the previous run as interrupted")
+    job_store.purge()
+
+    if SERVER_MODE == 'asgi':
+        # Serve through the ASGI front end
+        import uvicorn
+        uvicorn.run(asgi_app, host='0.0.0.0', port=5002, log_level='info')
+    else:
+        # Run Flask application
+        app.run(
+            host='0.0.0.0',
+            port=5002,
+            debug=False
+        )
@@ -0,0 +1,29 @@
+"""
+Shared fixtures for the FTK Imager API tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'common'))
+
+import imaging_api  # noqa: E402
+
+
+@pytest.fixture
+def make_job():
+    """Create imaging jobs on made-up devices without touching the disks"""
+    count = [0]
+
+    def make_job(source='/dev/sdx', destination='fs-a', priority=0, method='dd'):
+        count[0] += 1
+        job = imaging_api.ImagingJob(f'job{count[0]}', source, f'/output/job{count[0]}.dd', method,
+                                     priority=priority)
+        job.source_device = source
+        job.destination_filesystem = destination
+        return job
+
+    return make_job
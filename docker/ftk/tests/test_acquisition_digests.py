@@ -0,0 +1,89 @@
+import imaging_api
+
+MD5_LOG = """\
+0 - 1048576: 7F614DA9329CD3AEBF59B91AADC30BF0
+1048576 - 2097152: 2a3b7e1f0c9d8e7f6a5b4c3d2e1f0a9b
+2097152 - 2500000: c4ca4238a0b923820dcc509a6f75849b
+Total (md5): D41D8CD98F00B204E9800998ECF8427E
+"""
+
+SHA256_LOG = """\
+0 - 1048576: 30e14955ebf1352266dc2ff8067e68104607e750abb9d3b36582b8af909fcb58
+1048576 - 2097152: 6b86b273ff34fce19d6b804eff5a3f5747ada4eaa22f1d49c01e52ddb7875b4b
+2097152 - 2500000: d4735e3a265e16eee03f59718b9b5d03019c07d8b6c51f90da3a666eec13ab35
+Total: e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855
+"""
+
+EWFACQUIRE_OUTPUT = """\
+Acquiry started at: Oct 17, 2026 09:00:00
+This could take a while.
+
+Acquiry completed at: Oct 17, 2026 09:05:12
+
+Written: 2.3 GiB (2500000000 bytes) in 5 minute(s) and 12 second(s) with 7.6 MiB/s (8012820 bytes/second).
+MD5 hash calculated over data:\t\td41d8cd98f00b204e9800998ecf8427e
+SHA1 hash calculated over data:\t\tDA39A3EE5E6B4B0D3255BFEF95601890AFD80709
+SHA256 hash calculated over data:\te3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855
+"""
+
+EWFVERIFY_OUTPUT = """\
+Verify started at: Oct 17, 2026 09:10:00
+This could take a while.
+
+Verify completed at: Oct 17, 2026 09:12:40
+
+Read: 2.3 GiB (2500000000 bytes) in 2 minute(s) and 40 second(s) with 14 MiB/s (15625000 bytes/second).
+
+MD5 hash stored in file:\t\td41d8cd98f00b204e9800998ecf8427e
+MD5 hash calculated over data:\t\t0cc175b9c0f1b6a831c399e269772661
+SHA1 hash stored in file:\t\tda39a3ee5e6b4b0d3255bfef95601890afd80709
+SHA1 hash calculated over data:\t\tda39a3ee5e6b4b0d3255bfef95601890afd80709
+
+ewfverify: FAILURE
+"""
+
+
+def test_dcfldd_hash_logs(tmp_path):
+    (tmp_path / 'md5.log').write_text(MD5_LOG)
+    (tmp_path / 'sha256.log').write_text(SHA256_LOG)
+
+    hashes, windows = imaging_api.parse_dcfldd_hash_logs(str(tmp_path), ('md5', 'sha256'))
+
+    assert hashes == {
+        'md5': 'd41d8cd98f00b204e9800998ecf8427e',
+        'sha256': 'e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855',
+    }
+    assert [(window['start'], window['end']) for window in windows] == [
+        (0, 1048576), (1048576, 2097152), (2097152, 2500000)]
+    assert windows[0]['hashes'] == {
+        'md5': '7f614da9329cd3aebf59b91aadc30bf0',
+        'sha256': '30e14955ebf1352266dc2ff8067e68104607e750abb9d3b36582b8af909fcb58',
+    }
+
+
+def test_missing_dcfldd_log_is_skipped(tmp_path):
+    (tmp_path / 'md5.log').write_text(MD5_LOG)
+
+    hashes, windows = imaging_api.parse_dcfldd_hash_logs(str(tmp_path), ('md5', 'sha1'))
+
+    assert list(hashes) == ['md5']
+    assert all(list(window['hashes']) == ['md5'] for window in windows)
+
+
+def test_ewfacquire_digests():
+    assert imaging_api.parse_ewf_digests(EWFACQUIRE_OUTPUT) == {
+        'md5': 'd41d8cd98f00b204e9800998ecf8427e',
+        'sha1': 'da39a3ee5e6b4b0d3255bfef95601890afd80709',
+        'sha256': 'e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855',
+    }
+
+
+def test_ewfverify_reports_calculated_digests_only():
+    assert imaging_api.parse_ewf_digests(EWFVERIFY_OUTPUT) == {
+        'md5': '0cc175b9c0f1b6a831c399e269772661',
+        'sha1': 'da39a3ee5e6b4b0d3255bfef95601890afd80709',
+    }
+
+
+def test_no_digests():
+    assert imaging_api.parse_ewf_digests('ewfacquire: unable to open device\n') == {}
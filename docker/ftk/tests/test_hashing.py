@@ -0,0 +1,56 @@
+import hashlib
+import mmap
+
+import pytest
+
+import imaging_api
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(imaging_api, 'HASH_CHUNK_SIZE', mmap.PAGESIZE)
+    return mmap.PAGESIZE
+
+
+@pytest.mark.parametrize('extra', [0, 1, 123])
+def test_digests_match_hashlib(tmp_path, small_chunks, extra):
+    # Three full chunks, then a short final read unless extra is 0
+    data = bytes(range(256)) * (3 * small_chunks // 256) + b'\xa5' * extra
+    path = tmp_path / 'image.dd'
+    path.write_bytes(data)
+
+    hashes = imaging_api.calculate_file_hashes(str(path), imaging_api.HASH_ALGORITHMS)
+
+    assert hashes == {name: hashlib.new(name, data).hexdigest() for name in imaging_api.HASH_ALGORITHMS}
+
+
+def test_selected_digests_only(tmp_path, small_chunks):
+    path = tmp_path / 'image.dd'
+    path.write_bytes(b'x' * (small_chunks + 7))
+
+    assert imaging_api.calculate_file_hashes(str(path), ('md5', 'sha256')) == {
+        'md5': hashlib.md5(b'x' * (small_chunks + 7)).hexdigest(),
+        'sha256': hashlib.sha256(b'x' * (small_chunks + 7)).hexdigest(),
+    }
+    assert imaging_api.calculate_file_hash(str(path)) == hashlib.sha256(b'x' * (small_chunks + 7)).hexdigest()
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / 'empty.dd'
+    path.write_bytes(b'')
+
+    assert imaging_api.calculate_file_hashes(str(path), ('sha1',)) == {'sha1': hashlib.sha1(b'').hexdigest()}
+
+
+def test_cancelled_hashing_stops(tmp_path, small_chunks):
+    path = tmp_path / 'image.dd'
+    path.write_bytes(b'x' * 4 * small_chunks)
+    checks = []
+
+    def cancelled():
+        checks.append(True)
+        return len(checks) > 2
+
+    with pytest.raises(imaging_api.JobCancelled):
+        imaging_api.calculate_file_hashes(str(path), ('sha256',), cancelled=cancelled)
+    assert len(checks) == 3
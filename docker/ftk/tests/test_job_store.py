@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import imaging_api
+
+
+@pytest.fixture
+def store(tmp_path):
+    return imaging_api.JobStore(str(tmp_path / 'jobs.db'))
+
+
+def finished(job, status='completed', days_ago=0):
+    job.status = status
+    job.completed_at = (datetime.now() - timedelta(days=days_ago)).isoformat()
+    return job
+
+
+def test_save_and_get(store, make_job):
+    job = make_job()
+    store.save(job)
+    assert store.get(job.job_id)['status'] == 'pending'
+
+    finished(job)
+    store.save(job)
+    assert store.get(job.job_id)['status'] == 'completed'
+    assert store.get('missing') is None
+
+
+def test_pages_are_newest_first_and_complete(store, make_job):
+    jobs = [make_job() for _ in range(5)]
+    for job in jobs:
+        store.save(job)
+
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = store.page(cursor=cursor, limit=2)
+        seen.extend(item['job_id'] for item in page)
+        if cursor is None:
+            break
+
+    assert seen == [job.job_id for job in reversed(jobs)]
+
+
+def test_page_filters(store, make_job):
+    jobs = [make_job(source='/dev/sda'), finished(make_job(source='/dev/sdb')),
+            finished(make_job(source='/dev/sda'), status='failed')]
+    for job in jobs:
+        store.save(job)
+
+    page, cursor = store.page(statuses=['completed', 'failed'])
+    assert [item['job_id'] for item in page] == [jobs[2].job_id, jobs[1].job_id]
+    assert cursor is None
+
+    page, _ = store.page(source='/dev/sda')
+    assert [item['job_id'] for item in page] == [jobs[2].job_id, jobs[0].job_id]
+
+    page, _ = store.page(since=datetime.now().isoformat())
+    assert page == []
+
+
+def test_purge_keeps_recent_and_unfinished_jobs(store, make_job):
+    old = finished(make_job(), days_ago=100)
+    recent = finished(make_job(), days_ago=1)
+    running = make_job()
+    running.status = 'running'
+    verifying = finished(make_job(), days_ago=100)
+    verifying.verification = {'status': 'running'}
+    for job in (old, recent, running, verifying):
+        store.save(job)
+
+    assert store.purge(retention_days=90) == 1
+    assert store.get(old.job_id) is None
+    assert all(store.get(job.job_id) for job in (recent, running, verifying))
+
+
+def test_recover_marks_interrupted_jobs(store, make_job):
+    queued = make_job()
+    running = make_job()
+    running.status = 'running'
+    verifying = finished(make_job())
+    verifying.verification = {'status': 'running'}
+    done = finished(make_job())
+    for job in (queued, running, verifying, done):
+        store.save(job)
+
+    assert store.recover() == 3
+
+    assert store.get(queued.job_id)['status'] == 'interrupted'
+    assert 'queued' in store.get(queued.job_id)['error']
+    assert 'running' in store.get(running.job_id)['error']
+    assert store.get(verifying.job_id)['status'] == 'completed'
+    assert store.get(verifying.job_id)['verification']['status'] == 'interrupted'
+    assert store.get(done.job_id)['status'] == 'completed'
+    page, _ = store.page(statuses=['pending', 'running'])
+    assert page == []
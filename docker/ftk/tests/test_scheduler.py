@@ -0,0 +1,175 @@
+import mmap
+
+import pytest
+
+import imaging_api
+
+
+@pytest.fixture
+def started(monkeypatch):
+    """Record dispatched jobs instead of running the imaging tools"""
+    jobs = []
+    monkeypatch.setattr(imaging_api, 'start_imaging_job', jobs.append)
+    monkeypatch.setattr(imaging_api, 'MAX_IMAGING_JOBS', 3)
+    monkeypatch.setattr(imaging_api, 'MAX_JOBS_PER_SOURCE', 1)
+    monkeypatch.setattr(imaging_api, 'MAX_JOBS_PER_DESTINATION', 2)
+    return jobs
+
+
+def test_global_limit(started, make_job):
+    scheduler = imaging_api.ImagingScheduler()
+    jobs = [make_job(source=f'/dev/sd{letter}', destination=f'fs-{letter}') for letter in 'abcd']
+    for job in jobs:
+        scheduler.submit(job)
+
+    assert started == jobs[:3]
+    assert scheduler.stats() == {'queued': 1, 'running': 3}
+    assert scheduler.position(jobs[3]) == 1
+
+    scheduler.release(jobs[0])
+    assert started == jobs
+    assert scheduler.position(jobs[3]) is None
+
+
+def test_busy_source_does_not_block_other_devices(started, make_job):
+    scheduler = imaging_api.ImagingScheduler()
+    first = make_job(source='/dev/sda', destination='fs-a')
+    same_source = make_job(source='/dev/sda', destination='fs-b')
+    other_source = make_job(source='/dev/sdb', destination='fs-c')
+    for job in (first, same_source, other_source):
+        scheduler.submit(job)
+
+    assert started == [first, other_source]
+    scheduler.release(first)
+    assert started == [first, other_source, same_source]
+
+
+def test_destination_limit(started, make_job):
+    scheduler = imaging_api.ImagingScheduler()
+    jobs = [make_job(source=f'/dev/sd{letter}', destination='fs-a') for letter in 'abc']
+    for job in jobs:
+        scheduler.submit(job)
+
+    assert started == jobs[:2]
+    scheduler.release(jobs[1])
+    assert started == jobs
+
+
+def test_priority_order(started, make_job):
+    scheduler = imaging_api.ImagingScheduler()
+    running = make_job(source='/dev/sda')
+    scheduler.submit(running)
+    low = make_job(source='/dev/sda', priority=0)
+    high = make_job(source='/dev/sda', priority=5)
+    scheduler.submit(low)
+    scheduler.submit(high)
+
+    assert scheduler.position(high) == 1
+    scheduler.release(running)
+    assert started == [running, high]
+
+
+def test_cancel_queued_job(started, make_job):
+    scheduler = imaging_api.ImagingScheduler()
+    running = make_job(source='/dev/sda')
+    queued = make_job(source='/dev/sda')
+    scheduler.submit(running)
+    scheduler.submit(queued)
+
+    assert scheduler.cancel(queued)
+    assert queued.status == 'cancelled'
+    assert queued.completed_at is not None
+    assert scheduler.stats() == {'queued': 0, 'running': 1}
+
+    scheduler.release(running)
+    assert started == [running]
+
+
+def test_cancel_running_job_kills_it(started, make_job):
+    scheduler = imaging_api.ImagingScheduler()
+    job = make_job()
+    scheduler.submit(job)
+    killed = []
+    job.kill = lambda: killed.append(True)
+
+    assert scheduler.cancel(job)
+    assert job.cancel_requested
+    assert killed == [True]
+
+
+def test_cancel_finished_job(started, make_job):
+    scheduler = imaging_api.ImagingScheduler()
+    job = make_job()
+    scheduler.submit(job)
+    scheduler.release(job)
+
+    assert not scheduler.cancel(job)
+
+
+@pytest.fixture
+def verifying(started, make_job, tmp_path, monkeypatch):
+    """A running dcfldd job whose image spans several hash chunks, with acquisition digests recorded"""
+    scheduler = imaging_api.ImagingScheduler()
+    monkeypatch.setattr(imaging_api, 'imaging_scheduler', scheduler)
+    monkeypatch.setattr(imaging_api, 'persist_job', lambda job: None)
+    monkeypatch.setattr(imaging_api, 'HASH_CHUNK_SIZE', mmap.PAGESIZE)
+
+    job = make_job(method='dcfldd')
+    job.verify = True
+    job.image_path = str(tmp_path / 'image.dd')
+    with open(job.image_path, 'wb') as f:
+        f.write(b'image' * mmap.PAGESIZE)
+    hashes = imaging_api.calculate_file_hashes(job.image_path, job.hash_algorithms)
+
+    def record(job, output):
+        job.hashes = dict(hashes)
+        job.hash_value = hashes['sha256']
+
+    monkeypatch.setattr(imaging_api, 'record_acquisition_hashes', record)
+    scheduler.submit(job)
+    job.status = 'running'
+    return scheduler, job
+
+
+def cancel_while_hashing(monkeypatch, scheduler, job, after=False):
+    """Have the verify pass request cancellation before or after it hashes the image"""
+    calculate_file_hashes = imaging_api.calculate_file_hashes
+
+    def hash_and_cancel(*args, **kwargs):
+        if not after:
+            assert scheduler.cancel(job)
+        hashes = calculate_file_hashes(*args, **kwargs)
+        if after:
+            assert scheduler.cancel(job)
+        return hashes
+
+    monkeypatch.setattr(imaging_api, 'calculate_file_hashes', hash_and_cancel)
+
+
+def test_cancel_during_verify(verifying, monkeypatch):
+    scheduler, job = verifying
+    cancel_while_hashing(monkeypatch, scheduler, job)
+
+    with pytest.raises(imaging_api.JobCancelled):
+        imaging_api.finish_imaging_job(job, '')
+    assert job.status == 'running'
+    assert job.verification['status'] == 'cancelled'
+
+
+def test_cancel_after_verify(verifying, monkeypatch):
+    scheduler, job = verifying
+    cancel_while_hashing(monkeypatch, scheduler, job, after=True)
+
+    with pytest.raises(imaging_api.JobCancelled):
+        imaging_api.finish_imaging_job(job, '')
+    assert job.verification['status'] == 'verified'
+    assert job.status == 'running'
+
+
+def test_completed_job_cannot_be_cancelled(verifying):
+    scheduler, job = verifying
+
+    imaging_api.finish_imaging_job(job, '')
+    assert job.status == 'completed'
+    assert not scheduler.cancel(job)
+    assert not job.cancel_requested
@@ -0,0 +1,185 @@
+"""
+Asynchronous analysis jobs for the Wireshark Analysis API
+
+Runs analysis requests on a bounded worker pool and keeps their results
+for polling.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from flask import current_app, g, jsonify
+
+from config import ANALYSIS_WORKERS, JOB_RETENTION, JOB_TSHARK_TIMEOUT
+from tshark_runner import current_client
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisJob:
+    """Represents an analysis request queued for the worker pool"""
+    def __init__(self, job_id, endpoint, params, client):
+        self.job_id = job_id
+        self.endpoint = endpoint
+        self.params = params
+        self.client = client
+        self.status = 'pending'
+        self.status_code = None
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.completed_at = None
+        self.queued_at = time.monotonic()
+        self.wait_seconds = None
+        self.finished = threading.Event()
+        self._waiters = []  # (loop, asyncio.Event) of coroutines waiting for the job
+        self._waiters_lock = threading.Lock()
+
+    def finish(self):
+        """Mark the job finished and wake threads and coroutines waiting for it"""
+        with self._waiters_lock:
+            self.finished.set()
+            waiters, self._waiters = self._waiters, []
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    async def wait_async(self, timeout):
+        """Wait up to timeout seconds for the job to finish without holding a thread"""
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self._waiters_lock:
+            if self.finished.is_set():
+                return
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._waiters_lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    def to_dict(self):
+        """Convert job to dictionary for JSON response"""
+        return {
+            'job_id': self.job_id,
+            'endpoint': self.endpoint,
+            'filename': self.params.get('filename'),
+            'status': self.status,
+            'status_code': self.status_code,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'completed_at': self.completed_at,
+            'wait_seconds': self.wait_seconds,
+            'result': self.result
+        }
+
+
+# Job tracking
+analysis_jobs = OrderedDict()
+analysis_job_lock = threading.Lock()
+analysis_executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix='analysis')
+_recent_waits = deque(maxlen=100)  # queue wait of recently started jobs, in seconds
+
+
+def run_analysis_job(app, job):
+    """
+    Execute a queued analysis job on a worker thread
+
+    The job is dispatched to the same view function that serves the
+    synchronous request, so async results are identical to sync ones; only
+    the tshark timeout is raised to JOB_TSHARK_TIMEOUT.
+
+    Args:
+        app (Flask): Application whose view functions serve the job
+        job (AnalysisJob): Job to execute
+    """
+    job.status = 'running'
+    job.started_at = datetime.now().isoformat()
+    job.wait_seconds = round(time.monotonic() - job.queued_at, 3)
+    with analysis_job_lock:
+        _recent_waits.append(job.wait_seconds)
+
+    try:
+        with app.test_request_context(job.endpoint, method='POST', json=job.params,
+                                      headers={'X-Client-Id': job.client}):
+            g.tshark_timeout = JOB_TSHARK_TIMEOUT
+            g.in_job = True
+            response = app.full_dispatch_request()
+
+        job.status_code = response.status_code
+        job.result = response.get_json()
+        if response.status_code >= 400:
+            job.status = 'failed'
+            job.error = (job.result or {}).get('error', f'HTTP {response.status_code}')
+        else:
+            job.status = 'completed'
+        logger.info(f"Analysis job {job.job_id} {job.status}")
+
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+        logger.error(f"Analysis job {job.job_id} failed: {str(e)}")
+    finally:
+        job.completed_at = datetime.now().isoformat()
+        job.finish()
+
+
+def submit_analysis_job(endpoint, data):
+    """
+    Queue an analysis request on the worker pool
+
+    Args:
+        endpoint (str): Request path of the analysis endpoint
+        data (dict): Request body
+
+    Returns:
+        tuple: (response, 202)
+    """
+    # A boolean 'stream' asks for NDJSON streaming; /follow uses an integer 'stream' as the stream index
+    params = {key: value for key, value in data.items()
+              if key != 'async' and not (key == 'stream' and isinstance(value, bool))}
+    job = AnalysisJob(str(uuid.uuid4()), endpoint, params, current_client())
+
+    with analysis_job_lock:
+        # Forget finished jobs past their retention period
+        cutoff = time.monotonic() - JOB_RETENTION
+        for job_id in [job_id for job_id, old in analysis_jobs.items()
+                       if old.finished.is_set() and old.queued_at < cutoff]:
+            del analysis_jobs[job_id]
+        analysis_jobs[job.job_id] = job
+
+    analysis_executor.submit(run_analysis_job, current_app._get_current_object(), job)
+    logger.info(f"Queued analysis job {job.job_id} for {endpoint}")
+
+    return jsonify({
+        'success': True,
+        'job_id': job.job_id,
+        'message': 'Analysis job queued',
+        'job': job.to_dict()
+    }), 202  # Accepted
+
+
+def analysis_queue_stats():
+    """Return queue depth and wait times of the analysis worker pool"""
+    with analysis_job_lock:
+        statuses = [job.status for job in analysis_jobs.values()]
+        waits = list(_recent_waits)
+    return {
+        'workers': ANALYSIS_WORKERS,
+        'queued': statuses.count('pending'),
+        'running': statuses.count('running'),
+        'completed': statuses.count('completed'),
+        'failed': statuses.count('failed'),
+        'average_wait_seconds': round(sum(waits) / len(waits), 3) if waits else 0.0,
+        'max_wait_seconds': max(waits) if waits else 0.0
+    }
@@ -0,0 +1,294 @@
+"""
+Result cache for the Wireshark Analysis API
+
+Analysis results are kept in two tiers, an in-memory LRU and JSON files on
+disk, keyed by capture identity so that a changed capture never serves
+stale results.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+from config import CACHE_DIR, CACHE_DISK_LIMIT, CACHE_MEMORY_LIMIT
+
+logger = logging.getLogger(__name__)
+
+
+def get_capture_identity(filepath):
+    """
+    Build an identity string for a capture file that changes whenever the file does
+
+    Args:
+        filepath (str): Path to capture file
+
+    Returns:
+        str: Identity derived from device, inode, size and modification time
+    """
+    stat = os.stat(filepath)
+    return f"{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def short_digest(value):
+    """Return a short hex digest for use in cache paths"""
+    return hashlib.sha256(value.encode('utf-8')).hexdigest()[:32]
+
+
+class ResultCache:
+    """
+    Two-tier cache for analysis results
+
+    Entries are keyed by capture identity, endpoint and normalized arguments.
+    The memory tier is an LRU bounded by serialized size; the disk tier lives
+    under CACHE_DIR as <path digest>/<identity digest>/<key>.json so that all
+    results for an outdated version of a capture can be dropped at once.
+    """
+    def __init__(self, root, memory_limit, disk_limit):
+        self.root = root
+        self.memory_limit = memory_limit
+        self.disk_limit = disk_limit
+        self._entries = OrderedDict()  # key -> (filepath, payload, size)
+        self._memory_bytes = 0
+        self._disk_bytes = None  # computed lazily on first write
+        self._identities = {}  # filepath -> identity digest
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def capture_dir(self, filepath):
+        """
+        Return the on-disk directory for the current version of a capture,
+        invalidating cached results for previous versions
+
+        Args:
+            filepath (str): Path to capture file
+
+        Returns:
+            str: Directory holding cached data for this capture version
+        """
+        identity = short_digest(get_capture_identity(filepath))
+        path_dir = os.path.join(self.root, short_digest(os.path.abspath(filepath)))
+
+        with self._lock:
+            known = self._identities.get(filepath)
+            self._identities[filepath] = identity
+            if known is not None and known != identity:
+                self._invalidate_locked(filepath, path_dir, keep=identity)
+
+        if known is None and os.path.isdir(path_dir):
+            # First sight of this capture since startup: drop stale versions on disk
+            with self._lock:
+                self._invalidate_locked(filepath, path_dir, keep=identity)
+
+        return os.path.join(path_dir, identity)
+
+    def _invalidate_locked(self, filepath, path_dir, keep):
+        """Drop memory entries for filepath and disk entries for other versions"""
+        stale = [key for key, entry in self._entries.items()
+                 if entry[0] == filepath and not key.startswith(keep)]
+        for key in stale:
+            self._memory_bytes -= self._entries.pop(key)[2]
+
+        removed = 0
+        if os.path.isdir(path_dir):
+            for name in os.listdir(path_dir):
+                if name == keep:
+                    continue
+                removed += _directory_size(os.path.join(path_dir, name))
+                shutil.rmtree(os.path.join(path_dir, name), ignore_errors=True)
+
+        if stale or removed:
+            self.invalidations += 1
+            if self._disk_bytes is not None:
+                self._disk_bytes = max(0, self._disk_bytes - removed)
+            logger.info(f"Invalidated cached results for {filepath}")
+
+    @staticmethod
+    def _key(identity_dir, endpoint, params):
+        """Build a cache key; keys are prefixed with the identity digest"""
+        identity = os.path.basename(identity_dir)
+        args = json.dumps(params, sort_keys=True, separators=(',', ':'))
+        return f"{identity}-{endpoint}-{short_digest(args)}"
+
+    def get(self, filepath, endpoint, params):
+        """
+        Look up a cached result
+
+        Args:
+            filepath (str): Path to capture file
+            endpoint (str): Endpoint name the result belongs to
+            params (dict): Normalized request arguments
+
+        Returns:
+            dict or None: Cached payload, or None on a miss
+        """
+        identity_dir = self.capture_dir(filepath)
+        key = self._key(identity_dir, endpoint, params)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        disk_path = os.path.join(identity_dir, f"{key}.json")
+        try:
+            with open(disk_path, 'rb') as f:
+                raw = f.read()
+            payload = json.loads(raw)
+            os.utime(disk_path)  # Refresh for LRU eviction on disk
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+            self._remember_locked(key, filepath, payload, len(raw))
+        return payload
+
+    def put(self, filepath, endpoint, params, payload):
+        """
+        Store a result in both tiers
+
+        Args:
+            filepath (str): Path to capture file
+            endpoint (str): Endpoint name the result belongs to
+            params (dict): Normalized request arguments
+            payload (dict): JSON-serializable result
+        """
+        identity_dir = self.capture_dir(filepath)
+        key = self._key(identity_dir, endpoint, params)
+        raw = json.dumps(payload).encode('utf-8')
+
+        with self._lock:
+            self._remember_locked(key, filepath, payload, len(raw))
+
+        self._write_disk(identity_dir, f"{key}.json", raw)
+
+    def get_variant(self, filepath, digest, encoding):
+        """
+        Look up a pre-compressed response body
+
+        Args:
+            filepath (str): Path to the capture the response belongs to
+            digest (str): Digest of the uncompressed body
+            encoding (str): Content coding, e.g. 'gzip'
+
+        Returns:
+            bytes or None: Compressed body, or None on a miss
+        """
+        disk_path = os.path.join(self.capture_dir(filepath), f"{digest}.{encoding}")
+        try:
+            with open(disk_path, 'rb') as f:
+                body = f.read()
+            os.utime(disk_path)
+        except OSError:
+            return None
+        return body
+
+    def put_variant(self, filepath, digest, encoding, body):
+        """Store a compressed response body next to the capture's cached results"""
+        self._write_disk(self.capture_dir(filepath), f"{digest}.{encoding}", body)
+
+    def _write_disk(self, identity_dir, name, raw):
+        """Atomically write a file to the disk tier and enforce its size limit"""
+        try:
+            os.makedirs(identity_dir, exist_ok=True)
+            disk_path = os.path.join(identity_dir, name)
+            tmp_path = f"{disk_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(raw)
+            os.replace(tmp_path, disk_path)
+        except OSError as e:
+            logger.warning(f"Could not write cache entry to disk: {str(e)}")
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = _directory_size(self.root)
+            else:
+                self._disk_bytes += len(raw)
+            if self._disk_bytes > self.disk_limit:
+                self._evict_disk_locked()
+
+    def _remember_locked(self, key, filepath, payload, size):
+        """Insert into the memory tier, evicting least recently used entries"""
+        if size > self.memory_limit:
+            return
+        if key in self._entries:
+            self._memory_bytes -= self._entries.pop(key)[2]
+        self._entries[key] = (filepath, payload, size)
+        self._memory_bytes += size
+
+        while self._memory_bytes > self.memory_limit:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            self.evictions += 1
+
+    def _evict_disk_locked(self):
+        """Remove least recently used disk entries until 90% of the limit"""
+        files = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        target = self.disk_limit * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.evictions += 1
+            except OSError:
+                pass
+        self._disk_bytes = total
+
+    def stats(self):
+        """Return cache counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'memory_entries': len(self._entries),
+                'memory_bytes': self._memory_bytes,
+                'memory_limit': self.memory_limit,
+                'disk_bytes': self._disk_bytes,
+                'disk_limit': self.disk_limit,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_ratio': round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+def _directory_size(path):
+    """Return the total size in bytes of all files below path"""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+result_cache = ResultCache(CACHE_DIR, CACHE_MEMORY_LIMIT, CACHE_DISK_LIMIT)
@@ -0,0 +1,1019 @@
+"""
+Capture reader and indexes for the Wireshark Analysis API
+
+Reads pcap and pcapng records directly, keeps per-capture frame indexes
+(record offsets and timings) and NumPy packet indexes (addresses, ports,
+protocols), and answers simple display filters from the packet index.
+"""
+
+import ipaddress
+import json
+import logging
+import mmap
+import os
+import re
+import socket
+import struct
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from flask import current_app, g
+
+try:
+    import numpy as np
+except ImportError:  # The packet index and its filter fast path are disabled without NumPy
+    np = None
+
+from capture_cache import result_cache
+from config import FRAME_INDEX_SLOTS, JOB_TSHARK_TIMEOUT
+from tshark_runner import run_tshark_command, stream_tshark_command
+
+logger = logging.getLogger(__name__)
+
+
+# Capture file formats understood by the frame index
+PCAP_MAGICS = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1e-6),
+    b'\xa1\xb2\xc3\xd4': ('>', 1e-6),
+    b'\x4d\x3c\xb2\xa1': ('<', 1e-9),
+    b'\xa1\xb2\x3c\x4d': ('>', 1e-9),
+}
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+FRAME_INDEX_MAGIC = b'FIDX1\n'
+LINK_TYPES = {
+    0: 'NULL',
+    1: 'ETHERNET',
+    101: 'RAW',
+    105: 'IEEE802_11',
+    113: 'LINUX_SLL',
+    127: 'IEEE802_11_RADIOTAP',
+    228: 'IPV4',
+    229: 'IPV6',
+    276: 'LINUX_SLL2',
+}
+
+
+class FrameIndex:
+    """
+    Location and timing of every frame in a capture file
+
+    Frame n (1-based) is stored at offsets[n - 1] and occupies
+    record_sizes[n - 1] bytes including its record header. Prepending
+    header to any selection of records yields a valid capture file,
+    which lets single frames or pages be dissected without reading the
+    rest of the capture.
+    """
+    def __init__(self, file_format, header, carvable=True):
+        self.file_format = file_format  # 'pcap' or 'pcapng'
+        self.header = header  # pcap global header, or pcapng SHB + IDBs
+        self.carvable = carvable  # False for multi-section pcapng files
+        self.offsets = array('Q')
+        self.record_sizes = array('I')
+        self.timestamps = array('d')
+        self.lengths = array('I')  # original frame length on the wire
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def append(self, offset, record_size, timestamp, length):
+        """Record the next frame"""
+        self.offsets.append(offset)
+        self.record_sizes.append(record_size)
+        self.timestamps.append(timestamp)
+        self.lengths.append(length)
+
+    def frame_info(self, number):
+        """Return offset, timestamp and length of frame number (1-based)"""
+        return {
+            'frame_number': number,
+            'offset': self.offsets[number - 1],
+            'timestamp': self.timestamps[number - 1],
+            'length': self.lengths[number - 1]
+        }
+
+    def payload(self, view, number):
+        """
+        Return the captured bytes of a frame, without its record header
+
+        Args:
+            view (buffer): The whole capture, e.g. an mmap of the file
+            number (int): 1-based frame number
+
+        Returns:
+            bytes: Captured packet data
+        """
+        offset = self.offsets[number - 1]
+        record = view[offset:offset + self.record_sizes[number - 1]]
+        if self.file_format == 'pcap':
+            return record[16:]
+        # Packet block types (2, 3, 6) have a non-zero first byte only when little-endian
+        endian = '<' if record[0] else '>'
+        block_type, = struct.unpack_from(endian + 'I', record, 0)
+        if block_type == 3:  # Simple Packet Block: original length, then data
+            length, = struct.unpack_from(endian + 'I', record, 8)
+            return record[12:12 + min(length, len(record) - 16)]
+        caplen, = struct.unpack_from(endian + 'I', record, 20)
+        return record[28:28 + caplen]
+
+    def save(self, path):
+        """Persist the index atomically"""
+        meta = json.dumps({
+            'format': self.file_format,
+            'carvable': self.carvable,
+            'count': len(self),
+            'header_size': len(self.header)
+        }).encode('utf-8')
+
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(FRAME_INDEX_MAGIC)
+            f.write(struct.pack('<I', len(meta)))
+            f.write(meta)
+            f.write(self.header)
+            for column in (self.offsets, self.record_sizes, self.timestamps, self.lengths):
+                column.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Load an index written by save()"""
+        with open(path, 'rb') as f:
+            if f.read(len(FRAME_INDEX_MAGIC)) != FRAME_INDEX_MAGIC:
+                raise ValueError(f"Not a frame index: {path}")
+            meta_size, = struct.unpack('<I', f.read(4))
+            meta = json.loads(f.read(meta_size))
+            index = cls(meta['format'], f.read(meta['header_size']), meta['carvable'])
+            for column in (index.offsets, index.record_sizes, index.timestamps, index.lengths):
+                column.fromfile(f, meta['count'])
+        return index
+
+
+def _pcapng_resolution(options, endian):
+    """Return the timestamp resolution from IDB options (default microseconds)"""
+    position = 0
+    while position + 4 <= len(options):
+        code, length = struct.unpack_from(endian + 'HH', options, position)
+        if code == 0:
+            break
+        if code == 9 and length >= 1:  # if_tsresol
+            value = options[position + 4]
+            return 2 ** -(value & 0x7F) if value & 0x80 else 10 ** -value
+        position += 4 + (length + 3) // 4 * 4
+    return 1e-6
+
+
+class CaptureReader:
+    """
+    Zero-copy reader for pcap and pcapng files
+
+    The file is memory-mapped and record headers are decoded in place with
+    struct.unpack_from, so walking a capture costs no subprocess and no
+    per-record copies. Packet data is exposed as memoryview slices, which
+    must not be kept after the reader is closed.
+    """
+    def __init__(self, filepath):
+        self._file = open(filepath, 'rb')
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            if size < 24:
+                raise ValueError('Unsupported capture format (file too small)')
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        self.view = memoryview(self._map)
+        self.size = size
+        magic = bytes(self.view[:4])
+        if magic in PCAP_MAGICS:
+            self.file_format = 'pcap'
+        elif magic == struct.pack('<I', PCAPNG_SHB):
+            self.file_format = 'pcapng'
+        else:
+            self.close()
+            raise ValueError('Unsupported capture format (expected pcap or pcapng)')
+
+        self.link_types = []  # link type of each interface, in order of appearance
+        self.sections = 0
+        self._header = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Release the mapping and the file"""
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+            self._map.close()
+            self._file.close()
+
+    @property
+    def header(self):
+        """Bytes to prepend to records to form a standalone capture"""
+        if self.file_format == 'pcap':
+            return bytes(self.view[:24])
+        return bytes(self._header)
+
+    def records(self, with_data=False):
+        """
+        Iterate over the packet records of the capture
+
+        Args:
+            with_data (bool): Also yield a memoryview of the captured bytes
+
+        Yields:
+            tuple: (offset, record_size, timestamp, length, interface, data)
+        """
+        if self.file_format == 'pcap':
+            return self._pcap_records(with_data)
+        return self._pcapng_records(with_data)
+
+    def _pcap_records(self, with_data):
+        """Walk the record headers of a classic pcap file"""
+        view = self.view
+        endian, resolution = PCAP_MAGICS[bytes(view[:4])]
+        self.link_types = [struct.unpack_from(endian + 'I', view, 20)[0] & 0xFFFF]
+        self.sections = 1
+        record = struct.Struct(endian + 'IIII')
+        size = self.size
+        data = None
+
+        offset = 24
+        while offset + 16 <= size:
+            seconds, fraction, caplen, length = record.unpack_from(view, offset)
+            end = offset + 16 + caplen
+            if end > size:
+                break  # Truncated final record
+            if with_data:
+                data = view[offset + 16:end]
+            yield offset, 16 + caplen, seconds + fraction * resolution, length, 0, data
+            offset = end
+
+    def _pcapng_records(self, with_data):
+        """Walk the blocks of a pcapng file"""
+        view = self.view
+        size = self.size
+        endian = '<'
+        resolutions = []
+        first_interface = 0  # interfaces of earlier sections in self.link_types
+        last_timestamp = 0.0
+        data = None
+
+        offset = 0
+        while offset + 12 <= size:
+            block_type, = struct.unpack_from(endian + 'I', view, offset)
+
+            if block_type == PCAPNG_SHB:
+                magic, = struct.unpack_from('<I', view, offset + 8)
+                endian = '<' if magic == PCAPNG_BYTE_ORDER_MAGIC else '>'
+                self.sections += 1
+                first_interface = len(self.link_types)
+                resolutions = []
+
+            block_size, = struct.unpack_from(endian + 'I', view, offset + 4)
+            if block_size < 12 or offset + block_size > size:
+                break  # Truncated or corrupt final block
+
+            if block_type == PCAPNG_SHB or block_type == 1:
+                if block_type == 1:  # Interface Description Block
+                    link_type, = struct.unpack_from(endian + 'H', view, offset + 8)
+                    self.link_types.append(link_type)
+                    resolutions.append(
+                        _pcapng_resolution(view[offset + 16:offset + block_size - 4], endian))
+                if self.sections == 1:
+                    self._header += view[offset:offset + block_size]
+            elif block_type == 6 or block_type == 2:  # Enhanced / obsolete Packet Block
+                if block_type == 6:
+                    interface, high, low, caplen, length = \
+                        struct.unpack_from(endian + 'IIIII', view, offset + 8)
+                else:
+                    interface, _, high, low, caplen, length = \
+                        struct.unpack_from(endian + 'HHIIII', view, offset + 8)
+                resolution = resolutions[interface] if interface < len(resolutions) else 1e-6
+                last_timestamp = ((high << 32) | low) * resolution
+                if with_data:
+                    data = view[offset + 28:offset + 28 + caplen]
+                yield (offset, block_size, last_timestamp, length,
+                       first_interface + interface, data)
+            elif block_type == 3:  # Simple Packet Block carries no timestamp
+                length, = struct.unpack_from(endian + 'I', view, offset + 8)
+                if with_data:
+                    data = view[offset + 12:offset + 12 + min(length, block_size - 16)]
+                yield offset, block_size, last_timestamp, length, first_interface, data
+
+            offset += block_size
+
+
+def build_frame_index(filepath):
+    """
+    Build a frame index by walking the record headers of a capture
+
+    Args:
+        filepath (str): Path to pcap or pcapng file
+
+    Returns:
+        FrameIndex: Index of all complete frames
+
+    Raises:
+        ValueError: If the file is not a pcap or pcapng capture
+    """
+    with CaptureReader(filepath) as reader:
+        index = FrameIndex(reader.file_format, b'')
+        for offset, record_size, timestamp, length, _, _ in reader.records():
+            index.append(offset, record_size, timestamp, length)
+        index.header = reader.header
+        index.carvable = reader.sections <= 1
+    return index
+
+
+def read_capture_metadata(filepath):
+    """
+    Compute capture metadata in-process from record headers alone
+
+    Args:
+        filepath (str): Path to pcap or pcapng file
+
+    Returns:
+        dict: Format, link types, packet count, byte totals, time span and rates
+
+    Raises:
+        ValueError: If the file is not a pcap or pcapng capture
+    """
+    count = 0
+    total_bytes = 0
+    first = last = None
+    per_second = {}
+
+    with CaptureReader(filepath) as reader:
+        for _, _, timestamp, length, _, _ in reader.records():
+            count += 1
+            total_bytes += length
+            if first is None:
+                first = timestamp
+            last = timestamp
+            second = int(timestamp)
+            per_second[second] = per_second.get(second, 0) + 1
+
+        file_format = reader.file_format
+        link_types = reader.link_types
+        sections = reader.sections
+
+    duration = (last - first) if count else 0.0
+    return {
+        'format': file_format,
+        'sections': sections,
+        'link_types': [
+            {'id': link_type, 'name': LINK_TYPES.get(link_type, 'UNKNOWN')}
+            for link_type in sorted(set(link_types))
+        ],
+        'packet_count': count,
+        'total_bytes': total_bytes,
+        'file_size': os.path.getsize(filepath),
+        'first_timestamp': first,
+        'last_timestamp': last,
+        'duration': duration,
+        'average_packet_size': round(total_bytes / count, 2) if count else 0,
+        'packets_per_second': round(count / duration, 3) if duration > 0 else float(count),
+        'bytes_per_second': round(total_bytes / duration, 3) if duration > 0 else float(total_bytes),
+        'peak_packets_per_second': max(per_second.values()) if per_second else 0
+    }
+
+
+_frame_indexes = OrderedDict()  # index path -> FrameIndex, most recently used last
+_frame_index_builds = {}  # index path -> Future of the (success, index, error) being loaded
+_frame_index_lock = threading.Lock()
+
+
+def load_frame_index(filepath):
+    """
+    Get the frame index of a capture, building and persisting it on first use
+
+    Indexes are stored as frames.idx in the capture's cache directory, so they
+    are invalidated together with cached results when the capture changes.
+    Loading or building happens outside the global lock: concurrent callers
+    for the same capture wait on a shared future, other captures proceed.
+
+    Args:
+        filepath (str): Path to capture file
+
+    Returns:
+        tuple: (success, index, error_message)
+    """
+    path = os.path.join(result_cache.capture_dir(filepath), 'frames.idx')
+
+    with _frame_index_lock:
+        index = _frame_indexes.get(path)
+        if index is not None:
+            _frame_indexes.move_to_end(path)
+            return True, index, None
+
+        future = _frame_index_builds.get(path)
+        if future is None:
+            future = _frame_index_builds[path] = Future()
+            owner = True
+        else:
+            owner = False
+
+    if not owner:
+        return future.result()
+
+    try:
+        result = _read_frame_index(filepath, path)
+        with _frame_index_lock:
+            if result[0]:
+                _frame_indexes[path] = result[1]
+                while len(_frame_indexes) > FRAME_INDEX_SLOTS:
+                    _frame_indexes.popitem(last=False)
+            _frame_index_builds.pop(path, None)
+    except BaseException as e:
+        with _frame_index_lock:
+            _frame_index_builds.pop(path, None)
+        future.set_exception(e)
+        raise
+    future.set_result(result)
+    return result
+
+
+def _read_frame_index(filepath, path):
+    """Load a persisted frame index, or build and persist it"""
+    try:
+        return True, FrameIndex.load(path), None
+    except (OSError, ValueError):
+        pass
+
+    try:
+        logger.info(f"Building frame index for {filepath}")
+        index = build_frame_index(filepath)
+    except (OSError, ValueError, struct.error) as e:
+        return False, None, f"Could not index capture: {str(e)}"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        index.save(path)
+    except OSError as e:
+        logger.warning(f"Could not persist frame index: {str(e)}")
+    return True, index, None
+
+
+def carve_frames(filepath, index, numbers, out):
+    """
+    Write the given frames of a capture as a standalone capture file
+
+    Args:
+        filepath (str): Path to source capture
+        index (FrameIndex): Frame index of the source capture
+        numbers (list): Ascending 1-based frame numbers to copy
+        out (file): Binary file object to write to
+    """
+    out.write(index.header)
+    with open(filepath, 'rb') as f:
+        position = 0
+        while position < len(numbers):
+            # Coalesce runs of adjacent records into a single read
+            start = index.offsets[numbers[position] - 1]
+            end = start + index.record_sizes[numbers[position] - 1]
+            position += 1
+            while position < len(numbers) and index.offsets[numbers[position] - 1] == end \
+                    and end - start < 4 * 1024 * 1024:
+                end += index.record_sizes[numbers[position] - 1]
+                position += 1
+            f.seek(start)
+            out.write(f.read(end - start))
+
+
+def dissect_in_capture(filepath, numbers, filters='', hex_dump=False):
+    """
+    Dissect selected frames in the context of the whole capture
+
+    tshark reads the original file from the start and only prints the
+    selection, so TCP analysis, reassembly and stream numbers are exactly
+    what a full-file dissection reports.
+
+    Args:
+        filepath (str): Path to capture file
+        numbers (list): Ascending 1-based frame numbers
+        filters (str): Optional display filter applied to the selection
+        hex_dump (bool): Include raw packet bytes
+
+    Returns:
+        tuple: (success, packets, stderr)
+    """
+    if not numbers:
+        return True, [], None
+
+    if numbers[-1] - numbers[0] + 1 == len(numbers):
+        selection = f"frame.number >= {numbers[0]} && frame.number <= {numbers[-1]}"
+    else:
+        selection = 'frame.number in {' + ' '.join(str(n) for n in numbers) + '}'
+    command = ['tshark', '-r', filepath, '-T', 'json']
+    if filters:
+        selection = f"({selection}) && ({filters})"
+    else:
+        # -c counts packets that pass -Y, so tshark stops right after the last selected frame
+        command.extend(['-c', str(len(numbers))])
+    command.extend(['-Y', selection])
+    if hex_dump:
+        command.append('-x')
+    success, stdout, stderr = run_tshark_command(command)
+    if not success:
+        return False, None, stderr
+    try:
+        return True, json.loads(stdout) if stdout else [], None
+    except json.JSONDecodeError:
+        return True, [], None
+
+
+def dissect_matches(filepath, filters, count, first=1):
+    """
+    Dissect the first frames matching a display filter in the context of the whole capture
+
+    -c counts packets that pass -Y in a single-pass read, so this returns
+    the first count matches at or after frame first, the same packets
+    dissect_in_capture returns for the first count frame numbers the
+    packet index matches.
+
+    Args:
+        filepath (str): Path to capture file
+        filters (str): Display filter; empty matches every frame
+        count (int): Maximum packets to return
+        first (int): Frame number to start from
+
+    Returns:
+        tuple: (success, packets, stderr)
+    """
+    selection = filters
+    if first > 1:
+        selection = f"frame.number >= {first} && ({filters})" if filters else f"frame.number >= {first}"
+    command = ['tshark', '-r', filepath, '-T', 'json', '-c', str(count)]
+    if selection:
+        command.extend(['-Y', selection])
+    success, stdout, stderr = run_tshark_command(command)
+    if not success:
+        return False, None, stderr
+    try:
+        return True, json.loads(stdout) if stdout else [], None
+    except json.JSONDecodeError:
+        return True, [], None
+
+
+def dissect_frames(filepath, index, numbers, filters='', hex_dump=False):
+    """
+    Dissect selected frames of a capture without reading the whole file
+
+    The frames are carved into a temporary capture and dissected there, then
+    their frame number and relative time are rewritten to match the original
+    capture. Each selection is dissected on its own, so state that depends on
+    earlier frames (TCP analysis, reassembly, stream numbers) only reflects
+    the selected frames.
+
+    Args:
+        filepath (str): Path to capture file
+        index (FrameIndex): Frame index of the capture
+        numbers (list): Ascending 1-based frame numbers
+        filters (str): Optional display filter applied to the selection
+        hex_dump (bool): Include raw packet bytes
+
+    Returns:
+        tuple: (success, packets, stderr)
+    """
+    if not numbers:
+        return True, [], None
+
+    extra = ['-x'] if hex_dump else []
+
+    if not index.carvable:
+        # Multi-section pcapng: select by frame number from the original file
+        return dissect_in_capture(filepath, numbers, filters, hex_dump)
+
+    with tempfile.NamedTemporaryFile(suffix=f".{index.file_format}") as carved:
+        carve_frames(filepath, index, numbers, carved)
+        carved.flush()
+
+        command = ['tshark', '-r', carved.name, '-T', 'json'] + extra
+        if filters:
+            command.extend(['-Y', filters])
+        success, stdout, stderr = run_tshark_command(command)
+
+    if not success:
+        return False, None, stderr
+
+    try:
+        packets = json.loads(stdout) if stdout else []
+    except json.JSONDecodeError:
+        packets = []
+
+    first_timestamp = index.timestamps[0]
+    for packet in packets:
+        frame = packet.get('_source', {}).get('layers', {}).get('frame', {})
+        try:
+            position = int(frame.get('frame.number', 0))
+        except (TypeError, ValueError):
+            continue
+        if 1 <= position <= len(numbers):
+            number = numbers[position - 1]
+            frame['frame.number'] = str(number)
+            frame['frame.time_relative'] = f"{index.timestamps[number - 1] - first_timestamp:.9f}"
+
+    return True, packets, None
+
+
+# Protocols tracked as bits of the packet index proto_mask column
+PROTOCOL_BITS = {name: 1 << bit for bit, name in enumerate([
+    'eth', 'arp', 'ip', 'ipv6', 'icmp', 'icmpv6', 'tcp', 'udp', 'dns', 'mdns', 'http',
+    'tls', 'ssh', 'ftp', 'smtp', 'pop', 'imap', 'dhcp', 'bootp', 'ntp', 'snmp', 'smb',
+    'smb2', 'nbns', 'quic', 'sctp', 'igmp', 'tftp', 'sip', 'kerberos', 'ldap', 'rdp',
+])}
+PACKET_INDEX_FIELDS = ['frame.number', 'ip.src', 'ip.dst', 'tcp.srcport', 'tcp.dstport',
+                       'udp.srcport', 'udp.dstport', 'frame.protocols']
+PACKET_INDEX_COLUMNS = ('timestamp', 'length', 'offset', 'src_ip', 'dst_ip',
+                        'src_port', 'dst_port', 'proto_mask')
+
+
+def _ipv4_to_int(address):
+    """Convert a dotted IPv4 address to an integer, or 0 if it is not one"""
+    try:
+        return struct.unpack('!I', socket.inet_aton(address))[0] if address.count('.') == 3 else 0
+    except OSError:
+        return 0
+
+
+class PacketIndex:
+    """
+    Per-packet columns of a capture stored as NumPy arrays
+
+    Row i describes frame i + 1. Addresses are IPv4 as integers (0 when the
+    packet has no IPv4 layer), ports come from TCP or UDP (0 when absent) and
+    proto_mask has one PROTOCOL_BITS bit per protocol in the frame.
+    """
+    def __init__(self, columns):
+        self.columns = columns
+        self.first_timestamp = float(columns['timestamp'][0]) if len(columns['timestamp']) else 0.0
+
+    def __len__(self):
+        return len(self.columns['timestamp'])
+
+    def save(self, directory):
+        """Write each column as a .npy file, then a marker so partial writes are ignored"""
+        os.makedirs(directory, exist_ok=True)
+        for name in PACKET_INDEX_COLUMNS:
+            np.save(os.path.join(directory, f"{name}.npy"), self.columns[name])
+        with open(os.path.join(directory, 'complete'), 'w') as f:
+            f.write(str(len(self)))
+
+    @classmethod
+    def load(cls, directory):
+        """Memory-map the columns of a saved index"""
+        if not os.path.exists(os.path.join(directory, 'complete')):
+            raise OSError(f"No complete packet index in {directory}")
+        return cls({
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+            for name in PACKET_INDEX_COLUMNS
+        })
+
+
+def build_packet_index(filepath, frame_index):
+    """
+    Build the columnar packet index with one tshark -T fields pass
+
+    Timestamps, lengths and offsets come from the frame index; addresses,
+    ports and protocols are read from tshark's output line by line into
+    preallocated arrays.
+
+    Args:
+        filepath (str): Path to capture file
+        frame_index (FrameIndex): Frame index of the capture
+
+    Returns:
+        tuple: (success, index, error_message)
+    """
+    count = len(frame_index)
+    columns = {
+        'timestamp': np.frombuffer(frame_index.timestamps, dtype=np.float64).copy(),
+        'length': np.frombuffer(frame_index.lengths, dtype=np.uint32).copy(),
+        'offset': np.frombuffer(frame_index.offsets, dtype=np.uint64).copy(),
+        'src_ip': np.zeros(count, dtype=np.uint32),
+        'dst_ip': np.zeros(count, dtype=np.uint32),
+        'src_port': np.zeros(count, dtype=np.uint16),
+        'dst_port': np.zeros(count, dtype=np.uint16),
+        'proto_mask': np.zeros(count, dtype=np.uint32),
+    }
+
+    command = ['tshark', '-r', filepath, '-T', 'fields', '-E', 'separator=/t', '-E', 'occurrence=f']
+    for field in PACKET_INDEX_FIELDS:
+        command.extend(['-e', field])
+
+    masks = {}  # frame.protocols string -> mask; protocol stacks repeat a lot
+    lines = stream_tshark_command(command, timeout=JOB_TSHARK_TIMEOUT)
+    try:
+        success, stderr = next(lines)
+        if not success:
+            return False, None, stderr
+
+        for line in lines:
+            values = line.decode('utf-8', errors='replace').rstrip('\n').split('\t')
+            if len(values) < len(PACKET_INDEX_FIELDS) or not values[0].isdigit():
+                continue
+            row = int(values[0]) - 1
+            if row >= count:
+                continue
+            src_ip, dst_ip, tcp_src, tcp_dst, udp_src, udp_dst, protocols = values[1:8]
+            columns['src_ip'][row] = _ipv4_to_int(src_ip)
+            columns['dst_ip'][row] = _ipv4_to_int(dst_ip)
+            src_port, dst_port = (tcp_src, tcp_dst) if tcp_src else (udp_src, udp_dst)
+            columns['src_port'][row] = int(src_port) if src_port.isdigit() else 0
+            columns['dst_port'][row] = int(dst_port) if dst_port.isdigit() else 0
+            mask = masks.get(protocols)
+            if mask is None:
+                mask = 0
+                for name in protocols.split(':'):
+                    mask |= PROTOCOL_BITS.get(name, 0)
+                masks[protocols] = mask
+            columns['proto_mask'][row] = mask
+    finally:
+        lines.close()
+
+    return True, PacketIndex(columns), None
+
+
+_packet_indexes = OrderedDict()  # index directory -> PacketIndex, most recently used last
+_packet_index_builds = {}  # index directory -> building thread
+_packet_index_lock = threading.Lock()
+
+
+def load_packet_index(filepath):
+    """
+    Get the packet index of a capture if it is ready
+
+    When no index exists yet, a background build is started and None is
+    returned so the caller falls back to tshark until the index is ready.
+
+    Args:
+        filepath (str): Path to capture file
+
+    Returns:
+        PacketIndex or None: Index, or None when NumPy is unavailable or the
+        index is not built yet
+    """
+    if np is None:
+        return None
+
+    directory = os.path.join(result_cache.capture_dir(filepath), 'packet_index')
+    with _packet_index_lock:
+        index = _packet_indexes.get(directory)
+        if index is not None:
+            _packet_indexes.move_to_end(directory)
+            return index
+
+        try:
+            index = PacketIndex.load(directory)
+        except (OSError, ValueError):
+            if directory not in _packet_index_builds:
+                # The build runs in an app context of its own so it can flag itself as a job
+                thread = threading.Thread(target=_build_packet_index_in_background,
+                                          args=(current_app._get_current_object(), filepath, directory),
+                                          daemon=True)
+                _packet_index_builds[directory] = thread
+                thread.start()
+            return None
+
+        _packet_indexes[directory] = index
+        while len(_packet_indexes) > FRAME_INDEX_SLOTS:
+            _packet_indexes.popitem(last=False)
+        return index
+
+
+def _build_packet_index_in_background(app, filepath, directory):
+    """Build and persist a packet index; runs on its own thread"""
+    try:
+        with app.app_context():
+            # Index builds wait for a tshark slot like async jobs do
+            g.in_job = True
+            success, frame_index, error = load_frame_index(filepath)
+            if success:
+                logger.info(f"Building packet index for {filepath}")
+                success, index, error = build_packet_index(filepath, frame_index)
+            if not success:
+                logger.error(f"Could not build packet index for {filepath}: {error}")
+                return
+            index.save(directory)
+            logger.info(f"Packet index ready for {filepath} ({len(index)} packets)")
+    except Exception as e:
+        logger.error(f"Packet index build failed for {filepath}: {str(e)}")
+    finally:
+        with _packet_index_lock:
+            _packet_index_builds.pop(directory, None)
+
+
+FILTER_TOKEN = re.compile(r'\s*(&&|\|\||==|!=|>=|<=|>|<|!|\(|\)|[A-Za-z0-9_.:/\-]+)')
+FILTER_OPERATORS = {
+    '==': '==', 'eq': '==', '!=': '!=', 'ne': '!=',
+    '>': '>', 'gt': '>', '>=': '>=', 'ge': '>=',
+    '<': '<', 'lt': '<', '<=': '<=', 'le': '<=',
+}
+
+
+class FilterPlanner:
+    """
+    Evaluate simple display filters as vectorized masks over a PacketIndex
+
+    Handles protocol names from PROTOCOL_BITS, comparisons on ip.addr,
+    ip.src, ip.dst (address or CIDR), tcp/udp port fields, frame.len,
+    frame.number, frame.time_relative and frame.time_epoch, combined with
+    and/or/not and parentheses. Anything else makes plan() return None so
+    the caller falls back to tshark.
+    """
+    def __init__(self, index):
+        self.index = index
+        self.columns = index.columns
+
+    def plan(self, filters):
+        """
+        Build the mask of packets matching a display filter
+
+        Args:
+            filters (str): Display filter (Wireshark syntax)
+
+        Returns:
+            numpy.ndarray or None: Boolean mask per packet, or None if the
+            filter is not supported
+        """
+        tokens = []
+        position = 0
+        text = filters.strip()
+        while position < len(text):
+            match = FILTER_TOKEN.match(text, position)
+            if not match:
+                return None
+            tokens.append(match.group(1))
+            position = match.end()
+
+        self._tokens = tokens
+        self._position = 0
+        try:
+            mask = self._or()
+        except (ValueError, KeyError, IndexError):
+            return None
+        if mask is None or self._position != len(tokens):
+            return None
+        return mask
+
+    def _peek(self):
+        return self._tokens[self._position] if self._position < len(self._tokens) else None
+
+    def _next(self):
+        token = self._peek()
+        self._position += 1
+        return token
+
+    def _or(self):
+        mask = self._and()
+        while mask is not None and self._peek() in ('||', 'or'):
+            self._next()
+            right = self._and()
+            mask = None if right is None else mask | right
+        return mask
+
+    def _and(self):
+        mask = self._not()
+        while mask is not None and self._peek() in ('&&', 'and'):
+            self._next()
+            right = self._not()
+            mask = None if right is None else mask & right
+        return mask
+
+    def _not(self):
+        if self._peek() in ('!', 'not'):
+            self._next()
+            mask = self._not()
+            return None if mask is None else ~mask
+        return self._primary()
+
+    def _primary(self):
+        token = self._next()
+        if token == '(':
+            mask = self._or()
+            if self._next() != ')':
+                return None
+            return mask
+
+        if self._peek() in FILTER_OPERATORS:
+            operator = FILTER_OPERATORS[self._next()]
+            return self._comparison(token, operator, self._next())
+
+        if token in PROTOCOL_BITS:
+            return (self.columns['proto_mask'] & PROTOCOL_BITS[token]) != 0
+        return None
+
+    @staticmethod
+    def _compare(column, operator, value):
+        if operator == '==':
+            return column == value
+        if operator == '!=':
+            return column != value
+        if operator == '>':
+            return column > value
+        if operator == '>=':
+            return column >= value
+        if operator == '<':
+            return column < value
+        return column <= value
+
+    def _comparison(self, field, operator, value):
+        columns = self.columns
+
+        if field in ('ip.addr', 'ip.src', 'ip.dst'):
+            # '!=' on multi-valued fields has surprising semantics in Wireshark; leave it to tshark
+            if operator not in ('==', '!='):
+                return None
+            network = ipaddress.IPv4Network(value, strict=False)
+            low = int(network.network_address)
+            high = low + network.num_addresses - 1
+
+            # Frames without an IPv4 layer store 0 in the address columns, so they must not match 0.0.0.0
+            present = (columns['proto_mask'] & PROTOCOL_BITS['ip']) != 0
+
+            def in_network(column):
+                return (column >= low) & (column <= high)
+
+            if field == 'ip.src':
+                mask = in_network(columns['src_ip'])
+            elif field == 'ip.dst':
+                mask = in_network(columns['dst_ip'])
+            elif operator == '!=':
+                return None
+            else:
+                mask = in_network(columns['src_ip']) | in_network(columns['dst_ip'])
+            return present & (mask if operator == '==' else ~mask)
+
+        transport, _, port_field = field.partition('.')
+        if transport in ('tcp', 'udp') and port_field in ('port', 'srcport', 'dstport'):
+            if operator == '!=' and port_field == 'port':
+                return None
+            port = int(value)
+            present = (columns['proto_mask'] & PROTOCOL_BITS[transport]) != 0
+            if port_field == 'srcport':
+                return present & self._compare(columns['src_port'], operator, port)
+            if port_field == 'dstport':
+                return present & self._compare(columns['dst_port'], operator, port)
+            return present & (self._compare(columns['src_port'], operator, port) |
+                              self._compare(columns['dst_port'], operator, port))
+
+        if field == 'frame.len':
+            return self._compare(columns['length'], operator, int(value))
+        if field == 'frame.number':
+            return self._compare(np.arange(1, len(self.index) + 1), operator, int(value))
+        if field == 'frame.time_relative':
+            return self._compare(columns['timestamp'] - self.index.first_timestamp, operator, float(value))
+        if field == 'frame.time_epoch':
+            return self._compare(columns['timestamp'], operator, float(value))
+        return None
+
+
+def filter_supported(filters):
+    """
+    Check whether the packet index can answer a display filter
+
+    Support depends only on the filter text, so callers can tell before the
+    index of a capture is built whether plan_filter will answer it.
+
+    Args:
+        filters (str): Display filter (Wireshark syntax)
+
+    Returns:
+        bool: True when FilterPlanner handles the filter
+    """
+    if np is None:
+        return False
+    empty = PacketIndex({
+        name: np.zeros(0, dtype=np.float64 if name == 'timestamp' else np.uint32)
+        for name in PACKET_INDEX_COLUMNS
+    })
+    return FilterPlanner(empty).plan(filters) is not None
+
+
+def plan_filter(filepath, filters):
+    """
+    Try to answer a display filter from the packet index
+
+    Args:
+        filepath (str): Path to capture file
+        filters (str): Display filter (Wireshark syntax)
+
+    Returns:
+        numpy.ndarray or None: Ascending 1-based matching frame numbers, or
+        None when tshark has to evaluate the filter
+    """
+    index = load_packet_index(filepath)
+    if index is None:
+        return None
+    mask = FilterPlanner(index).plan(filters)
+    if mask is None:
+        return None
+    return np.flatnonzero(mask) + 1
@@ -0,0 +1,114 @@
+"""
+Configuration of the Wireshark Analysis API
+"""
+
+import os
+import re
+from collections import OrderedDict
+
+SERVER_MODE = os.environ.get('API_SERVER', 'flask')  # 'flask' (development server) or 'asgi'
+EVIDENCE_DIR = '/evidence'
+OUTPUT_DIR = '/output'
+TSHARK_TIMEOUT = 60  # seconds
+MAX_PACKETS = 1000  # Maximum packets to return in analyze endpoint
+MAX_STREAM_PACKETS = 100000  # Maximum packets to return when streaming NDJSON
+STREAM_TIMEOUT = 600  # seconds a streaming tshark run may take in total
+CACHE_DIR = os.path.join(OUTPUT_DIR, 'cache')
+CACHE_MEMORY_LIMIT = 64 * 1024 * 1024  # bytes held in the in-memory LRU tier
+CACHE_DISK_LIMIT = 1024 * 1024 * 1024  # bytes held in the on-disk tier
+FRAME_INDEX_SLOTS = 8  # frame indexes kept loaded in memory
+PAGE_SIZE = 100  # default packets per page for cursor pagination
+MAX_SCAN_FRAMES = 50000  # frames a filtered page request may scan before returning
+MAX_FIELDS = 32  # Maximum fields in a projected /analyze request
+MAX_IO_BUCKETS = 10000  # Maximum buckets in an I/O graph response
+FIELD_NAME_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_.\-]*$')
+ANALYSIS_WORKERS = os.cpu_count() or 2  # worker threads for async analysis jobs
+JOB_TSHARK_TIMEOUT = 3600  # seconds a tshark run may take inside an async job
+JOB_RETENTION = 3600  # seconds finished async jobs are kept for polling
+MAX_LONG_POLL = 60  # seconds a job status request may wait for completion
+TSHARK_SLOTS = os.cpu_count() or 2  # tshark processes allowed to run at once
+MAX_TSHARK_QUEUE = 32  # requests allowed to wait for a tshark slot
+MAX_ADMISSION_WAIT = 30  # seconds a request may wait for a tshark slot
+SHARD_SIZE = 256 * 1024 * 1024  # bytes per shard when tables are computed in parallel
+SHARD_WORKERS = os.cpu_count() or 2  # shards analysed at once
+MAX_SHARDS = 64  # Maximum shards a client may request
+SHARDED_TAPS = ('conversations_tcp', 'conversations_udp', 'protocol_hierarchy', 'endpoints')
+CATALOG_PATH = os.path.join(OUTPUT_DIR, 'catalog.db')
+WATCH_POLL_INTERVAL = 10  # seconds between directory scans when inotify is unavailable
+WATCH_RESCAN_INTERVAL = 300  # seconds between safety rescans while inotify is active
+WATCH_SETTLE_SECONDS = 2  # seconds a file must stay unchanged before it is catalogued
+PREWARM_IDLE_CHECK = 2  # seconds between idle checks before warming caches
+SHARKD_SESSIONS = 8  # captures kept loaded in sharkd sessions
+SHARKD_MEMORY_BUDGET = 2 * 1024 * 1024 * 1024  # bytes of resident memory all sessions may use
+SHARKD_IDLE_TIMEOUT = 600  # seconds an unused session stays loaded
+SHARKD_METHODS = ('status', 'frames', 'frame', 'tap', 'follow', 'check', 'complete', 'intervals')
+ENGINES = ('tshark', 'sharkd')
+EXPORT_DIR = os.path.join(OUTPUT_DIR, 'exports')
+EXPORT_FORMATS = ('pcap', 'pcapng')
+EXPORT_NAME_PATTERN = re.compile(r'^[0-9a-f]{32}\.(pcap|pcapng)$')
+OBJECT_DIR = os.path.join(OUTPUT_DIR, 'objects')
+OBJECT_PROTOCOLS = ('http', 'smb', 'tftp', 'imf')  # --export-objects protocols extracted per capture
+# Fields that name the objects of each protocol, used to find their source frames
+OBJECT_FIELDS = OrderedDict([
+    ('http', ['http.response_for.uri', 'http.content_type']),
+    ('smb', ['smb.file', 'smb2.filename']),
+    ('tftp', ['tftp.source_file', 'tftp.destination_file']),
+    ('imf', ['imf.subject']),
+])
+OBJECT_HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+# Leading bytes of common file types, checked before guessing from the name
+OBJECT_MAGIC = (
+    (b'%PDF', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF8', 'image/gif'),
+    (b'PK\x03\x04', 'application/zip'),
+    (b'\x1f\x8b', 'application/gzip'),
+    (b'MZ', 'application/x-msdownload'),
+    (b'\x7fELF', 'application/x-executable'),
+    (b'\xd0\xcf\x11\xe0', 'application/x-ole-storage'),
+)
+SEARCH_INDEX_PATH = os.path.join(OUTPUT_DIR, 'search.db')
+# Indicator kinds and the tshark fields they are extracted from
+SEARCH_FIELDS = OrderedDict([
+    ('dns', ['dns.qry.name']),
+    ('http_host', ['http.host']),
+    ('http_uri', ['http.request.uri']),
+    ('user_agent', ['http.user_agent']),
+    ('sni', ['tls.handshake.extensions_server_name']),
+    ('ip', ['ip.src', 'ip.dst', 'ipv6.src', 'ipv6.dst']),
+])
+SEARCH_MULTI_VALUE_KINDS = ('dns', 'ip')  # fields that may occur several times per frame
+SEARCH_GRAM_MAX_BYTES = int(os.environ.get('SEARCH_GRAM_MAX_BYTES', 512 * 1024 * 1024))  # larger captures are scanned
+SEARCH_GRAM_FRAME_BYTES = 2048  # printable payload bytes per frame that are n-gram indexed
+SEARCH_GRAM_VERSION = 3  # bumped when the n-gram layout changes; older captures are re-indexed
+SEARCH_GRAM_BATCH_POSTINGS = 4 * 1024 * 1024  # n-gram postings held in memory before they are written out
+PRINTABLE_RUN = re.compile(rb'[\x20-\x7e]{3,}')
+MAX_SEARCH_FRAMES = 1000  # Maximum frame numbers returned per match
+ASGI_THREADS = 64  # threads running Flask views in ASGI mode; a view holds one for each blocking tshark call
+STREAM_READ_LIMIT = 16 * 1024 * 1024  # longest tshark output line accepted by async pipes
+STREAM_FIELDS = ['frame.number', 'tcp.stream', 'udp.stream', 'ip.src', 'ip.dst', 'ipv6.src', 'ipv6.dst',
+                 'tcp.srcport', 'tcp.dstport', 'udp.srcport', 'udp.dstport', 'tcp.seq', 'tcp.payload',
+                 'udp.payload']
+STREAM_DIR = os.path.join(OUTPUT_DIR, 'streams')  # reassembled stream stores, kept out of CACHE_DIR eviction
+FOLLOW_ENCODINGS = ('ascii', 'hex', 'raw')
+FOLLOW_PAGE_BYTES = 64 * 1024  # default stream bytes per /follow page
+MAX_FOLLOW_PAGE_BYTES = 1024 * 1024  # Maximum stream bytes per /follow page
+COMPRESS_MIN_BYTES = 1024  # smallest response body worth compressing
+ETAG_VERSION = '1'  # bump when response formats change so clients drop old ETags
+# View functions whose results depend only on a capture and the request arguments
+ETAG_VIEWS = ('analyze_pcap', 'get_statistics', 'get_protocols', 'get_summary', 'get_metadata',
+              'query_frames', 'get_io_graph', 'get_packets', 'get_packet', 'follow_stream', 'list_objects')
+CATALOG_SORT_COLUMNS = ('filename', 'size', 'modified', 'packet_count', 'duration', 'first_timestamp')
+
+# Statistics taps that can be computed together in a single tshark pass.
+# Each entry maps a tap name to its -z argument and the title line that
+# starts its section in tshark's output.
+SUMMARY_TAPS = OrderedDict([
+    ('conversations_tcp', ('conv,tcp', re.compile(r'^TCP Conversations$'))),
+    ('conversations_udp', ('conv,udp', re.compile(r'^UDP Conversations$'))),
+    ('protocol_hierarchy', ('io,phs', re.compile(r'^Protocol Hierarchy Statistics$'))),
+    ('endpoints', ('endpoints,ip', re.compile(r'^IPv4 Endpoints$'))),
+    ('io_stats', ('io,stat,1', re.compile(r'^\|\s*IO Statistics\s*\|$'))),
+    ('expert', ('expert', re.compile(r'^(Errors|Warnings|Notes|Chats|Comments) \(\d+\)$'))),
+])
@@ -0,0 +1,456 @@
+"""
+Evidence catalog and watcher for the Wireshark Analysis API
+
+Keeps a persistent catalog of the captures in EVIDENCE_DIR, follows the
+directory for new or changed captures and warms their caches while the
+service is idle.
+"""
+
+import contextlib
+import ctypes
+import hashlib
+import json
+import logging
+import os
+import select
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import g
+
+from capture_cache import get_capture_identity, result_cache
+from capture_index import load_frame_index, load_packet_index, read_capture_metadata
+from config import (CATALOG_PATH, EVIDENCE_DIR, JOB_TSHARK_TIMEOUT, PAGE_SIZE, PREWARM_IDLE_CHECK,
+                    SUMMARY_TAPS, WATCH_POLL_INTERVAL, WATCH_RESCAN_INTERVAL, WATCH_SETTLE_SECONDS)
+from search_index import search_index
+from summaries import load_summary
+from tshark_runner import tshark_admission
+
+logger = logging.getLogger(__name__)
+
+
+class EvidenceCatalog:
+    """
+    Persistent SQLite catalog of the captures in EVIDENCE_DIR
+
+    Each row records what is known about one capture version: file stats,
+    the facts read by read_capture_metadata(), a SHA-256 of the content and
+    how far background processing got ('pending', 'catalogued', 'warmed' or
+    'error').
+    """
+    def __init__(self, path):
+        self.path = path
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Open a connection for one transaction and close it afterwards"""
+        with contextlib.closing(self._open()) as connection, connection:
+            yield connection
+
+    def _open(self):
+        """Open a connection, creating the schema on first use"""
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        if not self._ready:
+            with self._lock:
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.executescript("""
+                    CREATE TABLE IF NOT EXISTS captures (
+                        filename TEXT PRIMARY KEY,
+                        size INTEGER NOT NULL,
+                        modified REAL NOT NULL,
+                        identity TEXT NOT NULL,
+                        status TEXT NOT NULL DEFAULT 'pending',
+                        format TEXT,
+                        link_types TEXT,
+                        packet_count INTEGER,
+                        total_bytes INTEGER,
+                        duration REAL,
+                        first_timestamp REAL,
+                        last_timestamp REAL,
+                        sha256 TEXT,
+                        error TEXT,
+                        updated_at TEXT
+                    );
+                    CREATE INDEX IF NOT EXISTS captures_size ON captures (size);
+                    CREATE INDEX IF NOT EXISTS captures_modified ON captures (modified);
+                    CREATE INDEX IF NOT EXISTS captures_packet_count ON captures (packet_count);
+                    CREATE INDEX IF NOT EXISTS captures_duration ON captures (duration);
+                    CREATE INDEX IF NOT EXISTS captures_first_timestamp ON captures (first_timestamp);
+                """)
+                self._ready = True
+        return connection
+
+    def identities(self):
+        """Return filename -> identity of every catalogued capture"""
+        with self._connect() as connection:
+            rows = connection.execute('SELECT filename, identity FROM captures').fetchall()
+        return {row['filename']: row['identity'] for row in rows}
+
+    def upsert(self, filename, stat):
+        """Record a new or changed capture; its facts are reset until processed again"""
+        identity = f"{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+        with self._connect() as connection:
+            connection.execute("""
+                INSERT OR REPLACE INTO captures (filename, size, modified, identity, status, updated_at)
+                VALUES (?, ?, ?, ?, 'pending', ?)
+            """, (filename, stat.st_size, stat.st_mtime, identity, datetime.now().isoformat()))
+
+    def update(self, filename, identity, **fields):
+        """Store processing results, unless the capture changed in the meantime"""
+        fields['updated_at'] = datetime.now().isoformat()
+        assignments = ', '.join(f'{column} = ?' for column in fields)
+        with self._connect() as connection:
+            connection.execute(
+                f'UPDATE captures SET {assignments} WHERE filename = ? AND identity = ?',
+                list(fields.values()) + [filename, identity])
+
+    def remove(self, filename):
+        """Forget a capture that was deleted"""
+        with self._connect() as connection:
+            connection.execute('DELETE FROM captures WHERE filename = ?', (filename,))
+
+    def sha256(self, filename, identity):
+        """Return the catalogued content hash of a capture version, or None"""
+        with self._connect() as connection:
+            row = connection.execute('SELECT sha256 FROM captures WHERE filename = ? AND identity = ?',
+                                     (filename, identity)).fetchone()
+        return row['sha256'] if row else None
+
+    def page(self, sort='filename', order='asc', limit=PAGE_SIZE, offset=0):
+        """
+        Return one page of captures
+
+        Args:
+            sort (str): Column from CATALOG_SORT_COLUMNS
+            order (str): 'asc' or 'desc'
+            limit (int): Maximum rows to return, or None for every row
+            offset (int): Rows to skip
+
+        Returns:
+            tuple: (rows, total)
+        """
+        direction = 'DESC' if order == 'desc' else 'ASC'
+        with self._connect() as connection:
+            total = connection.execute('SELECT COUNT(*) FROM captures').fetchone()[0]
+            rows = connection.execute(
+                f'SELECT * FROM captures ORDER BY {sort} IS NULL, {sort} {direction}, filename '
+                'LIMIT ? OFFSET ?', (-1 if limit is None else limit, offset)).fetchall()
+        return [self._row_to_dict(row) for row in rows], total
+
+    @staticmethod
+    def _row_to_dict(row):
+        """Convert a catalog row to the /files representation"""
+        entry = {key: row[key] for key in row.keys() if key not in ('identity', 'link_types')}
+        entry['link_types'] = json.loads(row['link_types']) if row['link_types'] else None
+        return entry
+
+
+class Inotify:
+    """
+    Minimal inotify binding through ctypes
+
+    Raises OSError on construction when inotify is unavailable, in which
+    case callers fall back to polling.
+    """
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, path, mask):
+        libc = ctypes.CDLL(None, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not supported on this platform')
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f'inotify_add_watch failed for {path}')
+
+    def read(self, timeout):
+        """
+        Wait for events
+
+        Args:
+            timeout (float): Seconds to wait
+
+        Returns:
+            list: (mask, name) per event; empty on timeout
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        buffer = os.read(self.fd, 64 * 1024)
+        events = []
+        position = 0
+        while position < len(buffer):
+            _, mask, _, length = self.EVENT_HEADER.unpack_from(buffer, position)
+            position += self.EVENT_HEADER.size
+            name = buffer[position:position + length].rstrip(b'\0')
+            position += length
+            events.append((mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class EvidenceWatcher:
+    """
+    Keep the catalog in sync with EVIDENCE_DIR and warm caches for new captures
+
+    A watch thread follows the directory with inotify (or periodic scans as
+    a fallback) and queues new or changed captures. A processing thread
+    catalogues each capture from its record headers and then, once no
+    tshark work is running or queued, hashes it and builds its frame index,
+    summary, packet index and search index entries so the first analysis
+    request is a cache hit.
+    """
+    def __init__(self, app, directory, catalog):
+        self.app = app
+        self.directory = directory
+        self.catalog = catalog
+        self.mode = None  # 'inotify' or 'polling' once started
+        self._pending = OrderedDict()  # filename -> time it becomes ready
+        self._cond = threading.Condition()
+        self._started = False
+
+    def start(self):
+        """Scan the directory once and start the background threads (idempotent)"""
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+
+        self.scan()
+        threading.Thread(target=self._watch, name='evidence-watch', daemon=True).start()
+        threading.Thread(target=self._process, name='evidence-prewarm', daemon=True).start()
+
+    def scan(self):
+        """Reconcile the catalog with the directory contents"""
+        known = self.catalog.identities()
+        present = set()
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            names = []
+
+        for filename in names:
+            filepath = os.path.join(self.directory, filename)
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                continue
+            if not os.path.isfile(filepath):
+                continue
+            present.add(filename)
+            identity = get_capture_identity(filepath)
+            if known.get(filename) != identity:
+                self.catalog.upsert(filename, stat)
+                self._enqueue(filename)
+            elif not search_index.is_current(filename, identity):
+                self._enqueue(filename)
+
+        for filename in set(known) - present:
+            self._forget(filename)
+
+    def _forget(self, filename):
+        """Drop a deleted capture from the catalog and the search index"""
+        self.catalog.remove(filename)
+        search_index.remove(filename)
+
+    def _enqueue(self, filename):
+        """Queue a capture for processing once it has settled"""
+        with self._cond:
+            self._pending[filename] = time.monotonic() + WATCH_SETTLE_SECONDS
+            self._pending.move_to_end(filename)
+            self._cond.notify()
+
+    def _watch(self):
+        """Follow directory changes; runs on its own thread"""
+        mask = Inotify.IN_CLOSE_WRITE | Inotify.IN_MOVED_TO | Inotify.IN_MOVED_FROM | Inotify.IN_DELETE
+        try:
+            inotify = Inotify(self.directory, mask)
+            self.mode = 'inotify'
+        except OSError as e:
+            logger.warning(f"inotify unavailable, polling {self.directory}: {str(e)}")
+            inotify = None
+            self.mode = 'polling'
+
+        last_scan = time.monotonic()
+        while True:
+            try:
+                if inotify is None:
+                    time.sleep(WATCH_POLL_INTERVAL)
+                    self.scan()
+                    continue
+
+                for event_mask, name in inotify.read(WATCH_RESCAN_INTERVAL):
+                    if event_mask & Inotify.IN_Q_OVERFLOW:
+                        self.scan()
+                    elif not name:
+                        continue
+                    elif event_mask & (Inotify.IN_DELETE | Inotify.IN_MOVED_FROM):
+                        self._forget(name)
+                    else:
+                        filepath = os.path.join(self.directory, name)
+                        if os.path.isfile(filepath):
+                            self.catalog.upsert(name, os.stat(filepath))
+                            self._enqueue(name)
+
+                # Rescan now and then in case events were missed (e.g. network mounts)
+                if time.monotonic() - last_scan >= WATCH_RESCAN_INTERVAL:
+                    self.scan()
+                    last_scan = time.monotonic()
+            except Exception as e:
+                logger.error(f"Evidence watcher error: {str(e)}")
+                time.sleep(WATCH_POLL_INTERVAL)
+
+    def _next(self):
+        """Block until a queued capture has settled and return its name"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                for filename, ready_at in self._pending.items():
+                    if ready_at <= now:
+                        del self._pending[filename]
+                        return filename
+                wait = min(self._pending.values()) - now if self._pending else None
+                self._cond.wait(wait)
+
+    def _process(self):
+        """Catalogue and pre-warm queued captures; runs on its own thread"""
+        while True:
+            filename = self._next()
+            try:
+                self.process(filename)
+            except Exception as e:
+                logger.error(f"Could not process {filename}: {str(e)}")
+
+    def process(self, filename):
+        """
+        Catalogue one capture and warm its caches
+
+        Args:
+            filename (str): Capture name relative to the evidence directory
+        """
+        filepath = os.path.join(self.directory, filename)
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return
+        if time.time() - stat.st_mtime < WATCH_SETTLE_SECONDS:
+            # Still being written; look again later
+            self._enqueue(filename)
+            return
+
+        identity = get_capture_identity(filepath)
+
+        try:
+            metadata = read_capture_metadata(filepath)
+        except (ValueError, struct.error) as e:
+            # Formats tshark reads but the record parser does not are still warmed below
+            metadata = None
+            self.catalog.update(filename, identity, status='catalogued', error=str(e))
+        else:
+            result_cache.put(filepath, 'metadata', {}, {
+                'success': True,
+                'filename': filename,
+                'metadata': metadata
+            })
+            self.catalog.update(
+                filename, identity,
+                status='catalogued',
+                format=metadata['format'],
+                link_types=json.dumps(metadata['link_types']),
+                packet_count=metadata['packet_count'],
+                total_bytes=metadata['total_bytes'],
+                duration=metadata['duration'],
+                first_timestamp=metadata['first_timestamp'],
+                last_timestamp=metadata['last_timestamp'],
+                error=None
+            )
+            logger.info(f"Catalogued {filename} ({metadata['packet_count']} packets)")
+
+        # Hash the content and warm caches only while the service has nothing else to do
+        while True:
+            stats = tshark_admission.stats()
+            if stats['active'] == 0 and stats['queued'] == 0:
+                break
+            time.sleep(PREWARM_IDLE_CHECK)
+
+        self.catalog.update(filename, identity, sha256=capture_sha256(filepath))
+
+        with self.app.app_context():
+            g.in_job = True
+            g.tshark_timeout = JOB_TSHARK_TIMEOUT
+            success, _, stderr, _ = load_summary(filepath, filename, list(SUMMARY_TAPS))
+            if metadata is not None:
+                load_frame_index(filepath)
+                load_packet_index(filepath)
+            if success and not search_index.is_current(filename, identity):
+                success, stderr = search_index.index_capture(filepath, filename)
+        if success:
+            self.catalog.update(filename, identity, status='warmed')
+            logger.info(f"Pre-warmed analysis caches for {filename}")
+        else:
+            self.catalog.update(filename, identity, status='error', error=stderr)
+            logger.warning(f"Could not pre-warm {filename}: {stderr}")
+
+
+evidence_catalog = EvidenceCatalog(CATALOG_PATH)
+
+
+def known_capture_sha256(filepath):
+    """
+    Return the SHA-256 of a capture's content if it was already computed
+
+    Args:
+        filepath (str): Path to capture file
+
+    Returns:
+        str or None: Hex digest from the evidence catalog or the result cache
+    """
+    filename = os.path.relpath(filepath, EVIDENCE_DIR)
+    digest = evidence_catalog.sha256(filename, get_capture_identity(filepath))
+    if digest:
+        return digest
+
+    cached = result_cache.get(filepath, 'sha256', {})
+    return cached['sha256'] if cached is not None else None
+
+
+def capture_sha256(filepath):
+    """
+    Return the SHA-256 of a capture's content
+
+    The evidence catalog usually has it already; otherwise it is computed
+    once and kept in the result cache.
+
+    Args:
+        filepath (str): Path to capture file
+
+    Returns:
+        str: Hex digest
+    """
+    digest = known_capture_sha256(filepath)
+    if digest:
+        return digest
+
+    sha256 = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    result_cache.put(filepath, 'sha256', {}, {'sha256': sha256.hexdigest()})
+    return sha256.hexdigest()
@@ -0,0 +1,113 @@
+"""
+I/O graph computation for the Wireshark Analysis API
+
+Buckets packet timestamps and lengths into time series with NumPy, overall
+or split by conversation or protocol.
+"""
+
+import socket
+import struct
+
+try:
+    import numpy as np
+except ImportError:  # /io-graph answers 501 without NumPy
+    np = None
+
+from capture_index import PROTOCOL_BITS
+
+
+def conversation_labels(columns, selection):
+    """
+    Assign each selected packet a conversation id
+
+    Returns:
+        tuple: (ids per packet, -1 for non-IPv4; list of labels per id)
+    """
+    src = (columns['src_ip'][selection].astype(np.uint64) << np.uint64(16)) | columns['src_port'][selection]
+    dst = (columns['dst_ip'][selection].astype(np.uint64) << np.uint64(16)) | columns['dst_port'][selection]
+    keys = np.stack([np.minimum(src, dst), np.maximum(src, dst)], axis=1)
+    has_ip = columns['src_ip'][selection] != 0
+
+    ids = np.full(len(keys), -1, dtype=np.int64)
+    if not has_ip.any():
+        return ids, []
+    unique, inverse = np.unique(keys[has_ip], axis=0, return_inverse=True)
+    ids[has_ip] = inverse.reshape(-1)
+
+    def endpoint(value):
+        value = int(value)
+        address = socket.inet_ntoa(struct.pack('!I', value >> 16))
+        return f"{address}:{value & 0xFFFF}" if value & 0xFFFF else address
+
+    return ids, [f"{endpoint(a)} <-> {endpoint(b)}" for a, b in unique]
+
+
+def protocol_labels(columns, selection):
+    """
+    Assign each selected packet its most specific protocol from PROTOCOL_BITS
+
+    Returns:
+        tuple: (ids per packet, -1 when no tracked protocol; list of labels)
+    """
+    masks = columns['proto_mask'][selection]
+    names = list(PROTOCOL_BITS)
+    ids = np.full(len(masks), -1, dtype=np.int64)
+    # PROTOCOL_BITS lists lower layers first, so walk it backwards
+    for position in range(len(names) - 1, -1, -1):
+        unassigned = ids < 0
+        ids[unassigned & ((masks & PROTOCOL_BITS[names[position]]) != 0)] = position
+    return ids, names
+
+
+def compute_io_graph(timestamps, lengths, start, end, interval, labels=None, names=None, top=10):
+    """
+    Bin packets and bytes into fixed-width time buckets with NumPy
+
+    Args:
+        timestamps (numpy.ndarray): Relative timestamps of the selected packets
+        lengths (numpy.ndarray): Frame lengths of the selected packets
+        start (float): Relative time of the first bucket
+        end (float): Relative time where the last bucket ends
+        interval (float): Bucket width in seconds
+        labels (numpy.ndarray, optional): Group id per packet (-1 for none)
+        names (list, optional): Group id -> label
+        top (int): Number of groups to report separately; the rest are 'other'
+
+    Returns:
+        dict: Totals per bucket, and per-group series when labels are given
+    """
+    buckets = max(1, int(np.ceil((end - start) / interval)))
+    bins = np.minimum(((timestamps - start) / interval).astype(np.int64), buckets - 1)
+    weights = lengths.astype(np.float64)
+
+    result = {
+        'buckets': buckets,
+        'packets': np.bincount(bins, minlength=buckets).tolist(),
+        'bytes': np.bincount(bins, weights=weights, minlength=buckets).astype(np.int64).tolist()
+    }
+    if labels is None:
+        return result
+
+    # Rank groups by bytes and fold everything past top into 'other'
+    grouped = labels >= 0
+    totals = np.bincount(labels[grouped], weights=weights[grouped], minlength=len(names))
+    ranked = [group for group in np.argsort(-totals, kind='stable') if totals[group] > 0][:top]
+    slot = np.full(len(names) + 1, len(ranked), dtype=np.int64)
+    slot[ranked] = np.arange(len(ranked))
+    group_slots = slot[labels]  # -1 labels index the trailing 'other' slot
+
+    cells = group_slots * buckets + bins
+    size = (len(ranked) + 1) * buckets
+    packets = np.bincount(cells, minlength=size).reshape(len(ranked) + 1, buckets)
+    volume = np.bincount(cells, weights=weights, minlength=size).reshape(len(ranked) + 1, buckets)
+
+    result['groups'] = [
+        {
+            'key': names[group] if position < len(ranked) else 'other',
+            'packets': packets[position].tolist(),
+            'bytes': volume[position].astype(np.int64).tolist()
+        }
+        for position, group in enumerate(list(ranked) + [None])
+        if position < len(ranked) or packets[position].any()
+    ]
+    return result
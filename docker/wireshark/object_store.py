@@ -0,0 +1,277 @@
+"""
+Exported-objects store for the Wireshark Analysis API
+
+Extracts HTTP, SMB, TFTP and IMF objects from captures into a
+content-addressed store with a SQLite catalog.
+"""
+
+import contextlib
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+from collections import deque
+from datetime import datetime
+from urllib.parse import unquote
+
+from config import JOB_TSHARK_TIMEOUT, OBJECT_DIR, OBJECT_FIELDS, OBJECT_MAGIC, OBJECT_PROTOCOLS
+from tshark_runner import stream_tshark_command
+
+logger = logging.getLogger(__name__)
+
+
+def _object_key(name):
+    """
+    Reduce an object name to the part tshark and the dissector fields agree on
+
+    tshark names exported files after the last path component, escapes
+    characters that are not allowed in file names and appends "(n)" to
+    duplicates, so only letters, digits and dots are compared.
+    """
+    name = re.split(r'[\\/]', unquote(name).split('?')[0])[-1]
+    name = re.sub(r'\(\d+\)(?=\.[^.]*$|$)', '', name)
+    return re.sub(r'[^0-9a-z.]', '', name.lower())
+
+
+def sniff_mime_type(path, name, declared=None):
+    """Guess an object's MIME type from its leading bytes, then the declared type, then its name"""
+    with open(path, 'rb') as f:
+        head = f.read(16)
+    for magic, mime_type in OBJECT_MAGIC:
+        if head.startswith(magic):
+            return mime_type
+    return declared or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+class ObjectStore:
+    """
+    Content-addressed store of files exported from captures
+
+    Objects are stored once under OBJECT_DIR/<aa>/<sha256> however many
+    captures they were found in. objects.db records the objects, which
+    captures (by content hash) have been extracted, and which objects each
+    capture yielded with protocol, name and source frame.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, 'objects.db')
+        self._ready = False
+        self._lock = threading.Lock()
+        self._extracting = {}  # capture sha256 -> lock held while it is extracted
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Open a connection for one transaction and close it afterwards"""
+        with contextlib.closing(self._open()) as connection, connection:
+            yield connection
+
+    def _open(self):
+        """Open a connection, creating the schema on first use"""
+        os.makedirs(self.directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        if not self._ready:
+            with self._lock:
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.executescript("""
+                    CREATE TABLE IF NOT EXISTS objects (
+                        sha256 TEXT PRIMARY KEY,
+                        size INTEGER NOT NULL,
+                        mime_type TEXT NOT NULL,
+                        stored_at TEXT
+                    );
+                    CREATE TABLE IF NOT EXISTS extractions (
+                        capture_sha256 TEXT PRIMARY KEY,
+                        filename TEXT,
+                        object_count INTEGER NOT NULL,
+                        extracted_at TEXT
+                    );
+                    CREATE TABLE IF NOT EXISTS capture_objects (
+                        capture_sha256 TEXT NOT NULL,
+                        position INTEGER NOT NULL,
+                        protocol TEXT NOT NULL,
+                        name TEXT NOT NULL,
+                        sha256 TEXT NOT NULL,
+                        frame INTEGER,
+                        content_type TEXT,
+                        PRIMARY KEY (capture_sha256, position)
+                    );
+                    CREATE INDEX IF NOT EXISTS capture_objects_sha256 ON capture_objects (sha256);
+                """)
+                self._ready = True
+        return connection
+
+    def object_path(self, sha256):
+        """Return where an object with this hash is stored"""
+        return os.path.join(self.directory, sha256[:2], sha256)
+
+    def get(self, sha256):
+        """Return an object's row, or None"""
+        with self._connect() as connection:
+            row = connection.execute('SELECT * FROM objects WHERE sha256 = ?', (sha256,)).fetchone()
+        return dict(row) if row else None
+
+    def is_extracted(self, capture_hash):
+        """Return whether a capture's objects are already in the store"""
+        with self._connect() as connection:
+            return connection.execute('SELECT 1 FROM extractions WHERE capture_sha256 = ?',
+                                      (capture_hash,)).fetchone() is not None
+
+    def extract(self, filepath, filename, capture_hash):
+        """
+        Export the objects of every protocol in OBJECT_PROTOCOLS in one tshark pass
+
+        The same pass prints the fields that name each object so exported
+        files can be matched to their source frames. Exported files are
+        hashed and moved into the store; files already stored are dropped.
+
+        Args:
+            filepath (str): Path to capture file
+            filename (str): Capture name relative to the evidence directory
+            capture_hash (str): SHA-256 of the capture content
+
+        Returns:
+            tuple: (success, error_message)
+        """
+        with self._lock:
+            capture_lock = self._extracting.setdefault(capture_hash, threading.Lock())
+        with capture_lock:
+            if self.is_extracted(capture_hash):
+                return True, None
+            os.makedirs(self.directory, exist_ok=True)
+            work_dir = tempfile.mkdtemp(prefix='extract-', dir=self.directory)
+            try:
+                return self._extract(filepath, filename, capture_hash, work_dir)
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+                with self._lock:
+                    self._extracting.pop(capture_hash, None)
+
+    def _extract(self, filepath, filename, capture_hash, work_dir):
+        command = ['tshark', '-r', filepath]
+        for protocol in OBJECT_PROTOCOLS:
+            command.extend(['--export-objects', f"{protocol},{os.path.join(work_dir, protocol)}"])
+        # The display filter only limits the printed fields; export taps see every packet
+        command.extend(['-Y', 'http.response_for.uri || smb.file || smb2.filename || tftp || imf',
+                        '-T', 'fields', '-E', 'separator=/t', '-E', 'occurrence=f', '-e', 'frame.number'])
+        for fields in OBJECT_FIELDS.values():
+            for field in fields:
+                command.extend(['-e', field])
+
+        # (protocol, name key) -> source frames with the declared content type, in capture order
+        sources = {}
+        lines = stream_tshark_command(command, timeout=JOB_TSHARK_TIMEOUT)
+        try:
+            success, stderr = next(lines)
+            if not success:
+                return False, stderr
+            for line in lines:
+                values = line.decode('utf-8', errors='replace').rstrip('\n').split('\t')
+                if not values[0].isdigit():
+                    continue
+                frame = int(values[0])
+                (uri, content_type, smb_file, smb2_file, tftp_source, tftp_destination,
+                 subject) = (values[1:] + [''] * 7)[:7]
+                for protocol, name in (('http', uri), ('smb', smb_file or smb2_file),
+                                       ('tftp', tftp_source or tftp_destination), ('imf', subject)):
+                    if name:
+                        sources.setdefault((protocol, _object_key(name)), deque()).append(
+                            (frame, (content_type.split(';')[0].strip() or None) if protocol == 'http' else None))
+        finally:
+            lines.close()
+
+        stored_at = datetime.now().isoformat()
+        entries = []
+        objects = {}
+        for protocol in OBJECT_PROTOCOLS:
+            protocol_dir = os.path.join(work_dir, protocol)
+            if not os.path.isdir(protocol_dir):
+                continue
+            # tshark numbers duplicate names in capture order, so sorting keeps the frame order
+            for name in sorted(os.listdir(protocol_dir), key=lambda name: (len(name), name)):
+                path = os.path.join(protocol_dir, name)
+                sha256 = hashlib.sha256()
+                size = 0
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                        sha256.update(chunk)
+                        size += len(chunk)
+                digest = sha256.hexdigest()
+
+                candidates = sources.get((protocol, _object_key(name)))
+                frame, content_type = candidates.popleft() if candidates else (None, None)
+                if protocol == 'imf':
+                    content_type = 'message/rfc822'
+
+                if digest not in objects:
+                    objects[digest] = (size, sniff_mime_type(path, name, content_type))
+                    target = self.object_path(digest)
+                    if not os.path.exists(target):
+                        os.makedirs(os.path.dirname(target), exist_ok=True)
+                        os.replace(path, target)
+                entries.append((protocol, name, digest, frame, content_type))
+
+        # List objects by source frame; unmatched ones go last
+        entries.sort(key=lambda entry: (entry[3] is None, entry[3] or 0))
+        with self._connect() as connection:
+            connection.executemany(
+                'INSERT OR IGNORE INTO objects (sha256, size, mime_type, stored_at) VALUES (?, ?, ?, ?)',
+                [(digest, size, mime_type, stored_at) for digest, (size, mime_type) in objects.items()])
+            connection.execute('DELETE FROM capture_objects WHERE capture_sha256 = ?', (capture_hash,))
+            connection.executemany(
+                'INSERT INTO capture_objects (capture_sha256, position, protocol, name, sha256, frame, '
+                'content_type) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(capture_hash, position) + entry for position, entry in enumerate(entries)])
+            connection.execute(
+                'INSERT OR REPLACE INTO extractions (capture_sha256, filename, object_count, extracted_at) '
+                'VALUES (?, ?, ?, ?)', (capture_hash, filename, len(entries), stored_at))
+
+        logger.info(f"Extracted {len(entries)} objects ({len(objects)} distinct) from {filename}")
+        return True, None
+
+    def list(self, capture_hash, protocol=None, limit=None, offset=0):
+        """
+        List the objects extracted from a capture
+
+        Args:
+            capture_hash (str): SHA-256 of the capture content
+            protocol (str, optional): Only objects of this protocol
+            limit (int, optional): Maximum objects to return
+            offset (int): Objects to skip
+
+        Returns:
+            tuple: (objects, total)
+        """
+        where = 'WHERE c.capture_sha256 = ?'
+        params = [capture_hash]
+        if protocol:
+            where += ' AND c.protocol = ?'
+            params.append(protocol)
+        with self._connect() as connection:
+            total = connection.execute(f'SELECT COUNT(*) FROM capture_objects c {where}', params).fetchone()[0]
+            rows = connection.execute(
+                f"""SELECT c.protocol, c.name, c.sha256, c.frame, c.content_type, o.size, o.mime_type,
+                           (SELECT COUNT(DISTINCT capture_sha256) FROM capture_objects
+                            WHERE sha256 = c.sha256) AS captures
+                    FROM capture_objects c JOIN objects o ON o.sha256 = c.sha256
+                    {where} ORDER BY c.position LIMIT ? OFFSET ?""",
+                params + [-1 if limit is None else limit, offset]).fetchall()
+        return [dict(row) for row in rows], total
+
+    def stats(self):
+        """Return store sizes for monitoring"""
+        with self._connect() as connection:
+            row = connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects').fetchone()
+            return {
+                'objects': row[0],
+                'bytes': row[1],
+                'captures': connection.execute('SELECT COUNT(*) FROM extractions').fetchone()[0]
+            }
+
+
+object_store = ObjectStore(OBJECT_DIR)
@@ -0,0 +1,394 @@
+"""
+Search index for the Wireshark Analysis API
+
+Persistent inverted index of indicators and payload n-grams across the
+captures in EVIDENCE_DIR.
+"""
+
+import contextlib
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+from array import array
+from datetime import datetime
+
+from capture_cache import get_capture_identity
+from capture_index import CaptureReader, load_frame_index
+from config import (EVIDENCE_DIR, JOB_TSHARK_TIMEOUT, PRINTABLE_RUN, SEARCH_FIELDS, SEARCH_GRAM_BATCH_POSTINGS,
+                    SEARCH_GRAM_FRAME_BYTES, SEARCH_GRAM_MAX_BYTES, SEARCH_GRAM_VERSION, SEARCH_INDEX_PATH,
+                    SEARCH_MULTI_VALUE_KINDS)
+from tshark_runner import stream_tshark_command
+
+logger = logging.getLogger(__name__)
+
+
+def _payload_grams(data):
+    """
+    Return the lower-cased 3-grams of the printable runs in packet bytes
+
+    Returns:
+        tuple: (grams, complete) where complete is False when printable bytes
+            beyond SEARCH_GRAM_FRAME_BYTES were left out
+    """
+    grams = set()
+    budget = SEARCH_GRAM_FRAME_BYTES
+    for match in PRINTABLE_RUN.finditer(data):
+        if budget <= 0:
+            return grams, False
+        run = match.group().lower()
+        grams.update(run[i:i + 3] for i in range(min(len(run), budget) - 2))
+        if len(run) > budget:
+            return grams, False
+        budget -= len(run)
+    return grams, True
+
+
+class SearchIndex:
+    """
+    Persistent inverted index of indicators and payload n-grams
+
+    For every capture version the index stores, per indicator (DNS query
+    name, HTTP host, URI and user agent, TLS SNI, IP address), the frames
+    it occurs in, and per lower-cased 3-gram of printable payload the
+    frames containing it. Posting lists are stored as packed uint32 frame
+    numbers; n-gram postings are written in batches of frames, one row per
+    gram and batch, so indexing holds at most SEARCH_GRAM_BATCH_POSTINGS of
+    them in memory. String searches intersect the n-gram postings and
+    verify the candidate frames against the packet bytes.
+
+    Only the first SEARCH_GRAM_FRAME_BYTES printable bytes of a frame are
+    n-gram indexed; frames with more are listed as truncated and always
+    verified. Captures larger than SEARCH_GRAM_MAX_BYTES are not n-gram
+    indexed at all, so string searches scan every frame of them.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """Open a connection for one transaction and close it afterwards"""
+        with contextlib.closing(self._open()) as connection, connection:
+            yield connection
+
+    def _open(self):
+        """Open a connection, creating the schema on first use"""
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        if not self._ready:
+            with self._lock:
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.executescript("""
+                    CREATE TABLE IF NOT EXISTS captures (
+                        capture_id INTEGER PRIMARY KEY,
+                        filename TEXT UNIQUE NOT NULL,
+                        identity TEXT NOT NULL,
+                        grams INTEGER NOT NULL,
+                        indexed_at TEXT
+                    );
+                    CREATE TABLE IF NOT EXISTS terms (
+                        kind TEXT NOT NULL,
+                        term TEXT NOT NULL,
+                        capture_id INTEGER NOT NULL,
+                        frames BLOB NOT NULL,
+                        PRIMARY KEY (kind, term, capture_id)
+                    ) WITHOUT ROWID;
+                    CREATE INDEX IF NOT EXISTS terms_term ON terms (term);
+                    DROP TABLE IF EXISTS grams;
+                    CREATE TABLE IF NOT EXISTS gram_batches (
+                        gram BLOB NOT NULL,
+                        capture_id INTEGER NOT NULL,
+                        batch INTEGER NOT NULL,
+                        frames BLOB NOT NULL,
+                        PRIMARY KEY (gram, capture_id, batch)
+                    ) WITHOUT ROWID;
+                    CREATE TABLE IF NOT EXISTS truncated (
+                        capture_id INTEGER PRIMARY KEY,
+                        frames BLOB NOT NULL
+                    );
+                """)
+                self._ready = True
+        return connection
+
+    def is_current(self, filename, identity):
+        """Return whether a capture version is already indexed in the current layout"""
+        with self._connect() as connection:
+            row = connection.execute('SELECT identity, grams FROM captures WHERE filename = ?',
+                                     (filename,)).fetchone()
+        return row is not None and row['identity'] == identity and row['grams'] in (0, SEARCH_GRAM_VERSION)
+
+    def remove(self, filename):
+        """Drop everything indexed for a capture"""
+        with self._connect() as connection:
+            row = connection.execute('SELECT capture_id FROM captures WHERE filename = ?',
+                                     (filename,)).fetchone()
+            if row is None:
+                return
+            for table in ('terms', 'gram_batches', 'truncated', 'captures'):
+                connection.execute(f'DELETE FROM {table} WHERE capture_id = ?', (row['capture_id'],))
+
+    def index_capture(self, filepath, filename):
+        """
+        Extract and store the indicators and payload n-grams of a capture
+
+        Indicators come from one tshark -T fields pass; n-grams are read from
+        the memory-mapped capture and written in batches within the same
+        transaction, so searches see either the old or the new entries.
+        Captures the record reader cannot parse or that exceed
+        SEARCH_GRAM_MAX_BYTES get indicators only.
+
+        Args:
+            filepath (str): Path to capture file
+            filename (str): Capture name relative to the evidence directory
+
+        Returns:
+            tuple: (success, error_message)
+        """
+        identity = get_capture_identity(filepath)
+        postings = {}  # (kind, term) -> array of frame numbers
+
+        fields = [field for names in SEARCH_FIELDS.values() for field in names]
+        command = ['tshark', '-r', filepath, '-T', 'fields', '-E', 'separator=/t',
+                   '-E', 'occurrence=a', '-e', 'frame.number']
+        for field in fields:
+            command.extend(['-e', field])
+        kinds = [kind for kind, names in SEARCH_FIELDS.items() for _ in names]
+
+        lines = stream_tshark_command(command, timeout=JOB_TSHARK_TIMEOUT)
+        try:
+            success, stderr = next(lines)
+            if not success:
+                return False, stderr
+            for line in lines:
+                values = line.decode('utf-8', errors='replace').rstrip('\n').split('\t')
+                if not values[0].isdigit():
+                    continue
+                frame = int(values[0])
+                for kind, value in zip(kinds, values[1:]):
+                    if not value:
+                        continue
+                    terms = value.split(',') if kind in SEARCH_MULTI_VALUE_KINDS else [value]
+                    for term in terms:
+                        term = term.strip().lower() if kind != 'http_uri' else term
+                        frames = postings.setdefault((kind, term), array('I'))
+                        if not frames or frames[-1] != frame:
+                            frames.append(frame)
+        finally:
+            lines.close()
+
+        gram_count = 0
+        with self._connect() as connection:
+            old = connection.execute('SELECT capture_id FROM captures WHERE filename = ?',
+                                     (filename,)).fetchone()
+            if old is not None:
+                for table in ('terms', 'gram_batches', 'truncated', 'captures'):
+                    connection.execute(f'DELETE FROM {table} WHERE capture_id = ?', (old['capture_id'],))
+            capture_id = connection.execute(
+                'INSERT INTO captures (filename, identity, grams, indexed_at) VALUES (?, ?, ?, ?)',
+                (filename, identity, 0, datetime.now().isoformat())).lastrowid
+            connection.executemany(
+                'INSERT INTO terms (kind, term, capture_id, frames) VALUES (?, ?, ?, ?)',
+                ((kind, term, capture_id, frames.tobytes()) for (kind, term), frames in postings.items()))
+
+            if os.path.getsize(filepath) <= SEARCH_GRAM_MAX_BYTES:
+                try:
+                    gram_count = self._index_grams(connection, filepath, capture_id)
+                    connection.execute('UPDATE captures SET grams = ? WHERE capture_id = ?',
+                                       (SEARCH_GRAM_VERSION, capture_id))
+                except (ValueError, struct.error):
+                    gram_count = 0
+                    for table in ('gram_batches', 'truncated'):
+                        connection.execute(f'DELETE FROM {table} WHERE capture_id = ?', (capture_id,))
+
+        logger.info(f"Indexed {len(postings)} indicators and {gram_count} n-gram postings of {filename}")
+        return True, None
+
+    @staticmethod
+    def _index_grams(connection, filepath, capture_id):
+        """
+        Write the n-gram postings of a capture in batches of frames
+
+        Args:
+            connection (sqlite3.Connection): Connection inside the indexing transaction
+            filepath (str): Path to capture file
+            capture_id (int): Row of the capture in captures
+
+        Returns:
+            int: Postings written
+
+        Raises:
+            ValueError, struct.error: If the record reader cannot parse the capture
+        """
+        grams = {}  # 3-gram -> array of frame numbers of the current batch
+        truncated = array('I')  # frames with more printable bytes than were indexed
+        pending = 0
+        batch = 0
+        total = 0
+
+        def flush():
+            connection.executemany(
+                'INSERT INTO gram_batches (gram, capture_id, batch, frames) VALUES (?, ?, ?, ?)',
+                ((gram, capture_id, batch, frames.tobytes()) for gram, frames in grams.items()))
+            grams.clear()
+
+        with CaptureReader(filepath) as reader:
+            for frame, record in enumerate(reader.records(with_data=True), start=1):
+                data = record[5]
+                payload = bytes(data)
+                data.release()  # views must not outlive the reader
+                frame_grams, complete = _payload_grams(payload)
+                for gram in frame_grams:
+                    grams.setdefault(gram, array('I')).append(frame)
+                pending += len(frame_grams)
+                if not complete:
+                    truncated.append(frame)
+                if pending >= SEARCH_GRAM_BATCH_POSTINGS:
+                    flush()
+                    total += pending
+                    pending = 0
+                    batch += 1
+        flush()
+        total += pending
+
+        if truncated:
+            connection.execute('INSERT INTO truncated (capture_id, frames) VALUES (?, ?)',
+                               (capture_id, truncated.tobytes()))
+        return total
+
+    def search_terms(self, query, kind=None, prefix=False):
+        """
+        Find indicators equal to (or starting with) a query
+
+        Args:
+            query (str): Indicator value; names are matched case-insensitively
+            kind (str, optional): Restrict to one SEARCH_FIELDS kind
+            prefix (bool): Match terms starting with query
+
+        Returns:
+            list: (filename, kind, term, frames) per match
+        """
+        conditions = []
+        args = []
+        terms = {query, query.lower()}
+        if prefix:
+            conditions.append('(' + ' OR '.join('(t.term >= ? AND t.term < ?)' for _ in terms) + ')')
+            for term in terms:
+                args.extend([term, term + '\U0010ffff'])
+        else:
+            conditions.append(f"t.term IN ({', '.join('?' for _ in terms)})")
+            args.extend(terms)
+        if kind:
+            conditions.append('t.kind = ?')
+            args.append(kind)
+
+        with self._connect() as connection:
+            rows = connection.execute(
+                'SELECT c.filename, t.kind, t.term, t.frames FROM terms t '
+                'JOIN captures c ON c.capture_id = t.capture_id '
+                f"WHERE {' AND '.join(conditions)} ORDER BY c.filename, t.kind, t.term",
+                args).fetchall()
+        return [(row['filename'], row['kind'], row['term'], array('I', row['frames'])) for row in rows]
+
+    def search_string(self, query):
+        """
+        Find frames whose bytes contain a string (ASCII case-insensitive)
+
+        Only the printable stretches of the query narrow the candidates; a
+        query with no 3 consecutive printable characters, and captures that
+        are not n-gram indexed, are answered by scanning every frame.
+
+        Args:
+            query (str): String of at least 3 characters
+
+        Returns:
+            list: (filename, frames) per capture with verified matches
+        """
+        needle = query.encode('utf-8').lower()
+        grams = sorted({gram for run in PRINTABLE_RUN.findall(needle)
+                        for gram in (run[i:i + 3] for i in range(len(run) - 2))})
+
+        with self._connect() as connection:
+            captures = connection.execute('SELECT capture_id, filename, identity, grams FROM captures').fetchall()
+            postings = {}
+            truncated = {}
+            if grams:
+                for row in connection.execute(
+                        'SELECT capture_id, gram, frames FROM gram_batches '
+                        f"WHERE gram IN ({', '.join('?' for _ in grams)}) ORDER BY batch",
+                        grams):
+                    lists = postings.setdefault(row['capture_id'], {})
+                    lists.setdefault(row['gram'], array('I')).frombytes(row['frames'])
+                for row in connection.execute('SELECT capture_id, frames FROM truncated'):
+                    truncated[row['capture_id']] = array('I', row['frames'])
+
+        results = []
+        for capture in captures:
+            filepath = os.path.join(EVIDENCE_DIR, capture['filename'])
+            if grams and capture['grams'] == SEARCH_GRAM_VERSION:
+                lists = list(postings.get(capture['capture_id'], {}).values())
+                candidates = set()
+                if len(lists) == len(grams):
+                    lists.sort(key=len)
+                    candidates.update(lists[0])
+                    for frames in lists[1:]:
+                        candidates.intersection_update(frames)
+                        if not candidates:
+                            break
+                candidates.update(truncated.get(capture['capture_id'], ()))
+                if not candidates:
+                    continue
+                candidates = sorted(candidates)
+            else:
+                candidates = None  # not n-gram indexed: scan every frame
+
+            try:
+                frames = _verify_frames(filepath, capture['identity'], needle, candidates)
+            except (OSError, ValueError, struct.error):
+                continue
+            if frames:
+                results.append((capture['filename'], frames))
+        return results
+
+    def stats(self):
+        """Return index sizes for monitoring"""
+        with self._connect() as connection:
+            return {
+                'captures': connection.execute('SELECT COUNT(*) FROM captures').fetchone()[0],
+                'terms': connection.execute('SELECT COUNT(*) FROM terms').fetchone()[0],
+                'grams': connection.execute('SELECT COUNT(DISTINCT gram) FROM gram_batches').fetchone()[0]
+            }
+
+
+def _verify_frames(filepath, identity, needle, candidates):
+    """
+    Check which frames really contain needle in their packet bytes, read through the frame index
+
+    Args:
+        filepath (str): Path to capture file
+        identity (str): Capture identity the index was built for
+        needle (bytes): Lower-cased bytes to look for
+        candidates (list or None): Frame numbers to check, or None for all
+
+    Returns:
+        list: Matching frame numbers
+    """
+    if get_capture_identity(filepath) != identity:
+        return []  # changed since indexing; the watcher re-indexes it
+    success, index, _ = load_frame_index(filepath)
+    if not success:
+        return []
+
+    frames = []
+    with open(filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        numbers = range(1, len(index) + 1) if candidates is None else candidates
+        for number in numbers:
+            if needle in index.payload(view, number).lower():
+                frames.append(number)
+    return frames
+
+
+search_index = SearchIndex(SEARCH_INDEX_PATH)
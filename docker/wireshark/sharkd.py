@@ -0,0 +1,332 @@
+"""
+sharkd sessions for the Wireshark Analysis API
+
+Keeps captures loaded in long-lived sharkd processes so repeated requests
+against the same capture skip re-reading it.
+"""
+
+import json
+import logging
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, has_app_context
+
+from capture_cache import get_capture_identity
+from config import JOB_TSHARK_TIMEOUT, SHARKD_IDLE_TIMEOUT, SHARKD_MEMORY_BUDGET, SHARKD_SESSIONS, TSHARK_TIMEOUT
+from tshark_runner import admit_tshark, finish_tshark
+
+logger = logging.getLogger(__name__)
+
+
+class SharkdError(Exception):
+    """Raised when a sharkd session fails or answers a request with an error"""
+
+
+class SharkdSession:
+    """
+    A long-lived sharkd process with one capture loaded
+
+    Requests are JSON-RPC 2.0 messages, one per line on stdin; sharkd
+    answers each on one stdout line. sharkd handles one request at a time,
+    so callers hold the session lock around call().
+    """
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.identity = get_capture_identity(filepath)
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self._next_id = 0
+        self.process = subprocess.Popen(['sharkd', '-'], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            self.call('load', {'file': filepath}, timeout=JOB_TSHARK_TIMEOUT)
+        except BaseException:
+            # A session that never loaded is not pooled, so nothing else would reap its process
+            self.process.kill()
+            self.process.wait()
+            raise
+
+    @property
+    def alive(self):
+        return self.process.poll() is None
+
+    def call(self, method, params=None, timeout=None):
+        """
+        Send one request and wait for its answer
+
+        Args:
+            method (str): sharkd method, e.g. 'frames' or 'tap'
+            params (dict): Method parameters
+            timeout (int): Seconds to wait (default: TSHARK_TIMEOUT); the
+                process is killed when it does not answer in time
+
+        Returns:
+            The 'result' member of the response
+
+        Raises:
+            SharkdError: If sharkd answers with an error, dies or times out
+        """
+        timeout = timeout or TSHARK_TIMEOUT
+        self._next_id += 1
+        message = {'jsonrpc': '2.0', 'id': self._next_id, 'method': method}
+        if params:
+            message['params'] = params
+
+        watchdog = threading.Timer(timeout, self.process.kill)
+        watchdog.start()
+        try:
+            self.process.stdin.write(json.dumps(message).encode('utf-8') + b'\n')
+            self.process.stdin.flush()
+            while True:
+                line = self.process.stdout.readline()
+                if not line:
+                    raise SharkdError(f'sharkd exited while answering {method}'
+                                      if watchdog.is_alive() else
+                                      f'sharkd did not answer {method} within {timeout} seconds')
+                try:
+                    response = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # banner or log output
+                if isinstance(response, dict) and response.get('id') == self._next_id:
+                    break
+        except (BrokenPipeError, OSError) as e:
+            raise SharkdError(f'sharkd session failed: {str(e)}')
+        finally:
+            watchdog.cancel()
+            self.last_used = time.monotonic()
+
+        if 'error' in response:
+            error = response['error']
+            raise SharkdError(error.get('message', str(error)) if isinstance(error, dict) else str(error))
+        return response.get('result')
+
+    def memory(self):
+        """Return the resident memory of the sharkd process in bytes"""
+        try:
+            with open(f'/proc/{self.process.pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError, IndexError):
+            pass
+        return 0
+
+    def close(self):
+        """Stop the sharkd process"""
+        if self.alive:
+            self.process.kill()
+        self.process.wait()
+        self.process.stdin.close()
+        self.process.stdout.close()
+
+
+class SharkdPool:
+    """
+    Pool of sharkd sessions keyed by capture path
+
+    Sessions are evicted least recently used first when more than
+    max_sessions are open or their resident memory exceeds memory_budget,
+    and closed by a reaper thread after idle_timeout seconds without use.
+    A session is reloaded when its capture changes on disk.
+    """
+    def __init__(self, max_sessions, memory_budget, idle_timeout):
+        self.max_sessions = max_sessions
+        self.memory_budget = memory_budget
+        self.idle_timeout = idle_timeout
+        self._sessions = OrderedDict()  # filepath -> SharkdSession, most recently used last
+        self._lock = threading.Lock()
+        self._reaper = None
+        self.loads = 0
+        self.reuses = 0
+        self.evictions = 0
+
+    def query(self, filepath, method, params=None):
+        """
+        Run one sharkd request against a capture, loading it if needed
+
+        Each request occupies a tshark slot while it runs, so sharkd and
+        tshark work share the same admission control.
+
+        Raises:
+            SharkdError: If the request fails
+            AdmissionRejected: If no tshark slot becomes available in time
+        """
+        timeout = g.get('tshark_timeout', TSHARK_TIMEOUT) if has_app_context() else TSHARK_TIMEOUT
+        started = admit_tshark()
+        try:
+            session = self._acquire(filepath)
+            try:
+                return session.call(method, params, timeout)
+            finally:
+                session.lock.release()
+                if not session.alive:
+                    self._discard(filepath, session)
+        finally:
+            finish_tshark(started)
+
+    def _acquire(self, filepath):
+        """Return the locked session for a capture, starting one when needed"""
+        while True:
+            with self._lock:
+                self._start_reaper()
+                session = self._sessions.get(filepath)
+                if session is not None:
+                    self._sessions.move_to_end(filepath)
+            if session is None:
+                break
+            session.lock.acquire()
+            if session.alive and session.identity == get_capture_identity(filepath):
+                self.reuses += 1
+                return session
+            session.lock.release()
+            self._discard(filepath, session)
+
+        logger.info(f"Loading {filepath} into a sharkd session")
+        try:
+            session = SharkdSession(filepath)
+        except OSError as e:
+            raise SharkdError(f'Could not start sharkd: {str(e)}')
+        session.lock.acquire()
+        with self._lock:
+            previous = self._sessions.pop(filepath, None)
+            self._sessions[filepath] = session
+            self.loads += 1
+            evicted = self._evict_locked(keep=session)
+        for old in ([previous] if previous else []) + evicted:
+            self._close(old)
+        return session
+
+    def _evict_locked(self, keep):
+        """Pick sessions to drop to respect the count and memory limits"""
+        evicted = []
+        memory = {path: session.memory() for path, session in self._sessions.items()}
+        for path in list(self._sessions):
+            over_count = len(self._sessions) > self.max_sessions
+            over_budget = sum(memory.values()) > self.memory_budget
+            if not (over_count or over_budget):
+                break
+            session = self._sessions[path]
+            if session is keep:
+                continue
+            evicted.append(self._sessions.pop(path))
+            memory.pop(path)
+            self.evictions += 1
+        return evicted
+
+    def _discard(self, filepath, session):
+        """Drop a dead or outdated session"""
+        with self._lock:
+            if self._sessions.get(filepath) is session:
+                del self._sessions[filepath]
+        self._close(session)
+
+    @staticmethod
+    def _close(session):
+        """Close a session once nobody is using it"""
+        with session.lock:
+            session.close()
+
+    def _start_reaper(self):
+        """Start the idle session reaper (called with the pool lock held)"""
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=self._reap, name='sharkd-reaper', daemon=True)
+            self._reaper.start()
+
+    def _reap(self):
+        """Close idle sessions; runs on its own thread"""
+        while True:
+            time.sleep(min(30, self.idle_timeout))
+            cutoff = time.monotonic() - self.idle_timeout
+            with self._lock:
+                idle = [(path, session) for path, session in self._sessions.items()
+                        if session.last_used < cutoff and not session.lock.locked()]
+            for path, session in idle:
+                logger.info(f"Closing idle sharkd session for {path}")
+                self._discard(path, session)
+
+    def stats(self):
+        """Return pool counters for monitoring"""
+        with self._lock:
+            sessions = list(self._sessions.items())
+        return {
+            'sessions': len(sessions),
+            'max_sessions': self.max_sessions,
+            'memory_bytes': sum(session.memory() for _, session in sessions),
+            'memory_budget': self.memory_budget,
+            'loads': self.loads,
+            'reuses': self.reuses,
+            'evictions': self.evictions,
+            'captures': [path for path, _ in sessions]
+        }
+
+
+sharkd_pool = SharkdPool(SHARKD_SESSIONS, SHARKD_MEMORY_BUDGET, SHARKD_IDLE_TIMEOUT)
+
+
+def sharkd_conversations(tap, protocol):
+    """
+    Convert a sharkd conv tap into rows with CONVERSATION_COLUMNS keys
+
+    Args:
+        tap (dict): Tap result with a 'convs' list
+        protocol (str): 'tcp' or 'udp'
+
+    Returns:
+        list: Conversation rows
+    """
+    rows = []
+    for conv in tap.get('convs', []):
+        port_a = conv.get('sport')
+        port_b = conv.get('dport')
+        start = float(conv.get('start', 0))
+        rows.append({
+            'protocol': protocol,
+            'address_a': conv.get('saddr'),
+            'port_a': int(port_a) if str(port_a).isdigit() else None,
+            'address_b': conv.get('daddr'),
+            'port_b': int(port_b) if str(port_b).isdigit() else None,
+            'frames_a_to_b': conv.get('txf', 0),
+            'bytes_a_to_b': conv.get('txb', 0),
+            'frames_b_to_a': conv.get('rxf', 0),
+            'bytes_b_to_a': conv.get('rxb', 0),
+            'frames': conv.get('txf', 0) + conv.get('rxf', 0),
+            'bytes': conv.get('txb', 0) + conv.get('rxb', 0),
+            'relative_start': start,
+            'duration': round(float(conv.get('stop', start)) - start, 6)
+        })
+    return rows
+
+
+def sharkd_protocol_hierarchy(protos):
+    """Convert the 'protos' list of a sharkd phs tap into protocol tree nodes"""
+    return [
+        {
+            'protocol': proto.get('proto'),
+            'frames': proto.get('frames', 0),
+            'bytes': proto.get('bytes', 0),
+            'children': sharkd_protocol_hierarchy(proto.get('protos', []))
+        }
+        for proto in protos
+    ]
+
+
+def load_sharkd_tables(filepath):
+    """
+    Get conversation and protocol hierarchy tables from a sharkd session
+
+    Returns:
+        dict: Tables shaped like build_summary_tables() output
+
+    Raises:
+        SharkdError: If the session fails
+    """
+    result = sharkd_pool.query(filepath, 'tap', {'tap0': 'conv:TCP', 'tap1': 'conv:UDP', 'tap2': 'phs'})
+    taps = {tap.get('tap'): tap for tap in result.get('taps', [])}
+    return {
+        'conversations_tcp': sharkd_conversations(taps.get('conv:TCP', {}), 'tcp'),
+        'conversations_udp': sharkd_conversations(taps.get('conv:UDP', {}), 'udp'),
+        'protocol_hierarchy': sharkd_protocol_hierarchy(taps.get('phs', {}).get('protos', []))
+    }
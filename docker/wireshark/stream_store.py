@@ -0,0 +1,272 @@
+"""
+Stream store for the Wireshark Analysis API
+
+Reassembles the TCP and UDP streams of a capture in one pass and keeps
+their payloads on disk for /follow.
+"""
+
+import base64
+import json
+import logging
+import os
+import shutil
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from capture_cache import get_capture_identity, short_digest
+from config import FRAME_INDEX_SLOTS, JOB_TSHARK_TIMEOUT, STREAM_DIR, STREAM_FIELDS
+from tshark_runner import stream_tshark_command
+
+logger = logging.getLogger(__name__)
+
+
+class StreamStore:
+    """
+    Reassembled TCP and UDP stream payloads of a capture
+
+    Payload bytes live in payload.dat in capture order. Segment columns,
+    grouped by stream, give for each segment its direction (0 from the
+    client, 1 from the server), frame number, position in payload.dat,
+    length and position in the stream's combined byte sequence. streams.json
+    lists each stream's endpoints, frames, byte counts and segment range.
+    """
+    COLUMNS = (('direction', 'B'), ('frame', 'I'), ('data_offset', 'Q'), ('length', 'I'),
+               ('stream_offset', 'Q'))
+
+    def __init__(self, directory, streams, segments):
+        self.directory = directory
+        self.streams = streams  # 'tcp:<id>' -> stream description
+        self.segments = segments  # column name -> array
+
+    @classmethod
+    def build(cls, filepath, directory):
+        """
+        Extract every TCP and UDP stream of a capture in one tshark pass
+
+        TCP segments are ordered by sequence number per direction:
+        retransmitted bytes are dropped and overlaps trimmed, while gaps
+        from lost segments are left as they are.
+
+        Args:
+            filepath (str): Path to capture file
+            directory (str): Store directory to write
+
+        Returns:
+            tuple: (success, store, error_message)
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+
+        command = ['tshark', '-r', filepath, '-Y', 'tcp.len > 0 || udp.length > 8', '-T', 'fields',
+                   '-E', 'separator=/t', '-E', 'occurrence=f']
+        for field in STREAM_FIELDS:
+            command.extend(['-e', field])
+
+        streams = {}
+        pending = {}  # stream key -> list of segment tuples
+        next_seq = {}  # (stream key, direction) -> next expected TCP sequence number
+        position = 0
+
+        lines = stream_tshark_command(command, timeout=JOB_TSHARK_TIMEOUT)
+        try:
+            success, stderr = next(lines)
+            if not success:
+                return False, None, stderr
+
+            with open(os.path.join(directory, 'payload.dat'), 'wb') as data_file:
+                for line in lines:
+                    values = line.decode('utf-8', errors='replace').rstrip('\n').split('\t')
+                    if len(values) < len(STREAM_FIELDS) or not values[0].isdigit():
+                        continue
+                    (frame, tcp_stream, udp_stream, ip_src, ip_dst, ip6_src, ip6_dst, tcp_src, tcp_dst,
+                     udp_src, udp_dst, tcp_seq, tcp_payload, udp_payload) = values[:len(STREAM_FIELDS)]
+
+                    if tcp_stream and tcp_payload:
+                        protocol, stream_id, ports, payload = 'tcp', tcp_stream, (tcp_src, tcp_dst), tcp_payload
+                    elif udp_stream and udp_payload:
+                        protocol, stream_id, ports, payload = 'udp', udp_stream, (udp_src, udp_dst), udp_payload
+                    else:
+                        continue
+                    try:
+                        data = bytes.fromhex(payload.replace(':', ''))
+                    except ValueError:
+                        continue
+
+                    key = f"{protocol}:{stream_id}"
+                    source = (ip_src or ip6_src, int(ports[0]) if ports[0].isdigit() else None)
+                    stream = streams.get(key)
+                    if stream is None:
+                        stream = streams[key] = {
+                            'protocol': protocol,
+                            'stream': int(stream_id),
+                            'client': {'address': source[0], 'port': source[1]},
+                            'server': {'address': ip_dst or ip6_dst,
+                                       'port': int(ports[1]) if ports[1].isdigit() else None},
+                            'first_frame': int(frame),
+                            'last_frame': int(frame),
+                            'segments': 0,
+                            'client_bytes': 0,
+                            'server_bytes': 0
+                        }
+                        pending[key] = []
+                    client = stream['client']
+                    direction = 0 if source == (client['address'], client['port']) else 1
+
+                    if protocol == 'tcp' and tcp_seq.isdigit():
+                        seq = int(tcp_seq)
+                        expected = next_seq.get((key, direction))
+                        if expected is not None:
+                            if seq + len(data) <= expected:
+                                continue  # retransmission
+                            if seq < expected:
+                                data = data[expected - seq:]
+                                seq = expected
+                        next_seq[(key, direction)] = seq + len(data)
+
+                    data_file.write(data)
+                    pending[key].append((direction, int(frame), position, len(data)))
+                    position += len(data)
+                    stream['last_frame'] = int(frame)
+                    stream['client_bytes' if direction == 0 else 'server_bytes'] += len(data)
+        finally:
+            lines.close()
+
+        # Group segments by stream so each stream is one contiguous slice
+        segments = {name: array(code) for name, code in cls.COLUMNS}
+        for key in sorted(streams, key=lambda key: (streams[key]['protocol'], streams[key]['stream'])):
+            streams[key]['first_segment'] = len(segments['frame'])
+            stream_offset = 0
+            for direction, frame, data_offset, length in pending[key]:
+                segments['direction'].append(direction)
+                segments['frame'].append(frame)
+                segments['data_offset'].append(data_offset)
+                segments['length'].append(length)
+                segments['stream_offset'].append(stream_offset)
+                stream_offset += length
+            streams[key]['segments'] = len(pending[key])
+
+        with open(os.path.join(directory, 'segments.bin'), 'wb') as f:
+            for name, _ in cls.COLUMNS:
+                segments[name].tofile(f)
+        with open(os.path.join(directory, 'streams.json'), 'w') as f:
+            json.dump({'count': len(segments['frame']), 'streams': streams}, f)
+        return True, cls(directory, streams, segments), None
+
+    @classmethod
+    def load(cls, directory):
+        """Load a store written by build()"""
+        with open(os.path.join(directory, 'streams.json')) as f:
+            meta = json.load(f)
+        segments = {name: array(code) for name, code in cls.COLUMNS}
+        with open(os.path.join(directory, 'segments.bin'), 'rb') as f:
+            for name, _ in cls.COLUMNS:
+                segments[name].fromfile(f, meta['count'])
+        return cls(directory, meta['streams'], segments)
+
+    def read(self, key, offset, length):
+        """
+        Read part of a stream's combined byte sequence
+
+        Args:
+            key (str): Stream key, e.g. 'tcp:0'
+            offset (int): Byte offset in the stream
+            length (int): Maximum bytes to read
+
+        Returns:
+            list: (direction, frame, stream offset, bytes) per overlapping segment
+        """
+        stream = self.streams[key]
+        first = stream['first_segment']
+        last = first + stream['segments']
+        offsets = self.segments['stream_offset']
+
+        # The last segment starting at or before offset is the first one needed
+        position = max(first, bisect_left(offsets, offset + 1, first, last) - 1)
+        chunks = []
+        end = offset + length
+        with open(os.path.join(self.directory, 'payload.dat'), 'rb') as f:
+            while position < last and offsets[position] < end:
+                start = offsets[position]
+                size = self.segments['length'][position]
+                skip = max(0, offset - start)
+                take = min(size, end - start) - skip
+                if take > 0:
+                    f.seek(self.segments['data_offset'][position] + skip)
+                    chunks.append((self.segments['direction'][position], self.segments['frame'][position],
+                                   start + skip, f.read(take)))
+                position += 1
+        return chunks
+
+
+_stream_stores = OrderedDict()  # store directory -> StreamStore, most recently used last
+_stream_store_lock = threading.Lock()
+_stream_build_lock = threading.Lock()
+
+
+def load_stream_store(filepath):
+    """
+    Get the stream store of a capture, building it on first use
+
+    Stores live under STREAM_DIR as <path digest>/<identity digest>, not
+    under CACHE_DIR: cache eviction removes single files by age and would
+    leave a store without its payload. Building the store for a new version
+    of a capture removes the stores of its earlier versions.
+
+    Args:
+        filepath (str): Path to capture file
+
+    Returns:
+        tuple: (success, store, error_message)
+    """
+    path_dir = os.path.join(STREAM_DIR, short_digest(os.path.abspath(filepath)))
+    directory = os.path.join(path_dir, short_digest(get_capture_identity(filepath)))
+    with _stream_store_lock:
+        store = _stream_stores.get(directory)
+        if store is not None:
+            _stream_stores.move_to_end(directory)
+            return True, store, None
+
+    # One build at a time, so two requests never write the same store
+    with _stream_build_lock:
+        try:
+            store = StreamStore.load(directory)
+        except (OSError, ValueError, EOFError):
+            with _stream_store_lock:
+                for stale in [key for key in _stream_stores if os.path.dirname(key) == path_dir]:
+                    del _stream_stores[stale]
+            if os.path.isdir(path_dir):
+                for name in os.listdir(path_dir):
+                    if os.path.join(path_dir, name) != directory:
+                        shutil.rmtree(os.path.join(path_dir, name), ignore_errors=True)
+            logger.info(f"Reassembling streams of {filepath}")
+            success, store, error = StreamStore.build(filepath, directory)
+            if not success:
+                return False, None, error
+
+    with _stream_store_lock:
+        _stream_stores[directory] = store
+        while len(_stream_stores) > FRAME_INDEX_SLOTS:
+            _stream_stores.popitem(last=False)
+    return True, store, None
+
+
+def encode_payload(data, encoding):
+    """
+    Encode stream bytes for a JSON response
+
+    Args:
+        data (bytes): Payload bytes
+        encoding (str): 'ascii' (printable characters, '.' for the rest, like
+            Wireshark's ASCII view), 'hex' or 'raw' (base64)
+
+    Returns:
+        str: Encoded payload
+    """
+    if encoding == 'hex':
+        return data.hex()
+    if encoding == 'raw':
+        return base64.b64encode(data).decode('ascii')
+    return ''.join(chr(byte) if 32 <= byte < 127 or byte in (9, 10, 13) else '.' for byte in data)
@@ -0,0 +1,349 @@
+"""
+Summary tables for the Wireshark Analysis API
+
+Runs the statistics taps over a capture in one tshark pass, or over
+byte-balanced shards of a large capture in parallel, and caches the
+resulting tables.
+"""
+
+import logging
+import os
+import tempfile
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, g, has_app_context
+
+from capture_cache import result_cache
+from capture_index import carve_frames, load_frame_index
+from config import SHARDED_TAPS, SHARD_SIZE, SHARD_WORKERS, SUMMARY_TAPS, TSHARK_TIMEOUT
+from table_parsers import ENDPOINT_COLUMNS, build_summary_tables, split_tap_output, summary_tables
+from tshark_runner import current_client, run_tshark_command
+
+logger = logging.getLogger(__name__)
+
+
+def run_summary_taps(filepath, taps):
+    """
+    Run several statistics taps over a capture in one tshark pass
+
+    Args:
+        filepath (str): Path to capture file
+        taps (list): Tap names from SUMMARY_TAPS
+
+    Returns:
+        tuple: (success, sections, stderr)
+    """
+    command = ['tshark', '-r', filepath, '-q']
+    for name in taps:
+        command.extend(['-z', SUMMARY_TAPS[name][0]])
+
+    success, stdout, stderr = run_tshark_command(command)
+    if not success:
+        return False, None, stderr
+
+    return True, split_tap_output(stdout or '', taps), None
+
+
+def load_summary(filepath, filename, taps):
+    """
+    Get summary sections for a capture, running tshark only on a cache miss
+
+    A fresh run also fills the cache entries of /statistics and /protocols
+    so that opening a capture costs a single read of the file.
+
+    Args:
+        filepath (str): Path to capture file
+        filename (str): Filename as given by the client
+        taps (list): Tap names from SUMMARY_TAPS
+
+    Returns:
+        tuple: (success, payload, stderr, cache_hit)
+    """
+    params = {'taps': sorted(taps)}
+    cached = result_cache.get(filepath, 'summary', params)
+    if cached is not None:
+        return True, cached, None, True
+
+    # A subset of taps can be answered from a previous run of all of them
+    if len(taps) < len(SUMMARY_TAPS):
+        full = result_cache.get(filepath, 'summary', {'taps': sorted(SUMMARY_TAPS)})
+        if full is not None:
+            sections = {name: full['summary'][name] for name in taps}
+            tables = {name: table for name, table in summary_tables(full).items() if name in taps}
+            return True, dict(full, taps=list(taps), summary=sections, tables=tables), None, True
+
+    success, sections, stderr = run_summary_taps(filepath, taps)
+    if not success:
+        return False, None, stderr, False
+
+    payload = {
+        'success': True,
+        'filename': filename,
+        'taps': list(taps),
+        'summary': sections,
+        'tables': build_summary_tables(sections)
+    }
+    result_cache.put(filepath, 'summary', params, payload)
+
+    if 'conversations_tcp' in sections and 'conversations_udp' in sections:
+        result_cache.put(filepath, 'statistics', {}, statistics_payload(filename, sections))
+    if 'protocol_hierarchy' in sections:
+        result_cache.put(filepath, 'protocols', {}, protocols_payload(filename, sections))
+
+    return True, payload, None, False
+
+
+def statistics_payload(filename, sections):
+    """Build the /statistics response from summary sections"""
+    return {
+        'success': True,
+        'filename': filename,
+        'statistics': sections['conversations_tcp'] + sections['conversations_udp']
+    }
+
+
+def protocols_payload(filename, sections):
+    """Build the /protocols response from summary sections"""
+    return {
+        'success': True,
+        'filename': filename,
+        'protocols': sections['protocol_hierarchy']
+    }
+
+
+def split_into_shards(index, shards):
+    """
+    Split a capture into contiguous frame ranges of roughly equal byte size
+
+    Args:
+        index (FrameIndex): Frame index of the capture
+        shards (int): Number of shards wanted
+
+    Returns:
+        list: (first, last) 1-based frame numbers per non-empty shard
+    """
+    if not len(index):
+        return []
+    start = index.offsets[0]
+    end = index.offsets[-1] + index.record_sizes[-1]
+    bounds = [0]
+    for k in range(1, shards):
+        bounds.append(bisect_left(index.offsets, start + (end - start) * k // shards))
+    bounds.append(len(index))
+    return [(bounds[k] + 1, bounds[k + 1]) for k in range(shards) if bounds[k + 1] > bounds[k]]
+
+
+def _run_shard(filepath, index, shard, client, context):
+    """
+    Carve one shard into a temporary capture and run the table taps over it
+
+    The temporary capture is created in the system temporary directory, not
+    under CACHE_DIR, so cache eviction cannot remove it mid-run.
+
+    Runs on a shard worker thread, so the caller's app, client and tshark
+    settings are carried over explicitly.
+
+    Returns:
+        tuple: (success, tables, stderr)
+    """
+    first, last = shard
+    with context['app'].test_request_context(headers={'X-Client-Id': client}):
+        g.tshark_timeout = context['tshark_timeout']
+        g.in_job = context['in_job']
+        suffix = '.pcapng' if index.file_format == 'pcapng' else '.pcap'
+        with tempfile.NamedTemporaryFile(suffix=suffix) as shard_file:
+            carve_frames(filepath, index, range(first, last + 1), shard_file)
+            shard_file.flush()
+            success, sections, stderr = run_summary_taps(shard_file.name, list(SHARDED_TAPS))
+        if not success:
+            return False, None, stderr
+        return True, build_summary_tables(sections), None
+
+
+def _conversation_key(row):
+    """Key a conversation independently of which side tshark lists first"""
+    sides = sorted([(row['address_a'], str(row['port_a'])), (row['address_b'], str(row['port_b']))])
+    return (row['protocol'],) + tuple(sides)
+
+
+def merge_conversations(shard_rows):
+    """
+    Merge conversation rows computed per shard
+
+    Args:
+        shard_rows (list): (offset, rows) per shard, where offset is the time
+            of the shard's first frame relative to the start of the capture
+
+    Returns:
+        list: Merged rows with CONVERSATION_COLUMNS keys
+    """
+    merged = OrderedDict()
+    for offset, rows in shard_rows:
+        for row in rows:
+            start = offset + row['relative_start']
+            end = start + row['duration']
+            key = _conversation_key(row)
+            current = merged.get(key)
+            if current is None:
+                merged[key] = dict(row, relative_start=start, end=end)
+                continue
+
+            # Keep the orientation of the first shard that saw the conversation
+            same = (current['address_a'], current['port_a']) == (row['address_a'], row['port_a'])
+            forward, backward = ('a_to_b', 'b_to_a') if same else ('b_to_a', 'a_to_b')
+            current['frames_a_to_b'] += row[f'frames_{forward}']
+            current['bytes_a_to_b'] += row[f'bytes_{forward}']
+            current['frames_b_to_a'] += row[f'frames_{backward}']
+            current['bytes_b_to_a'] += row[f'bytes_{backward}']
+            current['frames'] += row['frames']
+            current['bytes'] += row['bytes']
+            current['relative_start'] = min(current['relative_start'], start)
+            current['end'] = max(current['end'], end)
+
+    rows = []
+    for row in merged.values():
+        end = row.pop('end')
+        row['duration'] = round(end - row['relative_start'], 6)
+        row['relative_start'] = round(row['relative_start'], 9)
+        rows.append(row)
+    return rows
+
+
+def merge_protocol_hierarchies(trees):
+    """Merge protocol trees by summing frames and bytes of nodes on the same path"""
+    merged = []
+    for tree in trees:
+        for node in tree:
+            current = next((item for item in merged if item['protocol'] == node['protocol']), None)
+            if current is None:
+                current = {'protocol': node['protocol'], 'frames': 0, 'bytes': 0, 'children': []}
+                merged.append(current)
+            current['frames'] += node['frames']
+            current['bytes'] += node['bytes']
+            current['children'] = merge_protocol_hierarchies([current['children'], node['children']])
+    return merged
+
+
+def merge_endpoints(shard_rows):
+    """Merge endpoint rows computed per shard by summing counters per address"""
+    merged = OrderedDict()
+    for rows in shard_rows:
+        for row in rows:
+            current = merged.setdefault(row['address'], dict.fromkeys(ENDPOINT_COLUMNS, 0))
+            current['address'] = row['address']
+            for column in ENDPOINT_COLUMNS[1:]:
+                current[column] += row[column]
+    return list(merged.values())
+
+
+def load_sharded_summary(filepath, filename, shards):
+    """
+    Compute conversation, protocol hierarchy and endpoint tables in parallel
+
+    The capture is split into byte-balanced shards along frame boundaries
+    using the frame index; each shard is carved into a temporary capture and
+    analysed by its own tshark process, and the per-shard tables are merged.
+    Conversations that span a shard boundary are merged back into one row by
+    their endpoints. PDUs reassembled across a boundary are incomplete in
+    both shards, so protocol counts can differ slightly from a single pass,
+    and byte counts inherit the unit rounding of tshark's tables.
+
+    Args:
+        filepath (str): Path to capture file
+        filename (str): Filename as given by the client
+        shards (int): Number of shards
+
+    Returns:
+        tuple: (success, payload, stderr, cache_hit)
+    """
+    params = {'shards': shards}
+    cached = result_cache.get(filepath, 'sharded_summary', params)
+    if cached is not None:
+        return True, cached, None, True
+
+    success, index, error = load_frame_index(filepath)
+    if not success:
+        return False, None, error, False
+    if not index.carvable:
+        # Multi-section pcapng files cannot be carved; use a single pass
+        return load_summary(filepath, filename, list(SUMMARY_TAPS))
+
+    ranges = split_into_shards(index, shards)
+    context = {
+        'app': current_app._get_current_object(),
+        'tshark_timeout': g.get('tshark_timeout', TSHARK_TIMEOUT) if has_app_context() else TSHARK_TIMEOUT,
+        'in_job': has_app_context() and g.get('in_job', False)
+    }
+    client = current_client()
+    started = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=min(SHARD_WORKERS, len(ranges) or 1),
+                            thread_name_prefix='shard') as executor:
+        futures = [executor.submit(_run_shard, filepath, index, shard, client, context)
+                   for shard in ranges]
+        try:
+            results = [future.result() for future in futures]
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+
+    for success, _, stderr in results:
+        if not success:
+            return False, None, stderr, False
+
+    first_time = index.timestamps[0] if len(index) else 0.0
+    offsets = [index.timestamps[first - 1] - first_time for first, _ in ranges]
+    tables = {
+        'conversations_tcp': merge_conversations(
+            [(offset, tables['conversations_tcp']) for offset, (_, tables, _) in zip(offsets, results)]),
+        'conversations_udp': merge_conversations(
+            [(offset, tables['conversations_udp']) for offset, (_, tables, _) in zip(offsets, results)]),
+        'protocol_hierarchy': merge_protocol_hierarchies(
+            [tables['protocol_hierarchy'] for _, tables, _ in results]),
+        'endpoints': merge_endpoints([tables['endpoints'] for _, tables, _ in results])
+    }
+    logger.info(f"Analysed {filename} in {len(ranges)} shards in {time.monotonic() - started:.1f}s")
+
+    payload = {
+        'success': True,
+        'filename': filename,
+        'taps': list(SHARDED_TAPS),
+        'shards': [{'first_frame': first, 'last_frame': last} for first, last in ranges],
+        'tables': tables
+    }
+    result_cache.put(filepath, 'sharded_summary', params, payload)
+    return True, payload, None, False
+
+
+def default_shard_count(filepath):
+    """Return the number of shards used for a capture when the client does not choose"""
+    size = os.path.getsize(filepath)
+    return max(1, min(SHARD_WORKERS, -(-size // SHARD_SIZE)))
+
+
+def load_summary_tables(filepath, filename):
+    """
+    Get the parsed summary tables of a capture for the typed output formats
+
+    A cached single-pass summary is used when there is one; otherwise large
+    captures are analysed in parallel shards and small ones in a single pass.
+
+    Returns:
+        tuple: (success, tables, stderr, cache_hit)
+    """
+    full = result_cache.get(filepath, 'summary', {'taps': sorted(SUMMARY_TAPS)})
+    if full is not None:
+        return True, summary_tables(full), None, True
+
+    shards = default_shard_count(filepath)
+    if shards > 1:
+        success, payload, stderr, hit = load_sharded_summary(filepath, filename, shards)
+    else:
+        success, payload, stderr, hit = load_summary(filepath, filename, list(SUMMARY_TAPS))
+    if not success:
+        return False, None, stderr, False
+    return True, summary_tables(payload), None, hit
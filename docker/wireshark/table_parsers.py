@@ -0,0 +1,273 @@
+"""
+Table parsers for the Wireshark Analysis API
+
+Turns the text output of tshark's conversation, endpoint and protocol
+hierarchy taps into typed rows, and sorts, filters and pages those rows.
+"""
+
+import re
+
+from config import SUMMARY_TAPS
+
+
+def split_tap_output(output, taps):
+    """
+    Split the output of a multi-tap tshark run into per-tap sections
+
+    Args:
+        output (str): tshark stdout
+        taps (list): Tap names from SUMMARY_TAPS that were requested
+
+    Returns:
+        dict: Tap name -> section text (empty string when tshark printed nothing)
+    """
+    lines = output.splitlines(keepends=True)
+    starts = []
+
+    for i, line in enumerate(lines):
+        stripped = line.strip()
+        for name in taps:
+            if SUMMARY_TAPS[name][1].match(stripped):
+                # Sections open with a separator line just above the title
+                start = i - 1 if i > 0 and set(lines[i - 1].strip()) == {'='} else i
+                starts.append((start, name))
+                break
+
+    sections = {name: '' for name in taps}
+    for index, (start, name) in enumerate(starts):
+        end = starts[index + 1][0] if index + 1 < len(starts) else len(lines)
+        sections[name] += ''.join(lines[start:end])
+
+    return sections
+
+
+SIZE_UNITS = {
+    'bytes': 1, 'kB': 1000, 'KB': 1000, 'MB': 1000 ** 2, 'GB': 1000 ** 3, 'TB': 1000 ** 4,
+    'KiB': 1024, 'MiB': 1024 ** 2, 'GiB': 1024 ** 3, 'TiB': 1024 ** 4,
+}
+_SIZE = r'[\d,]+(?:\s+(?:bytes|[kKMGT]i?B))?'
+CONVERSATION_ROW = re.compile(
+    r'^(?P<a>\S+)\s+<->\s+(?P<b>\S+)\s+'
+    rf'(?P<frames_ba>\d+)\s+(?P<bytes_ba>{_SIZE})\s+'
+    rf'(?P<frames_ab>\d+)\s+(?P<bytes_ab>{_SIZE})\s+'
+    rf'(?P<frames>\d+)\s+(?P<bytes>{_SIZE})\s+'
+    r'(?P<start>[\d.]+)\s+(?P<duration>[\d.]+)\s*$'
+)
+HIERARCHY_ROW = re.compile(r'^(?P<indent>\s*)(?P<protocol>\S+)\s+frames:(?P<frames>\d+)\s+bytes:(?P<bytes>\d+)')
+CONVERSATION_COLUMNS = (
+    'protocol', 'address_a', 'port_a', 'address_b', 'port_b',
+    'frames_a_to_b', 'bytes_a_to_b', 'frames_b_to_a', 'bytes_b_to_a',
+    'frames', 'bytes', 'relative_start', 'duration'
+)
+HIERARCHY_COLUMNS = ('protocol', 'path', 'depth', 'frames', 'bytes')
+ENDPOINT_ROW = re.compile(
+    r'^(?P<address>[0-9A-Fa-f.:]+)\s+'
+    rf'(?P<packets>\d+)\s+(?P<bytes>{_SIZE})\s+'
+    rf'(?P<tx_packets>\d+)\s+(?P<tx_bytes>{_SIZE})\s+'
+    rf'(?P<rx_packets>\d+)\s+(?P<rx_bytes>{_SIZE})\s*$'
+)
+ENDPOINT_COLUMNS = ('address', 'packets', 'bytes', 'tx_packets', 'tx_bytes', 'rx_packets', 'rx_bytes')
+
+
+def parse_size(text):
+    """Convert a tshark size such as '5,123 bytes' or '6 kB' to bytes"""
+    parts = text.split()
+    value = int(parts[0].replace(',', ''))
+    return value * SIZE_UNITS.get(parts[1], 1) if len(parts) > 1 else value
+
+
+def _split_endpoint(endpoint):
+    """Split 'address:port' into (address, port); port is None when absent"""
+    address, _, port = endpoint.rpartition(':')
+    if address and port.isdigit():
+        return address, int(port)
+    return endpoint, None
+
+
+def parse_conversations(text, protocol):
+    """
+    Parse a tshark conv,tcp or conv,udp table
+
+    Args:
+        text (str): Tap output section
+        protocol (str): 'tcp' or 'udp'
+
+    Returns:
+        list: One dict per conversation with CONVERSATION_COLUMNS keys
+    """
+    rows = []
+    for line in text.splitlines():
+        match = CONVERSATION_ROW.match(line.strip())
+        if not match:
+            continue
+        address_a, port_a = _split_endpoint(match.group('a'))
+        address_b, port_b = _split_endpoint(match.group('b'))
+        rows.append({
+            'protocol': protocol,
+            'address_a': address_a,
+            'port_a': port_a,
+            'address_b': address_b,
+            'port_b': port_b,
+            'frames_a_to_b': int(match.group('frames_ab')),
+            'bytes_a_to_b': parse_size(match.group('bytes_ab')),
+            'frames_b_to_a': int(match.group('frames_ba')),
+            'bytes_b_to_a': parse_size(match.group('bytes_ba')),
+            'frames': int(match.group('frames')),
+            'bytes': parse_size(match.group('bytes')),
+            'relative_start': float(match.group('start')),
+            'duration': float(match.group('duration'))
+        })
+    return rows
+
+
+def parse_protocol_hierarchy(text):
+    """
+    Parse a tshark io,phs table into a tree
+
+    Args:
+        text (str): Tap output section
+
+    Returns:
+        list: Root nodes, each {'protocol', 'frames', 'bytes', 'children'}
+    """
+    roots = []
+    stack = []  # (depth, node) of the current branch
+    for line in text.splitlines():
+        match = HIERARCHY_ROW.match(line)
+        if not match:
+            continue
+        depth = len(match.group('indent')) // 2
+        node = {
+            'protocol': match.group('protocol'),
+            'frames': int(match.group('frames')),
+            'bytes': int(match.group('bytes')),
+            'children': []
+        }
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        (stack[-1][1]['children'] if stack else roots).append(node)
+        stack.append((depth, node))
+    return roots
+
+
+def parse_endpoints(text):
+    """
+    Parse a tshark endpoints,ip table
+
+    Args:
+        text (str): Tap output section
+
+    Returns:
+        list: One dict per endpoint with ENDPOINT_COLUMNS keys
+    """
+    rows = []
+    for line in text.splitlines():
+        match = ENDPOINT_ROW.match(line.strip())
+        if not match:
+            continue
+        rows.append({
+            'address': match.group('address'),
+            'packets': int(match.group('packets')),
+            'bytes': parse_size(match.group('bytes')),
+            'tx_packets': int(match.group('tx_packets')),
+            'tx_bytes': parse_size(match.group('tx_bytes')),
+            'rx_packets': int(match.group('rx_packets')),
+            'rx_bytes': parse_size(match.group('rx_bytes'))
+        })
+    return rows
+
+
+def flatten_protocol_hierarchy(nodes, parent='', depth=0):
+    """Flatten a protocol tree into rows with HIERARCHY_COLUMNS keys"""
+    rows = []
+    for node in nodes:
+        path = f"{parent}:{node['protocol']}" if parent else node['protocol']
+        rows.append({
+            'protocol': node['protocol'],
+            'path': path,
+            'depth': depth,
+            'frames': node['frames'],
+            'bytes': node['bytes']
+        })
+        rows.extend(flatten_protocol_hierarchy(node['children'], path, depth + 1))
+    return rows
+
+
+def build_summary_tables(sections):
+    """
+    Parse the summary sections that have a typed representation
+
+    Args:
+        sections (dict): Tap name -> section text
+
+    Returns:
+        dict: Tap name -> parsed table
+    """
+    tables = {}
+    if 'conversations_tcp' in sections:
+        tables['conversations_tcp'] = parse_conversations(sections['conversations_tcp'], 'tcp')
+    if 'conversations_udp' in sections:
+        tables['conversations_udp'] = parse_conversations(sections['conversations_udp'], 'udp')
+    if 'protocol_hierarchy' in sections:
+        tables['protocol_hierarchy'] = parse_protocol_hierarchy(sections['protocol_hierarchy'])
+    if 'endpoints' in sections:
+        tables['endpoints'] = parse_endpoints(sections['endpoints'])
+    return tables
+
+
+def summary_tables(summary):
+    """Return the parsed tables of a summary payload, parsing older entries on the fly"""
+    if 'tables' in summary:
+        return summary['tables']
+    return build_summary_tables(summary['summary'])
+
+
+def query_rows(rows, columns, data, default_sort):
+    """
+    Apply server-side filtering, sorting and top-N to table rows
+
+    Supported request keys: equality filters on any column (e.g. 'protocol',
+    'port_a'), 'address' and 'port' (match either side of a conversation),
+    'min_frames', 'min_bytes', 'sort' (column name), 'order' ('asc' or
+    'desc', default 'desc') and 'top'.
+
+    Args:
+        rows (list): Table rows
+        columns (tuple): Valid column names
+        data (dict): Request body
+        default_sort (str): Column to sort by when none is requested
+
+    Returns:
+        tuple: (success, rows, error_message)
+    """
+    sort = data.get('sort', default_sort)
+    order = data.get('order', 'desc')
+    top = data.get('top')
+
+    if sort not in columns:
+        return False, None, f"sort must be one of: {', '.join(columns)}"
+    if order not in ('asc', 'desc'):
+        return False, None, "order must be 'asc' or 'desc'"
+
+    try:
+        for column in columns:
+            if column in data and data[column] is not None:
+                rows = [row for row in rows if row[column] == data[column]]
+        if data.get('address'):
+            rows = [row for row in rows if data['address'] in (row.get('address_a'), row.get('address_b'))]
+        if data.get('port') is not None:
+            port = int(data['port'])
+            rows = [row for row in rows if port in (row.get('port_a'), row.get('port_b'))]
+        if data.get('min_frames') is not None:
+            rows = [row for row in rows if row['frames'] >= int(data['min_frames'])]
+        if data.get('min_bytes') is not None:
+            rows = [row for row in rows if row['bytes'] >= int(data['min_bytes'])]
+        top = None if top is None else max(0, int(top))
+    except (TypeError, ValueError):
+        return False, None, 'port, min_frames, min_bytes and top must be integers'
+
+    rows = sorted(rows, key=lambda row: (row[sort] is None, row[sort]), reverse=(order == 'desc'))
+    if top is not None:
+        rows = rows[:top]
+
+    return True, rows, None
@@ -0,0 +1,95 @@
+"""
+Shared fixtures for the Wireshark Analysis API tests
+
+Captures are written by hand so the tests need neither tshark nor sample
+files; the result cache and evidence directory are redirected to pytest's
+temporary directory.
+"""
+
+import os
+import struct
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'common'))
+
+import capture_cache  # noqa: E402
+import capture_index  # noqa: E402
+import evidence as evidence_module  # noqa: E402
+import search_index as search_index_module  # noqa: E402
+import summaries  # noqa: E402
+import wireshark_api  # noqa: E402
+
+
+def udp_frame(payload, src='10.0.0.1', dst='10.0.0.2', sport=1234, dport=53):
+    """Build an Ethernet/IPv4/UDP frame around a payload"""
+    udp = struct.pack('!HHHH', sport, dport, 8 + len(payload), 0) + payload
+    ip = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(udp), 0, 0, 64, 17, 0,
+                     bytes(int(part) for part in src.split('.')),
+                     bytes(int(part) for part in dst.split('.')))
+    return b'\x00\x11\x22\x33\x44\x55' + b'\x66\x77\x88\x99\xaa\xbb' + b'\x08\x00' + ip + udp
+
+
+def write_pcap(path, frames, endian='<', nanoseconds=False, start=1700000000):
+    """
+    Write a classic pcap file
+
+    Args:
+        path (str): Output path
+        frames (list): Frame bytes; frame i is stamped start + i seconds plus i fractional units
+        endian (str): '<' or '>'
+        nanoseconds (bool): Use the nanosecond-resolution magic
+    """
+    magic = 0xA1B23C4D if nanoseconds else 0xA1B2C3D4
+    with open(path, 'wb') as f:
+        f.write(struct.pack(endian + 'IHHiIII', magic, 2, 4, 0, 0, 65535, 1))
+        for i, frame in enumerate(frames):
+            f.write(struct.pack(endian + 'IIII', start + i, i, len(frame), len(frame)))
+            f.write(frame)
+
+
+def _pcapng_block(block_type, body):
+    padded = body + b'\x00' * (-len(body) % 4)
+    size = 12 + len(padded)
+    return struct.pack('<II', block_type, size) + padded + struct.pack('<I', size)
+
+
+def write_pcapng(path, frames, resolution=6, start=1700000000):
+    """
+    Write a single-section pcapng file with one Ethernet interface
+
+    Args:
+        path (str): Output path
+        frames (list): Frame bytes; frame i is stamped start + i seconds
+        resolution (int): if_tsresol exponent (6 = microseconds, 9 = nanoseconds)
+    """
+    units = 10 ** resolution
+    with open(path, 'wb') as f:
+        f.write(_pcapng_block(0x0A0D0D0A, struct.pack('<IHHq', 0x1A2B3C4D, 1, 0, -1)))
+        options = struct.pack('<HHB3x', 9, 1, resolution) + struct.pack('<HH', 0, 0)
+        f.write(_pcapng_block(1, struct.pack('<HHI', 1, 0, 65535) + options))
+        for i, frame in enumerate(frames):
+            timestamp = (start + i) * units
+            f.write(_pcapng_block(6, struct.pack('<IIIII', 0, timestamp >> 32, timestamp & 0xFFFFFFFF,
+                                                 len(frame), len(frame)) + frame))
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """A fresh result cache used by every module that reads the shared one"""
+    cache = capture_cache.ResultCache(str(tmp_path / 'cache'), 1024 * 1024, 16 * 1024 * 1024)
+    for module in (capture_cache, capture_index, evidence_module, summaries, wireshark_api):
+        monkeypatch.setattr(module, 'result_cache', cache)
+    return cache
+
+
+@pytest.fixture
+def evidence(tmp_path, monkeypatch, cache):
+    """An empty evidence directory the API resolves filenames against"""
+    directory = tmp_path / 'evidence'
+    directory.mkdir()
+    for module in (search_index_module, wireshark_api):
+        monkeypatch.setattr(module, 'EVIDENCE_DIR', str(directory))
+    return directory
@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pytest
+
+from tshark_runner import AdmissionRejected, TsharkAdmission
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not reached'
+        time.sleep(0.01)
+
+
+def test_free_slots_admit_immediately():
+    admission = TsharkAdmission(slots=2, max_queue=4, max_wait=1)
+    admission.acquire('a')
+    admission.acquire('b')
+
+    assert admission.stats()['active'] == 2
+    admission.release(0.5)
+    assert admission.stats()['active'] == 1
+
+
+def test_slots_are_shared_round_robin_across_clients():
+    admission = TsharkAdmission(slots=1, max_queue=10, max_wait=10)
+    admission.acquire('busy')
+    order = []
+    order_lock = threading.Lock()
+
+    def request(client):
+        admission.acquire(client)
+        with order_lock:
+            order.append(client)
+
+    # The greedy client queues three requests before the other one queues its single request
+    threads = []
+    for client in ['greedy', 'greedy', 'greedy', 'polite']:
+        thread = threading.Thread(target=request, args=(client,))
+        thread.start()
+        threads.append(thread)
+        wait_for(lambda: admission.stats()['queued'] == len(threads))
+
+    for _ in range(4):
+        admitted = len(order)
+        admission.release(0.1)
+        wait_for(lambda: len(order) == admitted + 1)
+    for thread in threads:
+        thread.join()
+
+    assert order == ['greedy', 'polite', 'greedy', 'greedy']
+
+
+def test_full_queue_rejects_with_retry_hint():
+    admission = TsharkAdmission(slots=1, max_queue=0, max_wait=10)
+    admission.acquire('a')
+
+    with pytest.raises(AdmissionRejected) as excinfo:
+        admission.acquire('b')
+    assert excinfo.value.retry_after >= 1
+    assert admission.stats()['rejected'] == 1
+
+
+def test_wait_times_out():
+    admission = TsharkAdmission(slots=1, max_queue=4, max_wait=0.1)
+    admission.acquire('a')
+
+    with pytest.raises(AdmissionRejected):
+        admission.acquire('b')
+    stats = admission.stats()
+    assert (stats['timeouts'], stats['queued'], stats['queued_clients']) == (1, 0, 0)
+
+
+def test_unbounded_requests_ignore_limits():
+    admission = TsharkAdmission(slots=1, max_queue=0, max_wait=0.05)
+    admission.acquire('a')
+    admitted = threading.Event()
+
+    thread = threading.Thread(target=lambda: (admission.acquire('job', bounded=False), admitted.set()))
+    thread.start()
+    assert not admitted.wait(0.2)
+    admission.release(0.1)
+    assert admitted.wait(5)
+    thread.join()
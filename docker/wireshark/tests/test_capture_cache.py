@@ -0,0 +1,103 @@
+import os
+
+from capture_cache import ResultCache
+
+
+def make_capture(tmp_path, name='a.pcap', content=b'capture'):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_memory_hit_after_put(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), 1024 * 1024, 1024 * 1024)
+    capture = make_capture(tmp_path)
+
+    assert cache.get(capture, 'stats', {'a': 1}) is None
+    cache.put(capture, 'stats', {'a': 1}, {'value': 42})
+
+    assert cache.get(capture, 'stats', {'a': 1}) == {'value': 42}
+    assert cache.get(capture, 'stats', {'a': 2}) is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 2)
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    root = str(tmp_path / 'cache')
+    capture = make_capture(tmp_path)
+    ResultCache(root, 1024 * 1024, 1024 * 1024).put(capture, 'stats', {}, {'value': 1})
+
+    cache = ResultCache(root, 1024 * 1024, 1024 * 1024)
+    assert cache.get(capture, 'stats', {}) == {'value': 1}
+    assert cache.stats()['disk_hits'] == 1
+    # Promoted to memory, so the next lookup does not touch the disk
+    assert cache.get(capture, 'stats', {}) == {'value': 1}
+    assert cache.stats()['hits'] == 1
+
+
+def test_changed_capture_invalidates_results(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), 1024 * 1024, 1024 * 1024)
+    capture = make_capture(tmp_path)
+    cache.put(capture, 'stats', {}, {'value': 1})
+    old_dir = cache.capture_dir(capture)
+
+    with open(capture, 'ab') as f:
+        f.write(b'more packets')
+
+    assert cache.get(capture, 'stats', {}) is None
+    assert not os.path.exists(old_dir)
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_stale_versions_dropped_on_first_sight(tmp_path):
+    root = str(tmp_path / 'cache')
+    capture = make_capture(tmp_path)
+    ResultCache(root, 1024 * 1024, 1024 * 1024).put(capture, 'stats', {}, {'value': 1})
+    with open(capture, 'ab') as f:
+        f.write(b'more packets')
+
+    cache = ResultCache(root, 1024 * 1024, 1024 * 1024)
+    current = cache.capture_dir(capture)
+    assert os.listdir(os.path.dirname(current)) == []
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    capture = make_capture(tmp_path)
+    payload = {'value': 'x' * 100}
+    cache = ResultCache(str(tmp_path / 'cache'), 250, 1024 * 1024)
+    cache.put(capture, 'stats', {'n': 1}, payload)
+    cache.put(capture, 'stats', {'n': 2}, payload)
+    cache.get(capture, 'stats', {'n': 1})
+    cache.put(capture, 'stats', {'n': 3}, payload)
+
+    stats = cache.stats()
+    assert stats['memory_entries'] == 2
+    assert stats['memory_bytes'] <= 250
+    assert stats['evictions'] == 1
+    hits = stats['hits']
+    cache.get(capture, 'stats', {'n': 1})
+    assert cache.stats()['hits'] == hits + 1
+
+
+def test_disk_tier_enforces_limit(tmp_path):
+    capture = make_capture(tmp_path)
+    cache = ResultCache(str(tmp_path / 'cache'), 0, 2000)
+    for n in range(10):
+        cache.put(capture, 'stats', {'n': n}, {'value': 'x' * 500})
+
+    stats = cache.stats()
+    assert stats['disk_bytes'] <= 2000
+    assert stats['evictions'] > 0
+
+
+def test_compressed_variants(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), 1024 * 1024, 1024 * 1024)
+    capture = make_capture(tmp_path)
+
+    assert cache.get_variant(capture, 'abc', 'gzip') is None
+    cache.put_variant(capture, 'abc', 'gzip', b'compressed')
+    assert cache.get_variant(capture, 'abc', 'gzip') == b'compressed'
+
+    with open(capture, 'ab') as f:
+        f.write(b'more packets')
+    assert cache.get_variant(capture, 'abc', 'gzip') is None
@@ -0,0 +1,67 @@
+import pytest
+
+from capture_index import CaptureReader, build_frame_index, read_capture_metadata
+from conftest import udp_frame, write_pcap, write_pcapng
+
+FRAMES = [udp_frame(b'x' * n) for n in (10, 20, 30)]
+
+
+@pytest.mark.parametrize('endian', ['<', '>'])
+@pytest.mark.parametrize('nanoseconds', [False, True])
+def test_pcap_records(tmp_path, endian, nanoseconds):
+    path = str(tmp_path / 'a.pcap')
+    write_pcap(path, FRAMES, endian=endian, nanoseconds=nanoseconds)
+    unit = 1e-9 if nanoseconds else 1e-6
+
+    with CaptureReader(path) as reader:
+        records = [(offset, size, timestamp, length, bytes(data))
+                   for offset, size, timestamp, length, _, data in reader.records(with_data=True)]
+        assert reader.link_types == [1]
+
+    assert [record[4] for record in records] == FRAMES
+    assert [record[3] for record in records] == [len(frame) for frame in FRAMES]
+    assert records[0][0] == 24
+    assert records[1][0] == 24 + 16 + len(FRAMES[0])
+    assert records[2][2] == pytest.approx(1700000002 + 2 * unit)
+
+
+@pytest.mark.parametrize('resolution', [6, 9])
+def test_pcapng_records(tmp_path, resolution):
+    path = str(tmp_path / 'a.pcapng')
+    write_pcapng(path, FRAMES, resolution=resolution)
+
+    with CaptureReader(path) as reader:
+        records = [(timestamp, bytes(data)) for _, _, timestamp, _, _, data in reader.records(with_data=True)]
+        assert reader.file_format == 'pcapng'
+        assert reader.sections == 1
+
+    assert [data for _, data in records] == FRAMES
+    assert [timestamp for timestamp, _ in records] == pytest.approx([1700000000, 1700000001, 1700000002])
+
+
+def test_truncated_final_record_is_ignored(tmp_path):
+    path = tmp_path / 'a.pcap'
+    write_pcap(str(path), FRAMES)
+    path.write_bytes(path.read_bytes()[:-5])
+
+    assert len(build_frame_index(str(path))) == 2
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_bytes(b'not a capture file at all')
+
+    with pytest.raises(ValueError):
+        CaptureReader(str(path))
+
+
+def test_metadata(tmp_path):
+    path = str(tmp_path / 'a.pcapng')
+    write_pcapng(path, FRAMES)
+
+    metadata = read_capture_metadata(path)
+    assert metadata['format'] == 'pcapng'
+    assert metadata['packet_count'] == 3
+    assert metadata['total_bytes'] == sum(len(frame) for frame in FRAMES)
+    assert metadata['duration'] == pytest.approx(2)
+    assert metadata['link_types'] == [{'id': 1, 'name': 'ETHERNET'}]
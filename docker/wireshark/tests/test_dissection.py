@@ -0,0 +1,174 @@
+import json
+import re
+
+import numpy as np
+import pytest
+
+import capture_cache
+import capture_index
+import wireshark_api
+from capture_index import CaptureReader
+from conftest import udp_frame, write_pcap
+
+# Frames 2, 3, 5 and 7 go to port 53
+PORTS = [80, 53, 53, 80, 53, 80, 53, 80]
+FRAMES = [udp_frame(f'frame {n}'.encode(), dport=port) for n, port in enumerate(PORTS, start=1)]
+
+
+def matches(atom, number, frame):
+    atom = atom.strip()
+    found = re.fullmatch(r'frame\.number (>=|<=) (\d+)', atom)
+    if found:
+        return number >= int(found.group(2)) if found.group(1) == '>=' else number <= int(found.group(2))
+    found = re.fullmatch(r'frame\.number in \{([\d ]+)\}', atom)
+    if found:
+        return str(number) in found.group(1).split()
+    found = re.fullmatch(r'udp\.dstport == (\d+)', atom)
+    assert found, f'unexpected filter {atom!r}'
+    return int.from_bytes(frame[36:38], 'big') == int(found.group(1))
+
+
+@pytest.fixture
+def tshark(monkeypatch):
+    """
+    Emulate a single-pass tshark read: -Y keeps matching frames and -c stops
+    after that many displayed packets. Each packet reports its payload and
+    its frame number, plus the position it had in the file tshark read,
+    which dissect_frames does not rewrite.
+    """
+    reads = []
+
+    def run_tshark_command(command, timeout=None):
+        count = int(command[command.index('-c') + 1]) if '-c' in command else None
+        selection = command[command.index('-Y') + 1] if '-Y' in command else ''
+        atoms = [atom for atom in selection.replace('(', ' ').replace(')', ' ').split('&&') if atom.strip()]
+        with CaptureReader(command[command.index('-r') + 1]) as reader:
+            frames = [bytes(record[5]) for record in reader.records(with_data=True)]
+        packets = []
+        read = 0
+        for number, frame in enumerate(frames, start=1):
+            read += 1
+            if all(matches(atom, number, frame) for atom in atoms):
+                packets.append({'_source': {'layers': {
+                    'frame': {'frame.number': str(number)},
+                    'data': frame[42:].decode(),
+                    'position': number,
+                }}})
+                if count is not None and len(packets) == count:
+                    break
+        reads.append(read)
+        return True, json.dumps(packets), None
+
+    monkeypatch.setattr(capture_index, 'run_tshark_command', run_tshark_command)
+    monkeypatch.setattr(wireshark_api, 'run_tshark_command', run_tshark_command)
+    return reads
+
+
+def frames(packets):
+    return [int(packet['_source']['layers']['frame']['frame.number']) for packet in packets]
+
+
+def positions(packets):
+    return [packet['_source']['layers']['position'] for packet in packets]
+
+
+@pytest.fixture
+def capture(evidence):
+    write_pcap(str(evidence / 'a.pcap'), FRAMES)
+    return 'a.pcap'
+
+
+def analyze(monkeypatch, tmp_path, body, numbers):
+    """POST /analyze with the packet index answering numbers (None: not ready) on a fresh cache"""
+    cache = capture_cache.ResultCache(str(tmp_path / f'cache-{numbers is None}'), 1024 * 1024, 1024 * 1024)
+    monkeypatch.setattr(wireshark_api, 'result_cache', cache)
+    monkeypatch.setattr(wireshark_api, 'plan_filter', lambda filepath, filters: numbers)
+    response = wireshark_api.app.test_client().post('/analyze', json=body)
+    assert response.status_code == 200
+    return response.get_json()['packets']
+
+
+@pytest.mark.parametrize('limit', [1, 3, 10])
+def test_analyze_paths_return_the_same_packets(tshark, capture, monkeypatch, tmp_path, limit):
+    body = {'filename': capture, 'filters': 'udp.dstport == 53', 'limit': limit}
+
+    indexed = analyze(monkeypatch, tmp_path, body, np.array([2, 3, 5, 7]))
+    scanned = analyze(monkeypatch, tmp_path, body, None)
+
+    assert indexed == scanned
+    assert frames(indexed) == [2, 3, 5, 7][:limit]
+    assert positions(indexed) == frames(indexed)
+
+
+def test_selected_frames_stop_the_read(tshark, capture, evidence):
+    success, packets, _ = capture_index.dissect_in_capture(str(evidence / capture), [2, 3, 5])
+
+    assert success
+    assert [packet['_source']['layers']['data'] for packet in packets] == ['frame 2', 'frame 3', 'frame 5']
+    assert tshark == [5]
+
+
+def test_matches_start_at_the_first_frame(tshark, capture, evidence):
+    success, packets, _ = capture_index.dissect_matches(str(evidence / capture), 'udp.dstport == 53', 2, first=4)
+
+    assert success
+    assert frames(packets) == [5, 7]
+
+
+def page_through(capture, monkeypatch, numbers, **body):
+    """Collect (frames, positions) of every /packets page with the packet index answering numbers"""
+    monkeypatch.setattr(wireshark_api, 'plan_filter', lambda filepath, filters: numbers)
+    client = wireshark_api.app.test_client()
+    pages = []
+    cursor = 1
+    while cursor is not None:
+        response = client.post('/packets', json={'filename': capture, 'cursor': cursor, 'page_size': 2, **body})
+        assert response.status_code == 200
+        result = response.get_json()
+        pages.append((frames(result['packets']), positions(result['packets'])))
+        cursor = result['next_cursor']
+    return pages
+
+
+@pytest.mark.parametrize('numbers', [np.array([2, 3, 5, 7]), None])
+def test_capture_context_pages_match_a_full_dissection(tshark, capture, monkeypatch, cache, numbers):
+    pages = page_through(capture, monkeypatch, numbers, filters='udp.dstport == 53', context='capture')
+
+    assert pages == [([2, 3], [2, 3]), ([5, 7], [5, 7]), ([], [])]
+
+
+def test_capture_context_without_filter(tshark, capture, monkeypatch, cache):
+    pages = page_through(capture, monkeypatch, None, context='capture')
+
+    assert [page[0] for page in pages] == [[1, 2], [3, 4], [5, 6], [7, 8]]
+    assert all(page[0] == page[1] for page in pages)
+    assert tshark == [2, 4, 6, 8]
+
+
+def test_window_context_dissects_only_the_page(tshark, capture, monkeypatch, cache):
+    pages = page_through(capture, monkeypatch, np.array([2, 3, 5, 7]), filters='udp.dstport == 53')
+
+    assert pages == [([2, 3], [1, 2]), ([5, 7], [1, 2])]
+    assert tshark == [2, 2]
+
+
+def test_window_context_waits_for_the_packet_index(tshark, capture, monkeypatch, cache):
+    monkeypatch.setattr(wireshark_api, 'plan_filter', lambda filepath, filters: None)
+    response = wireshark_api.app.test_client().post('/packets', json={
+        'filename': capture, 'filters': 'udp.dstport == 53'})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '5'
+    assert tshark == []
+
+
+def test_contexts_are_cached_separately(tshark, capture, cache):
+    client = wireshark_api.app.test_client()
+    body = {'filename': capture, 'cursor': 3, 'page_size': 2}
+
+    window = client.post('/packets', json=body).get_json()
+    whole = client.post('/packets', json={**body, 'context': 'capture'}).get_json()
+
+    assert positions(window['packets']) == [1, 2]
+    assert positions(whole['packets']) == [3, 4]
+    assert client.post('/packets', json={**body, 'context': 'full'}).status_code == 400
@@ -0,0 +1,76 @@
+import hashlib
+import os
+
+import pytest
+
+import evidence as evidence_module
+import wireshark_api
+from conftest import udp_frame, write_pcap
+
+NAMES = [f'capture{n:03}.pcap' for n in range(150)]
+
+
+@pytest.fixture
+def catalog(tmp_path, evidence, monkeypatch):
+    catalog = evidence_module.EvidenceCatalog(str(tmp_path / 'catalog.db'))
+    for name in NAMES:
+        path = evidence / name
+        path.write_bytes(b'')
+        catalog.upsert(name, os.stat(path))
+    monkeypatch.setattr(wireshark_api, 'evidence_catalog', catalog)
+    monkeypatch.setattr(wireshark_api.evidence_watcher, 'start', lambda: None)
+    return catalog
+
+
+def test_files_lists_everything_without_paging_parameters(catalog):
+    result = wireshark_api.app.test_client().get('/files').get_json()
+
+    assert [entry['filename'] for entry in result['files']] == NAMES
+    assert result['next_offset'] is None
+
+
+def test_files_pages_on_request(catalog):
+    client = wireshark_api.app.test_client()
+
+    first = client.get('/files?offset=0').get_json()
+    assert first['count'] == wireshark_api.PAGE_SIZE
+    assert first['next_offset'] == wireshark_api.PAGE_SIZE
+
+    second = client.get('/files?limit=40&offset=120').get_json()
+    assert [entry['filename'] for entry in second['files']] == NAMES[120:150]
+    assert client.get('/files?limit=0').status_code == 400
+
+
+def test_watcher_hashes_once_the_service_is_idle(tmp_path, evidence, monkeypatch):
+    filepath = evidence / 'a.pcap'
+    write_pcap(str(filepath), [udp_frame(b'x')] * 3)
+    os.utime(filepath, (0, 0))
+    catalog = evidence_module.EvidenceCatalog(str(tmp_path / 'catalog.db'))
+    catalog.upsert('a.pcap', os.stat(filepath))
+
+    busy = [2]  # the service is busy for the first two idle checks
+    events = []
+
+    def stats():
+        events.append('busy' if busy[0] else 'idle')
+        busy[0] = max(busy[0] - 1, 0)
+        return {'active': 1 if events[-1] == 'busy' else 0, 'queued': 0}
+
+    def capture_sha256(path):
+        events.append('hash')
+        return hashlib.sha256(filepath.read_bytes()).hexdigest()
+
+    monkeypatch.setattr(evidence_module.tshark_admission, 'stats', stats)
+    monkeypatch.setattr(evidence_module, 'PREWARM_IDLE_CHECK', 0)
+    monkeypatch.setattr(evidence_module, 'capture_sha256', capture_sha256)
+    monkeypatch.setattr(evidence_module, 'load_summary', lambda *args: (False, None, 'skipped', None))
+    monkeypatch.setattr(evidence_module, 'load_frame_index', lambda filepath: None)
+    monkeypatch.setattr(evidence_module, 'load_packet_index', lambda filepath: None)
+
+    watcher = evidence_module.EvidenceWatcher(wireshark_api.app, str(evidence), catalog)
+    watcher.process('a.pcap')
+
+    assert events == ['busy', 'busy', 'idle', 'hash']
+    files, _ = catalog.page()
+    assert files[0]['packet_count'] == 3
+    assert files[0]['sha256'] == hashlib.sha256(filepath.read_bytes()).hexdigest()
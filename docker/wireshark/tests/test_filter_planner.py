@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from capture_index import PROTOCOL_BITS, FilterPlanner, PacketIndex
+
+
+def make_index(rows):
+    """Build a PacketIndex from (src, dst, sport, dport, protocols, length) rows"""
+    def ip(address):
+        return int.from_bytes(bytes(int(part) for part in address.split('.')), 'big') if address else 0
+
+    return PacketIndex({
+        'timestamp': np.arange(len(rows), dtype=np.float64) + 100.0,
+        'length': np.array([row[5] for row in rows], dtype=np.uint32),
+        'offset': np.zeros(len(rows), dtype=np.uint64),
+        'src_ip': np.array([ip(row[0]) for row in rows], dtype=np.uint32),
+        'dst_ip': np.array([ip(row[1]) for row in rows], dtype=np.uint32),
+        'src_port': np.array([row[2] for row in rows], dtype=np.uint16),
+        'dst_port': np.array([row[3] for row in rows], dtype=np.uint16),
+        'proto_mask': np.array([sum(PROTOCOL_BITS[name] for name in row[4]) for row in rows], dtype=np.uint64),
+    })
+
+
+PACKETS = make_index([
+    ('10.0.0.1', '10.0.0.2', 1234, 53, ['eth', 'ip', 'udp', 'dns'], 80),
+    ('10.0.0.2', '10.0.0.1', 53, 1234, ['eth', 'ip', 'udp', 'dns'], 120),
+    ('192.168.1.5', '10.0.0.1', 40000, 443, ['eth', 'ip', 'tcp', 'tls'], 1500),
+    (None, None, 0, 0, ['eth', 'arp'], 60),
+])
+
+
+@pytest.mark.parametrize('filters, frames', [
+    ('dns', [1, 2]),
+    ('tcp || arp', [3, 4]),
+    ('ip.addr == 10.0.0.2', [1, 2]),
+    ('ip.src == 10.0.0.0/8', [1, 2]),
+    ('ip.dst != 10.0.0.1', [1]),
+    ('udp.port == 53 and frame.len > 100', [2]),
+    ('tcp.dstport == 443', [3]),
+    ('not ip', [4]),
+    ('!(dns) && frame.number <= 3', [3]),
+    ('frame.time_relative >= 2', [3, 4]),
+])
+def test_filter_planner(filters, frames):
+    mask = FilterPlanner(PACKETS).plan(filters)
+    assert list(np.flatnonzero(mask) + 1) == frames
+
+
+def test_frames_without_ip_never_match_addresses():
+    mask = FilterPlanner(PACKETS).plan('ip.addr == 0.0.0.0/0')
+    assert list(np.flatnonzero(mask) + 1) == [1, 2, 3]
+
+
+@pytest.mark.parametrize('filters', [
+    'http.request.method == "GET"',
+    'ip.addr != 10.0.0.1',
+    'tcp.port != 80',
+    'ip.src > 10.0.0.1',
+    'dns and',
+    '(dns',
+])
+def test_filter_planner_defers_unsupported_filters(filters):
+    assert FilterPlanner(PACKETS).plan(filters) is None
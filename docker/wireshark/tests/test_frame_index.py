@@ -0,0 +1,45 @@
+import io
+
+import pytest
+
+from capture_index import CaptureReader, FrameIndex, build_frame_index, carve_frames, load_frame_index
+from conftest import udp_frame, write_pcap, write_pcapng
+
+FRAMES = [udp_frame(b'x' * n) for n in (10, 20, 30)]
+
+
+@pytest.mark.parametrize('writer', [write_pcap, write_pcapng])
+def test_carved_frames_form_a_capture(tmp_path, writer):
+    path = str(tmp_path / 'a.cap')
+    writer(path, FRAMES)
+    index = build_frame_index(path)
+
+    out = io.BytesIO()
+    carve_frames(path, index, [1, 3], out)
+    carved = tmp_path / 'carved.cap'
+    carved.write_bytes(out.getvalue())
+
+    with CaptureReader(str(carved)) as reader:
+        assert [bytes(record[5]) for record in reader.records(with_data=True)] == [FRAMES[0], FRAMES[2]]
+
+
+@pytest.mark.parametrize('writer', [write_pcap, write_pcapng])
+def test_payload_excludes_record_headers(tmp_path, writer):
+    path = str(tmp_path / 'a.cap')
+    writer(path, FRAMES)
+    index = build_frame_index(path)
+
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert [index.payload(data, number) for number in (1, 2, 3)] == FRAMES
+
+
+def test_frame_index_is_persisted(tmp_path, cache):
+    path = str(tmp_path / 'a.pcap')
+    write_pcap(path, FRAMES)
+
+    success, index, _ = load_frame_index(path)
+    assert success
+    saved = FrameIndex.load(f"{cache.capture_dir(path)}/frames.idx")
+    assert list(saved.offsets) == list(index.offsets)
+    assert saved.header == index.header
@@ -0,0 +1,99 @@
+import gzip
+import json
+import os
+
+import pytest
+
+import wireshark_api
+from conftest import udp_frame, write_pcap
+
+
+@pytest.fixture
+def client(evidence):
+    write_pcap(str(evidence / 'a.pcap'), [udp_frame(b'hello')] * 3)
+    return wireshark_api.app.test_client()
+
+
+def test_result_carries_strong_etag(client):
+    response = client.post('/metadata', json={'filename': 'a.pcap'})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'].startswith('"')
+    assert response.headers['Cache-Control'] == 'no-cache'
+    assert response.get_json()['metadata']['packet_count'] == 3
+
+
+def test_matching_etag_answers_304(client):
+    etag = client.post('/metadata', json={'filename': 'a.pcap'}).headers['ETag']
+
+    response = client.post('/metadata', json={'filename': 'a.pcap'}, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.data == b''
+
+    # If-None-Match uses weak comparison, so a weak form of the same tag also matches
+    response = client.post('/metadata', json={'filename': 'a.pcap'}, headers={'If-None-Match': f'W/{etag}'})
+    assert response.status_code == 304
+
+
+def test_changed_capture_gets_new_etag(client, evidence):
+    etag = client.post('/metadata', json={'filename': 'a.pcap'}).headers['ETag']
+    write_pcap(str(evidence / 'a.pcap'), [udp_frame(b'hello')] * 4)
+
+    response = client.post('/metadata', json={'filename': 'a.pcap'}, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['metadata']['packet_count'] == 4
+
+
+def test_errors_are_not_tagged(client):
+    response = client.post('/metadata', json={'filename': 'missing.pcap'})
+
+    assert response.status_code == 404
+    assert 'ETag' not in response.headers
+
+
+def test_large_bodies_are_gzipped(client, cache, monkeypatch):
+    monkeypatch.setattr(wireshark_api, 'COMPRESS_MIN_BYTES', 0)
+
+    response = client.post('/metadata', json={'filename': 'a.pcap'}, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    payload = json.loads(gzip.decompress(response.data))
+    assert payload['metadata']['packet_count'] == 3
+
+    # The compressed body is kept next to the cached result and reused
+    capture = os.path.join(wireshark_api.EVIDENCE_DIR, 'a.pcap')
+    variants = [name for name in os.listdir(cache.capture_dir(capture)) if name.endswith('.gzip')]
+    assert len(variants) == 1
+    again = client.post('/metadata', json={'filename': 'a.pcap'}, headers={'Accept-Encoding': 'gzip'})
+    assert again.data == response.data
+
+
+def test_each_content_coding_has_its_own_etag(client, monkeypatch):
+    monkeypatch.setattr(wireshark_api, 'COMPRESS_MIN_BYTES', 0)
+    identity = client.post('/metadata', json={'filename': 'a.pcap'}, headers={'Accept-Encoding': 'identity'})
+    gzipped = client.post('/metadata', json={'filename': 'a.pcap'}, headers={'Accept-Encoding': 'gzip'})
+
+    assert gzipped.headers['ETag'] == identity.headers['ETag'][:-1] + '-gzip"'
+
+    response = client.post('/metadata', json={'filename': 'a.pcap'},
+                           headers={'Accept-Encoding': 'gzip', 'If-None-Match': gzipped.headers['ETag']})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == gzipped.headers['ETag']
+
+    # A client that no longer accepts gzip does not hold the body it would get now
+    response = client.post('/metadata', json={'filename': 'a.pcap'},
+                           headers={'Accept-Encoding': 'identity', 'If-None-Match': gzipped.headers['ETag']})
+    assert response.status_code == 200
+    assert response.headers['ETag'] == identity.headers['ETag']
+
+
+def test_small_bodies_and_identity_clients_are_not_compressed(client, monkeypatch):
+    response = client.post('/metadata', json={'filename': 'a.pcap'}, headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert 'Accept-Encoding' in response.headers['Vary']
+
+    monkeypatch.setattr(wireshark_api, 'COMPRESS_MIN_BYTES', 0)
+    response = client.post('/metadata', json={'filename': 'a.pcap'}, headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers
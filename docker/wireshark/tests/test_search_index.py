@@ -0,0 +1,93 @@
+import pytest
+
+import search_index as search_index_module
+from capture_cache import get_capture_identity
+from config import SEARCH_GRAM_FRAME_BYTES
+from conftest import udp_frame, write_pcap
+
+FRAMES = [
+    udp_frame(b'\x00ab\x01xyz\x02'),  # only 2- and 3-byte printable runs
+    udp_frame(b'A' * (SEARCH_GRAM_FRAME_BYTES + 100) + b'\x00needle\x00'),  # beyond the n-gram budget
+    udp_frame(b'\x01\x02\x03\x04'),  # no printable payload
+    udp_frame(b'GET /Index.html HTTP/1.1'),
+]
+
+
+@pytest.fixture
+def no_indicators(monkeypatch):
+    def stream_tshark_command(command, timeout=None):
+        yield True, None
+
+    monkeypatch.setattr(search_index_module, 'stream_tshark_command', stream_tshark_command)
+
+
+@pytest.fixture
+def index(tmp_path, evidence, no_indicators):
+    write_pcap(str(evidence / 'a.pcap'), FRAMES)
+    search_index = search_index_module.SearchIndex(str(tmp_path / 'search.db'))
+    assert search_index.index_capture(str(evidence / 'a.pcap'), 'a.pcap') == (True, None)
+    return search_index
+
+
+def test_finds_short_printable_runs(index):
+    assert index.search_string('xyz') == [('a.pcap', [1])]
+
+
+def test_search_is_case_insensitive(index):
+    assert index.search_string('index.HTML') == [('a.pcap', [4])]
+
+
+def test_finds_strings_beyond_the_indexed_bytes(index):
+    assert index.search_string('needle') == [('a.pcap', [2])]
+
+
+def test_non_printable_needle_scans_frames(index):
+    assert index.search_string('\x01\x02\x03') == [('a.pcap', [3])]
+
+
+def test_absent_string(index):
+    assert index.search_string('missing') == []
+
+
+def test_older_layout_is_reindexed(index, evidence):
+    filepath = str(evidence / 'a.pcap')
+    identity = get_capture_identity(filepath)
+    assert index.is_current('a.pcap', identity)
+
+    with index._connect() as connection:
+        connection.execute('UPDATE captures SET grams = 1')
+    assert not index.is_current('a.pcap', identity)
+
+    index.index_capture(filepath, 'a.pcap')
+    assert index.is_current('a.pcap', identity)
+    assert index.stats()['captures'] == 1
+
+
+def test_changed_capture_is_not_current(index, evidence):
+    filepath = str(evidence / 'a.pcap')
+    write_pcap(filepath, FRAMES[:2])
+
+    assert not index.is_current('a.pcap', get_capture_identity(filepath))
+
+
+def test_postings_written_in_batches(tmp_path, evidence, no_indicators, monkeypatch):
+    monkeypatch.setattr(search_index_module, 'SEARCH_GRAM_BATCH_POSTINGS', 8)
+    write_pcap(str(evidence / 'a.pcap'), [udp_frame(b'GET /Index.html HTTP/1.1')] * 5)
+    search_index = search_index_module.SearchIndex(str(tmp_path / 'search.db'))
+    search_index.index_capture(str(evidence / 'a.pcap'), 'a.pcap')
+
+    with search_index._connect() as connection:
+        batches = connection.execute('SELECT COUNT(*) FROM gram_batches WHERE gram = ?', (b'get',)).fetchone()[0]
+    assert batches == 5
+    assert search_index.search_string('index.html') == [('a.pcap', [1, 2, 3, 4, 5])]
+
+
+def test_record_headers_are_not_searched(tmp_path, evidence, no_indicators, monkeypatch):
+    # The record header of frame 1 starts with its timestamp seconds, stored as 'abcd'
+    write_pcap(str(evidence / 'a.pcap'), [udp_frame(b'payload'), udp_frame(b'xabcdx')],
+               start=int.from_bytes(b'abcd', 'little'))
+    monkeypatch.setattr(search_index_module, 'SEARCH_GRAM_MAX_BYTES', 0)  # scan every frame
+    search_index = search_index_module.SearchIndex(str(tmp_path / 'search.db'))
+    search_index.index_capture(str(evidence / 'a.pcap'), 'a.pcap')
+
+    assert search_index.search_string('abcd') == [('a.pcap', [2])]
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+import stream_store
+from conftest import udp_frame, write_pcap
+
+
+def field_line(frame, seq, payload, client=True):
+    src, dst = ('10.0.0.1', '10.0.0.2') if client else ('10.0.0.2', '10.0.0.1')
+    sport, dport = ('1111', '80') if client else ('80', '1111')
+    values = [str(frame), '0', '', src, dst, '', '', sport, dport, '', '', str(seq), payload.hex(), '']
+    return ('\t'.join(values) + '\n').encode('utf-8')
+
+
+@pytest.fixture
+def streams(tmp_path, monkeypatch):
+    def fake_tshark(command, timeout=None):
+        yield True, None
+        yield field_line(1, 1, b'GET / HTTP/1.1')
+        yield field_line(2, 1, b'HTTP/1.1 200 OK', client=False)
+
+    monkeypatch.setattr(stream_store, 'stream_tshark_command', fake_tshark)
+    monkeypatch.setattr(stream_store, 'STREAM_DIR', str(tmp_path / 'streams'))
+    monkeypatch.setattr(stream_store, '_stream_stores', type(stream_store._stream_stores)())
+    capture = str(tmp_path / 'a.pcap')
+    write_pcap(capture, [udp_frame(b'x')] * 2)
+    return capture
+
+
+def test_store_lives_outside_the_result_cache(streams, tmp_path, cache):
+    success, store, _ = stream_store.load_stream_store(streams)
+
+    assert success
+    assert store.directory.startswith(str(tmp_path / 'streams'))
+    assert not os.path.exists(cache.root)
+    assert [chunk[3] for chunk in store.read('tcp:0', 0, 1024)] == [b'GET / HTTP/1.1', b'HTTP/1.1 200 OK']
+
+
+def test_store_is_reloaded_from_disk(streams):
+    _, store, _ = stream_store.load_stream_store(streams)
+    stream_store._stream_stores.clear()
+
+    _, reloaded, _ = stream_store.load_stream_store(streams)
+    assert reloaded is not store
+    assert reloaded.streams == store.streams
+    assert reloaded.read('tcp:0', 4, 5)[0][3] == b'/ HTT'
+
+
+def test_new_capture_version_replaces_the_old_store(streams):
+    _, old, _ = stream_store.load_stream_store(streams)
+    write_pcap(streams, [udp_frame(b'x')] * 3)
+
+    _, new, _ = stream_store.load_stream_store(streams)
+    assert new.directory != old.directory
+    assert os.listdir(os.path.dirname(new.directory)) == [os.path.basename(new.directory)]
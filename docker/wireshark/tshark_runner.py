@@ -0,0 +1,279 @@
+"""
+tshark execution for the Wireshark Analysis API
+
+Every tshark (and sharkd) request goes through the admission limiter, which
+bounds concurrent processes and schedules waiting clients fairly.
+"""
+
+import logging
+import subprocess
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+
+from flask import g, has_app_context, has_request_context, request
+
+from config import MAX_ADMISSION_WAIT, MAX_TSHARK_QUEUE, STREAM_TIMEOUT, TSHARK_SLOTS, TSHARK_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a tshark run cannot be admitted in time"""
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TsharkAdmission:
+    """
+    Global concurrency limit for tshark subprocesses with per-client fair queuing
+
+    At most `slots` tshark processes run at once. Further requests wait in a
+    per-client queue and free slots are handed out round-robin across
+    clients, so one client issuing many expensive requests cannot starve the
+    others. When the wait queue is full, or a request waits longer than
+    max_wait seconds, AdmissionRejected is raised with a Retry-After hint.
+    """
+    def __init__(self, slots, max_queue, max_wait):
+        self.slots = slots
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self._queues = OrderedDict()  # client -> deque of waiting tickets, in round-robin order
+        self._granted = set()
+        self._queued = 0
+        self._cond = threading.Condition()
+        self._average_run = 1.0  # moving average of tshark run time, in seconds
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _retry_after_locked(self):
+        """Estimate seconds until a slot is likely to be free"""
+        return max(1, int(self._average_run * (self._queued + 1) / self.slots + 0.5))
+
+    def _grant_locked(self):
+        """Hand free slots to waiting clients in round-robin order"""
+        while self.active < self.slots and self._queues:
+            client, tickets = next(iter(self._queues.items()))
+            self._granted.add(tickets.popleft())
+            if tickets:
+                self._queues.move_to_end(client)
+            else:
+                del self._queues[client]
+            self._queued -= 1
+            self.active += 1
+        self._cond.notify_all()
+
+    def acquire(self, client, bounded=True):
+        """
+        Wait for a tshark slot
+
+        Args:
+            client (str): Key identifying the requesting client
+            bounded (bool): Apply the queue length and wait limits
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait timed out
+        """
+        with self._cond:
+            if self.active < self.slots and not self._queues:
+                self.active += 1
+                self.admitted += 1
+                return
+
+            if bounded and self._queued >= self.max_queue:
+                self.rejected += 1
+                raise AdmissionRejected('Too many analysis requests queued', self._retry_after_locked())
+
+            ticket = object()
+            self._queues.setdefault(client, deque()).append(ticket)
+            self._queued += 1
+            deadline = time.monotonic() + self.max_wait
+
+            while ticket not in self._granted:
+                remaining = deadline - time.monotonic() if bounded else None
+                if remaining is not None and remaining <= 0:
+                    self._queues[client].remove(ticket)
+                    if not self._queues[client]:
+                        del self._queues[client]
+                    self._queued -= 1
+                    self.timeouts += 1
+                    raise AdmissionRejected('Timed out waiting for an analysis slot',
+                                            self._retry_after_locked())
+                self._cond.wait(remaining)
+
+            self._granted.discard(ticket)
+            self.admitted += 1
+
+    def release(self, run_seconds):
+        """
+        Return a slot and record how long the tshark run took
+
+        Args:
+            run_seconds (float): Duration of the finished run
+        """
+        with self._cond:
+            self.active -= 1
+            self._average_run = 0.9 * self._average_run + 0.1 * run_seconds
+            self._grant_locked()
+
+    def stats(self):
+        """Return limiter counters for monitoring"""
+        with self._cond:
+            return {
+                'slots': self.slots,
+                'active': self.active,
+                'queued': self._queued,
+                'queued_clients': len(self._queues),
+                'max_queue': self.max_queue,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'average_run_seconds': round(self._average_run, 3)
+            }
+
+
+tshark_admission = TsharkAdmission(TSHARK_SLOTS, MAX_TSHARK_QUEUE, MAX_ADMISSION_WAIT)
+
+
+def current_client():
+    """
+    Return the key used for fair scheduling of the current request
+
+    Callers such as the backend can pass an X-Client-Id header (e.g. the
+    user id); otherwise requests are grouped by remote address.
+    """
+    if not has_request_context():
+        return 'internal'
+    return request.headers.get('X-Client-Id') or request.remote_addr or 'unknown'
+
+
+def admit_tshark():
+    """
+    Acquire a tshark slot for the current request or job
+
+    Returns:
+        float: Start time to pass to finish_tshark()
+
+    Raises:
+        AdmissionRejected: If the request cannot be admitted
+    """
+    in_job = has_app_context() and g.get('in_job', False)
+    tshark_admission.acquire(current_client(), bounded=not in_job)
+    return time.monotonic()
+
+
+def finish_tshark(started):
+    """Release the tshark slot acquired by admit_tshark()"""
+    tshark_admission.release(time.monotonic() - started)
+
+
+def run_tshark_command(command, timeout=None):
+    """
+    Execute a tshark command with timeout and error handling
+
+    Args:
+        command (list): Command and arguments as list
+        timeout (int): Timeout in seconds (default: TSHARK_TIMEOUT, or
+            JOB_TSHARK_TIMEOUT inside async analysis jobs)
+
+    Returns:
+        tuple: (success, stdout, stderr)
+
+    Raises:
+        AdmissionRejected: If no tshark slot becomes available in time
+    """
+    if timeout is None:
+        timeout = g.get('tshark_timeout', TSHARK_TIMEOUT) if has_app_context() else TSHARK_TIMEOUT
+
+    started = admit_tshark()
+    try:
+        logger.info(f"Executing command: {' '.join(command)}")
+
+        result = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=timeout,
+            text=True
+        )
+
+        if result.returncode != 0:
+            logger.error(f"Command failed with return code {result.returncode}: {result.stderr}")
+            return False, None, result.stderr
+
+        return True, result.stdout, None
+
+    except subprocess.TimeoutExpired:
+        logger.error(f"Command timed out after {timeout} seconds")
+        return False, None, f"Command timed out after {timeout} seconds"
+    except Exception as e:
+        logger.error(f"Error executing command: {str(e)}")
+        return False, None, str(e)
+    finally:
+        finish_tshark(started)
+
+
+def stream_tshark_command(command, timeout=STREAM_TIMEOUT):
+    """
+    Execute a tshark command and yield its stdout line by line
+
+    The first item yielded is a (success, stderr) tuple telling whether tshark
+    produced output or failed before writing anything; the remaining items are
+    raw output lines as bytes. Closing the generator kills tshark.
+
+    Args:
+        command (list): Command and arguments as list
+        timeout (int): Timeout in seconds for the whole run
+
+    Yields:
+        tuple, then bytes: Startup status, then output lines
+
+    Raises:
+        AdmissionRejected: If no tshark slot becomes available in time
+    """
+    # The slot is held for the whole stream and released when the generator closes
+    started = admit_tshark()
+    logger.info(f"Streaming command: {' '.join(command)}")
+
+    # stderr goes to a temporary file so a chatty tshark can never block on a full pipe
+    stderr_file = tempfile.TemporaryFile()
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file)
+    except Exception:
+        stderr_file.close()
+        finish_tshark(started)
+        raise
+    watchdog = threading.Timer(timeout, process.kill)
+    watchdog.start()
+
+    def read_stderr():
+        stderr_file.seek(0)
+        return stderr_file.read().decode('utf-8', errors='replace')
+
+    try:
+        first = process.stdout.readline()
+        if not first and process.wait() != 0:
+            logger.error(f"Command failed with return code {process.returncode}")
+            yield False, read_stderr()
+            return
+
+        yield True, None
+        line = first
+        while line:
+            yield line
+            line = process.stdout.readline()
+
+        if process.wait() != 0:
+            logger.error(f"Streaming command ended with return code {process.returncode}")
+    finally:
+        watchdog.cancel()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+        stderr_file.close()
+        finish_tshark(started)
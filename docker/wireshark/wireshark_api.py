@@ -4,13 +4,62 @@ Wireshark Network Analysis API
 Provides REST endpoints for analyzing network capture files using tshark
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, has_app_context, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 import subprocess
+import asyncio
 import json
 import os
+import hashlib
+import threading
 import logging
+import gzip
+import tempfile
+import time
+from collections import OrderedDict
 from pathlib import Path
+from urllib.parse import urlencode
+
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+try:
+    import numpy as np
+except ImportError:  # The packet index and its filter fast path are disabled without NumPy
+    np = None
+
+try:
+    import brotli
+except ImportError:  # Responses are not offered with br encoding without brotli
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # Responses are not offered with zstd encoding without zstandard
+    zstandard = None
+
+from analysis_jobs import analysis_job_lock, analysis_jobs, analysis_queue_stats, submit_analysis_job
+from asgi_server import AsgiServer, asgi_response_headers
+from capture_cache import get_capture_identity, result_cache, short_digest
+from capture_index import (dissect_frames, dissect_in_capture, dissect_matches, filter_supported, load_frame_index,
+                           load_packet_index, plan_filter, read_capture_metadata)
+from config import (ASGI_THREADS, CACHE_DIR, CATALOG_SORT_COLUMNS, COMPRESS_MIN_BYTES, ENGINES, ETAG_VERSION,
+                    ETAG_VIEWS, EVIDENCE_DIR, EXPORT_DIR, EXPORT_FORMATS, EXPORT_NAME_PATTERN,
+                    FIELD_NAME_PATTERN, FOLLOW_ENCODINGS, FOLLOW_PAGE_BYTES, MAX_FIELDS,
+                    MAX_FOLLOW_PAGE_BYTES, MAX_IO_BUCKETS, MAX_LONG_POLL, MAX_PACKETS, MAX_SCAN_FRAMES,
+                    MAX_SEARCH_FRAMES, MAX_SHARDS, MAX_STREAM_PACKETS, OBJECT_DIR, OBJECT_HASH_PATTERN,
+                    OBJECT_PROTOCOLS, OUTPUT_DIR, PAGE_SIZE, SEARCH_FIELDS, SERVER_MODE, SHARDED_TAPS,
+                    SHARKD_METHODS, STREAM_READ_LIMIT, STREAM_TIMEOUT, SUMMARY_TAPS)
+from evidence import EvidenceWatcher, capture_sha256, evidence_catalog, known_capture_sha256
+from io_graph import compute_io_graph, conversation_labels, protocol_labels
+from object_store import object_store
+from search_index import search_index
+from sharkd import SharkdError, load_sharkd_tables, sharkd_pool
+from stream_store import encode_payload, load_stream_store
+from summaries import (load_sharded_summary, load_summary, load_summary_tables, protocols_payload,
+                       statistics_payload)
+from table_parsers import CONVERSATION_COLUMNS, HIERARCHY_COLUMNS, flatten_protocol_hierarchy, query_rows
+from tshark_runner import AdmissionRejected, run_tshark_command, stream_tshark_command, tshark_admission
 
 # Configure logging
 logging.basicConfig(
@@ -23,47 +72,26 @@ logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Configuration
-EVIDENCE_DIR = '/evidence'
-OUTPUT_DIR = '/output'
-TSHARK_TIMEOUT = 60  # seconds
-MAX_PACKETS = 1000  # Maximum packets to return in analyze endpoint
+evidence_watcher = EvidenceWatcher(app, EVIDENCE_DIR, evidence_catalog)
 
 
-def run_tshark_command(command, timeout=TSHARK_TIMEOUT):
+def busy_response(error):
     """
-    Execute a tshark command with timeout and error handling
+    Build a 429 response for a rejected tshark run
 
     Args:
-        command (list): Command and arguments as list
-        timeout (int): Timeout in seconds
+        error (AdmissionRejected): Rejection raised by the limiter
 
     Returns:
-        tuple: (success, stdout, stderr)
+        tuple: (response, 429)
     """
-    try:
-        logger.info(f"Executing command: {' '.join(command)}")
-
-        result = subprocess.run(
-            command,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=timeout,
-            text=True
-        )
-
-        if result.returncode != 0:
-            logger.error(f"Command failed with return code {result.returncode}: {result.stderr}")
-            return False, None, result.stderr
-
-        return True, result.stdout, None
-
-    except subprocess.TimeoutExpired:
-        logger.error(f"Command timed out after {timeout} seconds")
-        return False, None, f"Command timed out after {timeout} seconds"
-    except Exception as e:
-        logger.error(f"Error executing command: {str(e)}")
-        return False, None, str(e)
+    response = jsonify({
+        'success': False,
+        'error': str(error),
+        'retry_after': error.retry_after
+    })
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 429
 
 
 def validate_file_path(filename):
@@ -94,6 +122,192 @@ def validate_file_path(filename):
     return True, filepath, None
 
 
+def cache_response(payload, hit):
+    """
+    Build a JSON response for a cacheable result
+
+    Args:
+        payload (dict): Result payload
+        hit (bool): Whether the payload came from the result cache
+
+    Returns:
+        tuple: (response, status_code)
+    """
+    response = jsonify(payload)
+    response.headers['X-Cache'] = 'HIT' if hit else 'MISS'
+    return response, 200
+
+
+def request_etag(filepath):
+    """
+    Derive the ETag for the current request from capture identity and arguments
+
+    This is the strong tag of the identity body; each compressed body is
+    tagged with it plus the content coding (see encoded_etag()), since the
+    bodies differ byte for byte.
+
+    Args:
+        filepath (str): Path to the capture the request reads
+
+    Returns:
+        str: Unquoted entity tag
+    """
+    if request.method == 'GET':
+        args = request.args.to_dict()
+    else:
+        args = request.get_json(silent=True) or {}
+    # A boolean 'stream' only selects NDJSON delivery; /follow's integer 'stream' picks the result
+    args = {key: value for key, value in args.items()
+            if key != 'async' and not (key == 'stream' and isinstance(value, bool))}
+    return short_digest(json.dumps([ETAG_VERSION, get_capture_identity(filepath), request.path, args],
+                              sort_keys=True, separators=(',', ':')))
+
+
+def encoded_etag(etag, encoding):
+    """Strong tag of a result body sent with a content coding (None for identity)"""
+    return etag if encoding is None else f"{etag}-{encoding}"
+
+
+def negotiate_encoding():
+    """
+    Pick the response content coding from the Accept-Encoding header
+
+    Returns:
+        str or None: 'zstd', 'br' or 'gzip' (best supported first), or None
+    """
+    available = ['gzip']
+    if brotli is not None:
+        available.insert(0, 'br')
+    if zstandard is not None:
+        available.insert(0, 'zstd')
+
+    accepted = request.accept_encodings
+    quality = {encoding: accepted.quality(encoding) for encoding in available}
+    best = max(available, key=lambda encoding: quality[encoding])  # ties keep the order above
+    return best if quality[best] > 0 else None
+
+
+def compress_body(body, encoding):
+    """Compress a response body with the given content coding"""
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(body)
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+@app.before_request
+def check_not_modified():
+    """Answer 304 before any analysis runs when the client already has the result"""
+    if request.endpoint not in ETAG_VIEWS:
+        return None
+    filename = request.args.get('filename') if request.method == 'GET' else \
+        (request.get_json(silent=True) or {}).get('filename')
+    if not isinstance(filename, str):
+        return None
+    valid, filepath, _ = validate_file_path(filename)
+    if not valid:
+        return None
+
+    g.etag = request_etag(filepath)
+    g.etag_filepath = filepath
+    # The client may hold the identity body (always sent for small results) or the body in
+    # the coding this request negotiates; the 304 names the representation that matched
+    for etag in (encoded_etag(g.etag, negotiate_encoding()), g.etag):
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+    return None
+
+
+@app.after_request
+def finalize_response(response):
+    """
+    Tag analysis results with their ETag and compress large bodies
+
+    Compressed bodies of capture results are kept next to the cached
+    results, so repeated requests are served without compressing again.
+    """
+    if response.status_code != 200 or response.is_streamed or response.direct_passthrough \
+            or g.get('in_job', False):
+        return response
+
+    etag = g.get('etag')
+    if etag is not None:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+
+    if 'Content-Encoding' in response.headers:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    body = response.get_data()
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    filepath = g.get('etag_filepath')
+    if filepath is not None:
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        compressed = result_cache.get_variant(filepath, digest, encoding)
+        if compressed is None:
+            compressed = compress_body(body, encoding)
+            result_cache.put_variant(filepath, digest, encoding, compressed)
+    else:
+        compressed = compress_body(body, encoding)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    if etag is not None:
+        response.set_etag(encoded_etag(etag, encoding))
+    return response
+
+
+
+def export_capture(filepath, filters, export_format):
+    """
+    Write the frames matching a display filter to a capture file in EXPORT_DIR
+
+    tshark writes the file itself, so the export never passes through
+    memory. Exports are named by source content hash, filter and format,
+    so an identical export is only written once.
+
+    Args:
+        filepath (str): Path to source capture
+        filters (str): Display filter; empty exports every frame
+        export_format (str): 'pcap' or 'pcapng'
+
+    Returns:
+        tuple: (success, export_name, stderr, reused)
+    """
+    source_hash = capture_sha256(filepath)
+    key = json.dumps([source_hash, filters.strip(), export_format], separators=(',', ':'))
+    export_name = f"{short_digest(key)}.{export_format}"
+    export_path = os.path.join(EXPORT_DIR, export_name)
+    if os.path.exists(export_path):
+        os.utime(export_path)
+        return True, export_name, None, True
+
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    tmp_path = f"{export_path}.{threading.get_ident()}.tmp"
+    command = ['tshark', '-r', filepath, '-w', tmp_path, '-F', export_format]
+    if filters.strip():
+        command.extend(['-Y', filters])
+
+    timeout = g.get('tshark_timeout', STREAM_TIMEOUT) if has_app_context() else STREAM_TIMEOUT
+    try:
+        success, _, stderr = run_tshark_command(command, timeout=max(timeout, STREAM_TIMEOUT))
+        if not success:
+            return False, None, stderr, False
+        os.replace(tmp_path, export_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return True, export_name, None, False
+
+
 @app.route('/', methods=['GET'])
 def welcome():
     """
@@ -104,11 +318,29 @@ def welcome():
         'status': 'running',
         'endpoints': {
             '/health': 'GET - Service health check',
-            '/files': 'GET - List available PCAP files',
-            '/analyze': 'POST - Analyze PCAP file (requires: filename, optional: filters, limit)',
-            '/statistics': 'POST - Get network statistics (requires: filename)',
-            '/protocols': 'POST - Get protocol hierarchy (requires: filename)'
+            '/files': 'GET - List catalogued PCAP files (optional: sort, order, limit, offset)',
+            '/analyze': 'POST - Analyze PCAP file (requires: filename, optional: filters, limit, stream, fields)',
+            '/statistics': 'POST - Get network statistics (requires: filename, optional: format, engine)',
+            '/protocols': 'POST - Get protocol hierarchy (requires: filename, optional: format, engine)',
+            '/summary': 'POST - Run several statistics taps in one pass (requires: filename, optional: taps, shards)',
+            '/metadata': 'POST - Packet count, duration, link type and rates without tshark (requires: filename)',
+            '/query': 'POST - Frame numbers matching a display filter (requires: filename, filters)',
+            '/io-graph': 'POST - Packets and bytes per interval (requires: filename, optional: interval, start, end, group_by)',
+            '/packets': 'POST - Page through packets (requires: filename, optional: cursor, page_size, filters)',
+            '/packet/<n>': 'GET - Dissect a single frame (requires: filename query parameter)',
+            '/export': 'POST - Save packets matching a filter as pcap/pcapng (requires: filename, optional: filters, format)',
+            '/exports/<name>': 'GET - Download an export (supports Range requests)',
+            '/evidence/<filename>': 'GET - Download an original capture (supports Range requests)',
+            '/objects': 'POST - Extract and list HTTP/SMB/TFTP/IMF objects (requires: filename, optional: protocol, limit, offset)',
+            '/objects/<sha256>': 'GET - Download an extracted object (supports Range requests)',
+            '/follow': 'POST - Follow a TCP/UDP stream or list streams (requires: filename, optional: protocol, stream, encoding, offset, length)',
+            '/search': 'GET - Find captures and frames mentioning an indicator or string (requires: q, optional: kind, match, limit)',
+            '/session': 'POST - Query a capture kept loaded in sharkd (requires: filename, method, optional: params)',
+            '/job-status/<job_id>': 'GET - Status and result of an async analysis job (optional: wait)',
+            '/jobs': 'GET - List async analysis jobs and queue statistics',
+            '/metrics': 'GET - Result cache, job queue, tshark admission and sharkd session counters'
         },
+        'async': 'Add "async": true to /analyze, /statistics, /protocols, /summary, /export, /objects or /follow to queue the request and receive a job_id',
         'documentation': 'Send POST requests with JSON body to analysis endpoints'
     }), 200
 
@@ -156,9 +388,16 @@ def analyze_pcap():
         filename (str): Name of pcap file in evidence directory
         filters (str, optional): Display filter (Wireshark syntax)
         limit (int, optional): Max packets to return (default: 1000)
+        stream (bool, optional): Stream packets as NDJSON (default: false,
+            also enabled by Accept: application/x-ndjson). Streaming allows
+            up to MAX_STREAM_PACKETS packets.
+        fields (list, optional): Only return these fields (e.g. ip.src,
+            _ws.col.Protocol) as one array of values per field
+        async (bool, optional): Queue the request and return a job_id (202)
 
     Returns:
-        JSON array of packet data
+        JSON array of packet data, columns of field values when fields are
+        given, or one JSON packet per line when streaming
     """
     try:
         # Parse request
@@ -170,8 +409,13 @@ def analyze_pcap():
             }), 400
 
         filename = data.get('filename')
-        filters = data.get('filters', '')
-        limit = min(int(data.get('limit', MAX_PACKETS)), MAX_PACKETS)
+        filters = data.get('filters')
+        filters = '' if filters is None else filters
+        stream = bool(data.get('stream')) or \
+            request.accept_mimetypes.best == 'application/x-ndjson'
+        fields = data.get('fields') or []
+        max_packets = MAX_STREAM_PACKETS if stream else MAX_PACKETS
+        limit = min(int(data.get('limit', max_packets)), max_packets)
 
         if not filename:
             return jsonify({
@@ -179,6 +423,19 @@ def analyze_pcap():
                 'error': 'filename is required'
             }), 400
 
+        if not isinstance(fields, list) or len(fields) > MAX_FIELDS or \
+                not all(isinstance(field, str) and FIELD_NAME_PATTERN.match(field) for field in fields):
+            return jsonify({
+                'success': False,
+                'error': f'fields must be a list of at most {MAX_FIELDS} field names'
+            }), 400
+
+        if not isinstance(filters, str):
+            return jsonify({
+                'success': False,
+                'error': 'filters must be a string'
+            }), 400
+
         # Validate file path
         valid, filepath, error = validate_file_path(filename)
         if not valid:
@@ -187,15 +444,49 @@ def analyze_pcap():
                 'error': error
             }), 404
 
-        # Build tshark command
-        command = ['tshark', '-r', filepath, '-T', 'json', '-c', str(limit)]
-
-        # Add display filter if provided
-        if filters:
-            command.extend(['-Y', filters])
-
-        # Execute command
-        success, stdout, stderr = run_tshark_command(command)
+        if data.get('async'):
+            return submit_analysis_job(request.path, data)
+
+        if stream:
+            return stream_packets(filepath, filters, limit, fields)
+
+        # Serve from cache when this capture was already analyzed with these arguments
+        params = {'filters': filters.strip(), 'limit': limit}
+        if fields:
+            params['fields'] = fields
+        cached = result_cache.get(filepath, 'analyze', params)
+        if cached is not None:
+            return cache_response(cached, hit=True)
+
+        if fields:
+            success, columns, stderr = run_field_projection(filepath, filters, limit, fields)
+            if not success:
+                return jsonify({
+                    'success': False,
+                    'error': 'Failed to analyze pcap',
+                    'details': stderr
+                }), 500
+
+            payload = {
+                'success': True,
+                'filename': filename,
+                'filters': filters,
+                'fields': fields,
+                'packet_count': len(columns[fields[0]]),
+                'columns': columns
+            }
+            result_cache.put(filepath, 'analyze', params, payload)
+
+            return cache_response(payload, hit=False)
+
+        # Both paths return the first `limit` matches dissected in the original capture, so a
+        # request gets the same packets whether or not the packet index is ready; simple filters
+        # let the index pick the frames, so tshark stops reading at the last of them
+        numbers = plan_filter(filepath, filters) if filters else None
+        if numbers is not None:
+            success, packets, stderr = dissect_in_capture(filepath, numbers[:limit].tolist())
+        else:
+            success, packets, stderr = dissect_matches(filepath, filters, limit)
 
         if not success:
             return jsonify({
@@ -204,20 +495,19 @@ def analyze_pcap():
                 'details': stderr
             }), 500
 
-        # Parse JSON output
-        try:
-            packets = json.loads(stdout) if stdout else []
-        except json.JSONDecodeError:
-            packets = []
-
-        return jsonify({
+        payload = {
             'success': True,
             'filename': filename,
             'filters': filters,
             'packet_count': len(packets),
             'packets': packets
-        }), 200
+        }
+        result_cache.put(filepath, 'analyze', params, payload)
+
+        return cache_response(payload, hit=False)
 
+    except AdmissionRejected as e:
+        return busy_response(e)
     except Exception as e:
         logger.error(f"Error in analyze endpoint: {str(e)}")
         return jsonify({
@@ -227,6 +517,137 @@ def analyze_pcap():
         }), 500
 
 
+def run_field_projection(filepath, filters, limit, fields):
+    """
+    Extract selected fields of each packet with tshark -T fields
+
+    Args:
+        filepath (str): Path to capture file
+        filters (str): Display filter (Wireshark syntax)
+        limit (int): Max packets to return
+        fields (list): Field names to extract
+
+    Returns:
+        tuple: (success, columns, stderr) where columns maps each field to a
+        list with one value per packet (None when absent, comma-joined when
+        the field occurs several times)
+    """
+    command = [
+        'tshark', '-r', filepath, '-T', 'fields', '-c', str(limit),
+        '-E', 'header=n', '-E', 'separator=/t', '-E', 'quote=n',
+        '-E', 'occurrence=a', '-E', 'aggregator=,'
+    ]
+    for field in fields:
+        command.extend(['-e', field])
+    if filters:
+        command.extend(['-Y', filters])
+
+    success, stdout, stderr = run_tshark_command(command)
+    if not success:
+        return False, None, stderr
+
+    columns = {field: [] for field in fields}
+    for line in (stdout or '').splitlines():
+        values = line.split('\t')
+        for position, field in enumerate(fields):
+            value = values[position] if position < len(values) else ''
+            columns[field].append(value if value else None)
+
+    return True, columns, None
+
+
+def stream_packets_command(filepath, filters, limit, fields=None):
+    """Build the tshark -T ek command used to stream packets as NDJSON"""
+    command = ['tshark', '-r', filepath, '-T', 'ek', '-c', str(limit)]
+    for field in fields or []:
+        command.extend(['-e', field])
+    if filters:
+        command.extend(['-Y', filters])
+    return command
+
+
+def streaming_analyze_args(data, accept):
+    """
+    Check whether an /analyze request is a valid streaming request
+
+    Used by the ASGI front end to serve streams natively; anything else,
+    including invalid requests, is left to analyze_pcap() so responses stay
+    identical.
+
+    Args:
+        data (dict): Request body
+        accept (str): Accept header
+
+    Returns:
+        tuple or None: (filepath, filters, limit, fields), or None
+    """
+    if not isinstance(data, dict) or data.get('async'):
+        return None
+    best = parse_accept_header(accept, MIMEAccept).best
+    if not (bool(data.get('stream')) or best == 'application/x-ndjson'):
+        return None
+
+    filename = data.get('filename')
+    filters = data.get('filters')
+    filters = '' if filters is None else filters
+    fields = data.get('fields') or []
+    if not filename or not isinstance(filters, str):
+        return None
+    if not isinstance(fields, list) or len(fields) > MAX_FIELDS or \
+            not all(isinstance(field, str) and FIELD_NAME_PATTERN.match(field) for field in fields):
+        return None
+    try:
+        limit = min(int(data.get('limit', MAX_STREAM_PACKETS)), MAX_STREAM_PACKETS)
+    except (TypeError, ValueError):
+        return None
+
+    valid, filepath, _ = validate_file_path(filename)
+    if not valid:
+        return None
+    return filepath, filters, limit, fields
+
+
+def stream_packets(filepath, filters, limit, fields=None):
+    """
+    Stream packets of a capture as NDJSON, one tshark -T ek document per line
+
+    Packets are forwarded as tshark writes them, so memory use stays flat
+    regardless of how many packets are returned.
+
+    Args:
+        filepath (str): Path to capture file
+        filters (str): Display filter (Wireshark syntax)
+        limit (int): Max packets to return
+        fields (list, optional): Restrict each document to these fields
+
+    Returns:
+        Streaming response, or JSON error if tshark fails to start
+    """
+    lines = stream_tshark_command(stream_packets_command(filepath, filters, limit, fields))
+    success, stderr = next(lines)
+    if not success:
+        return jsonify({
+            'success': False,
+            'error': 'Failed to analyze pcap',
+            'details': stderr
+        }), 500
+
+    def generate():
+        try:
+            for line in lines:
+                # Skip the bulk-index lines that -T ek emits before each packet
+                if line.startswith(b'{"index"'):
+                    continue
+                yield line
+        finally:
+            lines.close()
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response, 200
+
+
 @app.route('/statistics', methods=['POST'])
 def get_statistics():
     """
@@ -234,9 +655,15 @@ def get_statistics():
 
     Request body:
         filename (str): Name of pcap file in evidence directory
+        format (str, optional): 'text' (default) or 'table' for typed rows
+        With format 'table': protocol, address, port, min_frames, min_bytes,
+        sort, order and top select the rows to return (see query_rows)
+        engine (str, optional): 'tshark' (default) or 'sharkd' to answer the
+            table format from a long-lived session with the capture loaded
+        async (bool, optional): Queue the request and return a job_id (202)
 
     Returns:
-        Statistics text including conversation data
+        Statistics text including conversation data, or conversation rows
     """
     try:
         # Parse request
@@ -263,15 +690,39 @@ def get_statistics():
                 'error': error
             }), 404
 
-        # Build tshark command for statistics
-        command = [
-            'tshark', '-r', filepath, '-q',
-            '-z', 'conv,tcp',
-            '-z', 'conv,udp'
-        ]
+        if data.get('async'):
+            return submit_analysis_job(request.path, data)
+
+        output_format = data.get('format', 'text')
+        if output_format not in ('text', 'table'):
+            return jsonify({
+                'success': False,
+                'error': "format must be 'text' or 'table'"
+            }), 400
+
+        engine = data.get('engine', 'tshark')
+        if engine not in ENGINES or (engine == 'sharkd' and output_format == 'text'):
+            return jsonify({
+                'success': False,
+                'error': "engine must be 'tshark', or 'sharkd' with format 'table'"
+            }), 400
 
-        # Execute command
-        success, stdout, stderr = run_tshark_command(command)
+        if output_format == 'text':
+            cached = result_cache.get(filepath, 'statistics', {})
+            if cached is not None:
+                return cache_response(cached, hit=True)
+
+        if output_format == 'text':
+            # Run all summary taps in one pass; this also fills the /protocols cache
+            success, summary, stderr, hit = load_summary(filepath, filename, list(SUMMARY_TAPS))
+        elif engine == 'sharkd':
+            try:
+                success, tables, stderr, hit = True, load_sharkd_tables(filepath), None, False
+            except SharkdError as e:
+                success, stderr = False, str(e)
+        else:
+            # Tables of large captures are computed in parallel shards
+            success, tables, stderr, hit = load_summary_tables(filepath, filename)
 
         if not success:
             return jsonify({
@@ -280,12 +731,28 @@ def get_statistics():
                 'details': stderr
             }), 500
 
-        return jsonify({
+        if output_format == 'text':
+            return cache_response(statistics_payload(filename, summary['summary']), hit=False)
+
+        rows = tables['conversations_tcp'] + tables['conversations_udp']
+        valid, rows_out, error = query_rows(rows, CONVERSATION_COLUMNS, data, 'bytes')
+        if not valid:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+
+        return cache_response({
             'success': True,
             'filename': filename,
-            'statistics': stdout
-        }), 200
-
+            'columns': list(CONVERSATION_COLUMNS),
+            'total_rows': len(rows),
+            'row_count': len(rows_out),
+            'conversations': rows_out
+        }, hit=hit)
+
+    except AdmissionRejected as e:
+        return busy_response(e)
     except Exception as e:
         logger.error(f"Error in statistics endpoint: {str(e)}")
         return jsonify({
@@ -302,9 +769,16 @@ def get_protocols():
 
     Request body:
         filename (str): Name of pcap file in evidence directory
+        format (str, optional): 'text' (default), 'tree' for a typed protocol
+            tree, or 'table' for flattened rows
+        With format 'table': protocol, depth, min_frames, min_bytes, sort,
+        order and top select the rows to return (see query_rows)
+        engine (str, optional): 'tshark' (default) or 'sharkd' to answer the
+            tree and table formats from a long-lived session
+        async (bool, optional): Queue the request and return a job_id (202)
 
     Returns:
-        Protocol hierarchy text
+        Protocol hierarchy text, tree or rows
     """
     try:
         # Parse request
@@ -331,14 +805,39 @@ def get_protocols():
                 'error': error
             }), 404
 
-        # Build tshark command for protocol hierarchy
-        command = [
-            'tshark', '-r', filepath, '-q',
-            '-z', 'io,phs'
-        ]
+        if data.get('async'):
+            return submit_analysis_job(request.path, data)
+
+        output_format = data.get('format', 'text')
+        if output_format not in ('text', 'tree', 'table'):
+            return jsonify({
+                'success': False,
+                'error': "format must be 'text', 'tree' or 'table'"
+            }), 400
+
+        engine = data.get('engine', 'tshark')
+        if engine not in ENGINES or (engine == 'sharkd' and output_format == 'text'):
+            return jsonify({
+                'success': False,
+                'error': "engine must be 'tshark', or 'sharkd' with format 'tree' or 'table'"
+            }), 400
 
-        # Execute command
-        success, stdout, stderr = run_tshark_command(command)
+        if output_format == 'text':
+            cached = result_cache.get(filepath, 'protocols', {})
+            if cached is not None:
+                return cache_response(cached, hit=True)
+
+        if output_format == 'text':
+            # Run all summary taps in one pass; this also fills the /statistics cache
+            success, summary, stderr, hit = load_summary(filepath, filename, list(SUMMARY_TAPS))
+        elif engine == 'sharkd':
+            try:
+                success, tables, stderr, hit = True, load_sharkd_tables(filepath), None, False
+            except SharkdError as e:
+                success, stderr = False, str(e)
+        else:
+            # Tables of large captures are computed in parallel shards
+            success, tables, stderr, hit = load_summary_tables(filepath, filename)
 
         if not success:
             return jsonify({
@@ -347,12 +846,36 @@ def get_protocols():
                 'details': stderr
             }), 500
 
-        return jsonify({
+        if output_format == 'text':
+            return cache_response(protocols_payload(filename, summary['summary']), hit=False)
+
+        tree = tables['protocol_hierarchy']
+        if output_format == 'tree':
+            return cache_response({
+                'success': True,
+                'filename': filename,
+                'protocols': tree
+            }, hit=hit)
+
+        rows = flatten_protocol_hierarchy(tree)
+        valid, rows_out, error = query_rows(rows, HIERARCHY_COLUMNS, data, 'frames')
+        if not valid:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+
+        return cache_response({
             'success': True,
             'filename': filename,
-            'protocols': stdout
-        }), 200
-
+            'columns': list(HIERARCHY_COLUMNS),
+            'total_rows': len(rows),
+            'row_count': len(rows_out),
+            'protocols': rows_out
+        }, hit=hit)
+
+    except AdmissionRejected as e:
+        return busy_response(e)
     except Exception as e:
         logger.error(f"Error in protocols endpoint: {str(e)}")
         return jsonify({
@@ -362,50 +885,90 @@ def get_protocols():
         }), 500
 
 
-@app.route('/files', methods=['GET'])
-def list_files():
+@app.route('/summary', methods=['POST'])
+def get_summary():
     """
-    List available pcap files in evidence directory
+    Run several statistics taps over a pcap file in a single tshark pass
+
+    Request body:
+        filename (str): Name of pcap file in evidence directory
+        taps (list, optional): Subset of conversations_tcp, conversations_udp,
+            protocol_hierarchy, endpoints, io_stats, expert (default: all)
+        shards (int, optional): Split the capture into this many shards and
+            analyse them in parallel; returns merged conversation, protocol
+            hierarchy and endpoint tables without tap text
+        async (bool, optional): Queue the request and return a job_id (202)
 
     Returns:
-        Array of file information objects
+        Output text of each requested tap, or merged tables when sharded
     """
     try:
-        files = []
+        # Parse request
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                'success': False,
+                'error': 'Request body required'
+            }), 400
 
-        # Check if evidence directory exists
-        if not os.path.exists(EVIDENCE_DIR):
+        filename = data.get('filename')
+        taps = data.get('taps') or list(SUMMARY_TAPS)
+
+        if not filename:
             return jsonify({
-                'success': True,
-                'files': [],
-                'count': 0
-            }), 200
+                'success': False,
+                'error': 'filename is required'
+            }), 400
+
+        if not isinstance(taps, list) or any(tap not in SUMMARY_TAPS for tap in taps):
+            return jsonify({
+                'success': False,
+                'error': f"taps must be a list drawn from: {', '.join(SUMMARY_TAPS)}"
+            }), 400
+
+        # Validate file path
+        valid, filepath, error = validate_file_path(filename)
+        if not valid:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 404
 
-        # List all files in evidence directory
-        for filename in os.listdir(EVIDENCE_DIR):
-            filepath = os.path.join(EVIDENCE_DIR, filename)
+        shards = data.get('shards')
+        if shards is not None and (not isinstance(shards, int) or isinstance(shards, bool)
+                                   or not 1 <= shards <= MAX_SHARDS):
+            return jsonify({
+                'success': False,
+                'error': f'shards must be an integer between 1 and {MAX_SHARDS}'
+            }), 400
 
-            # Skip directories
-            if not os.path.isfile(filepath):
-                continue
+        if data.get('async'):
+            return submit_analysis_job(request.path, data)
 
-            # Get file stats
-            stat = os.stat(filepath)
+        if shards is not None and shards > 1:
+            success, payload, stderr, hit = load_sharded_summary(filepath, filename, shards)
+            if success and 'shards' in payload:
+                taps = [tap for tap in SHARDED_TAPS if tap in taps]
+                payload = dict(payload, taps=taps,
+                               tables={name: payload['tables'][name] for name in taps})
+        else:
+            # Keep the canonical tap order so equivalent requests share a cache entry
+            taps = [tap for tap in SUMMARY_TAPS if tap in taps]
+            success, payload, stderr, hit = load_summary(filepath, filename, taps)
 
-            files.append({
-                'filename': filename,
-                'size': stat.st_size,
-                'modified': stat.st_mtime
-            })
+        if not success:
+            return jsonify({
+                'success': False,
+                'error': 'Failed to get summary',
+                'details': stderr
+            }), 500
 
-        return jsonify({
-            'success': True,
-            'files': files,
-            'count': len(files)
-        }), 200
+        return cache_response(payload, hit=hit)
 
+    except AdmissionRejected as e:
+        return busy_response(e)
     except Exception as e:
-        logger.error(f"Error listing files: {str(e)}")
+        logger.error(f"Error in summary endpoint: {str(e)}")
         return jsonify({
             'success': False,
             'error': 'Internal server error',
@@ -413,36 +976,1494 @@ def list_files():
         }), 500
 
 
-@app.errorhandler(404)
-def not_found(error):
-    """Handle 404 errors"""
-    return jsonify({
-        'success': False,
-        'error': 'Endpoint not found'
-    }), 404
+@app.route('/metadata', methods=['POST'])
+def get_metadata():
+    """
+    Get basic capture facts without running tshark
 
+    Request body:
+        filename (str): Name of pcap file in evidence directory
 
-@app.errorhandler(500)
-def internal_error(error):
-    """Handle 500 errors"""
-    return jsonify({
-        'success': False,
-        'error': 'Internal server error'
-    }), 500
+    Returns:
+        Format, link types, packet count, byte totals, duration and packet rates
+    """
+    try:
+        # Parse request
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                'success': False,
+                'error': 'Request body required'
+            }), 400
 
+        filename = data.get('filename')
 
-if __name__ == '__main__':
-    logger.info("Starting Wireshark Analysis API")
-    logger.info(f"Evidence directory: {EVIDENCE_DIR}")
-    logger.info(f"Output directory: {OUTPUT_DIR}")
+        if not filename:
+            return jsonify({
+                'success': False,
+                'error': 'filename is required'
+            }), 400
 
-    # Ensure directories exist
-    os.makedirs(EVIDENCE_DIR, exist_ok=True)
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
+        # Validate file path
+        valid, filepath, error = validate_file_path(filename)
+        if not valid:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 404
+
+        cached = result_cache.get(filepath, 'metadata', {})
+        if cached is not None:
+            return cache_response(cached, hit=True)
+
+        try:
+            metadata = read_capture_metadata(filepath)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+
+        payload = {
+            'success': True,
+            'filename': filename,
+            'metadata': metadata
+        }
+        result_cache.put(filepath, 'metadata', {}, payload)
+
+        return cache_response(payload, hit=False)
+
+    except Exception as e:
+        logger.error(f"Error in metadata endpoint: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
 
-    # Run Flask application
-    app.run(
-        host='0.0.0.0',
-        port=5001,
-        debug=False
-    )
+
+@app.route('/query', methods=['POST'])
+def query_frames():
+    """
+    Find the frame numbers matching a display filter
+
+    Simple filters are evaluated on the packet index without tshark; other
+    filters, or captures whose index is still being built, fall back to a
+    tshark pass.
+
+    Request body:
+        filename (str): Name of pcap file in evidence directory
+        filters (str): Display filter (Wireshark syntax)
+        limit (int, optional): Max frame numbers to return (default: 100000)
+
+    Returns:
+        Number of matching frames and the first matching frame numbers
+    """
+    try:
+        # Parse request
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                'success': False,
+                'error': 'Request body required'
+            }), 400
+
+        filename = data.get('filename')
+        filters = (data.get('filters') or '').strip()
+        limit = min(int(data.get('limit', MAX_STREAM_PACKETS)), MAX_STREAM_PACKETS)
+
+        if not filename or not filters:
+            return jsonify({
+                'success': False,
+                'error': 'filename and filters are required'
+            }), 400
+
+        # Validate file path
+        valid, filepath, error = validate_file_path(filename)
+        if not valid:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 404
+
+        matches = plan_filter(filepath, filters)
+        if matches is not None:
+            return jsonify({
+                'success': True,
+                'filename': filename,
+                'filters': filters,
+                'indexed': True,
+                'match_count': int(len(matches)),
+                'frame_numbers': matches[:limit].tolist()
+            }), 200
+
+        cached = result_cache.get(filepath, 'query', {'filters': filters})
+        if cached is None:
+            command = ['tshark', '-r', filepath, '-T', 'fields', '-e', 'frame.number', '-Y', filters]
+            success, stdout, stderr = run_tshark_command(command)
+            if not success:
+                return jsonify({
+                    'success': False,
+                    'error': 'Failed to evaluate filter',
+                    'details': stderr
+                }), 500
+
+            numbers = [int(line) for line in (stdout or '').split() if line.isdigit()]
+            cached = {
+                'success': True,
+                'filename': filename,
+                'filters': filters,
+                'indexed': False,
+                'match_count': len(numbers),
+                'frame_numbers': numbers
+            }
+            result_cache.put(filepath, 'query', {'filters': filters}, cached)
+
+        return jsonify(dict(cached, frame_numbers=cached['frame_numbers'][:limit])), 200
+
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error in query endpoint: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
+
+@app.route('/io-graph', methods=['POST'])
+def get_io_graph():
+    """
+    Get packets and bytes per time interval (I/O graph)
+
+    Series are binned in-process from the capture's cached timestamp and
+    length columns, so zooming into a time range re-bins without re-reading
+    the capture.
+
+    Request body:
+        filename (str): Name of pcap file in evidence directory
+        interval (float, optional): Bucket width in seconds (default: 1)
+        start (float, optional): Relative start time in seconds (default: 0)
+        end (float, optional): Relative end time in seconds (default: capture end)
+        group_by (str, optional): 'protocol' or 'conversation'
+        top (int, optional): Groups to report separately (default: 10)
+
+    Returns:
+        Packet and byte counts per bucket, overall and per group
+    """
+    try:
+        # Parse request
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                'success': False,
+                'error': 'Request body required'
+            }), 400
+
+        filename = data.get('filename')
+        group_by = data.get('group_by')
+        interval = float(data.get('interval', 1))
+        top = int(data.get('top', 10))
+
+        if not filename:
+            return jsonify({
+                'success': False,
+                'error': 'filename is required'
+            }), 400
+
+        if group_by not in (None, 'protocol', 'conversation'):
+            return jsonify({
+                'success': False,
+                'error': "group_by must be 'protocol' or 'conversation'"
+            }), 400
+
+        if np is None:
+            return jsonify({
+                'success': False,
+                'error': 'I/O graphs require NumPy'
+            }), 501
+
+        # Validate file path
+        valid, filepath, error = validate_file_path(filename)
+        if not valid:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 404
+
+        success, frame_index, error = load_frame_index(filepath)
+        if not success:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+
+        columns = None
+        if group_by:
+            packet_index = load_packet_index(filepath)
+            if packet_index is None:
+                response = jsonify({
+                    'success': False,
+                    'error': 'Packet index is being built, retry shortly'
+                })
+                response.headers['Retry-After'] = '5'
+                return response, 503
+            columns = packet_index.columns
+            timestamps = columns['timestamp']
+            lengths = columns['length']
+        else:
+            timestamps = np.frombuffer(frame_index.timestamps, dtype=np.float64)
+            lengths = np.frombuffer(frame_index.lengths, dtype=np.uint32)
+
+        relative = timestamps - (timestamps[0] if len(timestamps) else 0.0)
+        duration = float(relative.max()) if len(relative) else 0.0
+        start = float(data.get('start', 0))
+        end = float(data.get('end', max(duration, interval)))
+
+        if interval <= 0 or end <= start:
+            return jsonify({
+                'success': False,
+                'error': 'interval must be positive and end must be after start'
+            }), 400
+
+        if (end - start) / interval > MAX_IO_BUCKETS:
+            return jsonify({
+                'success': False,
+                'error': f'Too many buckets; use an interval of at least {(end - start) / MAX_IO_BUCKETS:g} seconds'
+            }), 400
+
+        selection = np.flatnonzero((relative >= start) & (relative <= end))
+        labels = names = None
+        if group_by == 'protocol':
+            labels, names = protocol_labels(columns, selection)
+        elif group_by == 'conversation':
+            labels, names = conversation_labels(columns, selection)
+
+        graph = compute_io_graph(relative[selection], lengths[selection], start, end,
+                                 interval, labels, names, top)
+
+        return jsonify(dict(graph, **{
+            'success': True,
+            'filename': filename,
+            'interval': interval,
+            'start': start,
+            'end': end,
+            'duration': duration,
+            'group_by': group_by
+        })), 200
+
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'interval, start, end and top must be numbers'
+        }), 400
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error in io-graph endpoint: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
+
+@app.route('/packets', methods=['POST'])
+def get_packets():
+    """
+    Page through the packets of a pcap file using a frame cursor
+
+    In the default window context pages are carved out with the frame index
+    and dissected on their own, so any page costs about the same regardless
+    of where it sits in the capture, but stream numbers, TCP analysis and
+    reassembly only see the frames of the page. The capture context reads
+    the original file up to the page, so those match a full dissection at a
+    cost that grows with the cursor.
+
+    Request body:
+        filename (str): Name of pcap file in evidence directory
+        cursor (int, optional): Frame number to start from (default: 1)
+        page_size (int, optional): Packets per page (default: 100, max: 1000)
+        filters (str, optional): Display filter; in the window context simple
+            filters are answered from the packet index (503 while it is being
+            built), others are applied within scanned windows
+        context (str, optional): 'window' (default) or 'capture'
+
+    Returns:
+        Packets of the page and the cursor of the next page (null at the end)
+    """
+    try:
+        # Parse request
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                'success': False,
+                'error': 'Request body required'
+            }), 400
+
+        filename = data.get('filename')
+        filters = data.get('filters')
+        filters = '' if filters is None else filters
+        cursor = int(data.get('cursor') or 1)
+        page_size = min(int(data.get('page_size', PAGE_SIZE)), MAX_PACKETS)
+        context = data.get('context') or 'window'
+
+        if not filename:
+            return jsonify({
+                'success': False,
+                'error': 'filename is required'
+            }), 400
+
+        if cursor < 1 or page_size < 1:
+            return jsonify({
+                'success': False,
+                'error': 'cursor and page_size must be positive'
+            }), 400
+
+        if not isinstance(filters, str):
+            return jsonify({
+                'success': False,
+                'error': 'filters must be a string'
+            }), 400
+
+        if context not in ('window', 'capture'):
+            return jsonify({
+                'success': False,
+                'error': "context must be 'window' or 'capture'"
+            }), 400
+
+        # Validate file path
+        valid, filepath, error = validate_file_path(filename)
+        if not valid:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 404
+
+        params = {'cursor': cursor, 'page_size': page_size, 'filters': filters.strip(), 'context': context}
+        cached = result_cache.get(filepath, 'packets', params)
+        if cached is not None:
+            return cache_response(cached, hit=True)
+
+        success, index, error = load_frame_index(filepath)
+        if not success:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+
+        total = len(index)
+        packets = []
+        position = cursor
+
+        if context == 'capture':
+            # tshark stops after the page's last match, so every later page reads further into the file
+            success, packets, stderr = dissect_matches(filepath, filters, page_size, first=cursor)
+            if success and len(packets) == page_size:
+                position = int(packets[-1]['_source']['layers']['frame']['frame.number']) + 1
+            else:
+                position = total + 1
+        elif not filters:
+            numbers = list(range(cursor, min(cursor + page_size, total + 1)))
+            success, packets, stderr = dissect_frames(filepath, index, numbers)
+            position = cursor + len(numbers)
+        elif filter_supported(filters):
+            # Supported filters always go through the packet index so a page does not change
+            # once the index is ready; only the frames of the page are carved and dissected
+            matches = plan_filter(filepath, filters)
+            if matches is None:
+                response = jsonify({'success': False, 'error': 'Packet index is being built, retry shortly'})
+                response.headers['Retry-After'] = '5'
+                return response, 503
+            start = int(np.searchsorted(matches, cursor))
+            numbers = matches[start:start + page_size].tolist()
+            success, packets, stderr = dissect_frames(filepath, index, numbers)
+            position = numbers[-1] + 1 if start + page_size < len(matches) else total + 1
+        else:
+            # Scan windows of frames until the page is full or the scan budget is spent
+            window = page_size * 10
+            scanned = 0
+            success, stderr = True, None
+            while position <= total and len(packets) < page_size and scanned < MAX_SCAN_FRAMES:
+                numbers = list(range(position, min(position + window, total + 1)))
+                success, matched, stderr = dissect_frames(filepath, index, numbers, filters)
+                if not success:
+                    break
+
+                needed = page_size - len(packets)
+                if len(matched) > needed:
+                    matched = matched[:needed]
+                    last = matched[-1]['_source']['layers']['frame']['frame.number']
+                    position = int(last) + 1
+                else:
+                    position = numbers[-1] + 1
+                packets.extend(matched)
+                scanned += len(numbers)
+
+        if not success:
+            return jsonify({
+                'success': False,
+                'error': 'Failed to dissect packets',
+                'details': stderr
+            }), 500
+
+        payload = {
+            'success': True,
+            'filename': filename,
+            'filters': filters,
+            'cursor': cursor,
+            'context': context,
+            'next_cursor': position if position <= total else None,
+            'total_frames': total,
+            'packet_count': len(packets),
+            'packets': packets
+        }
+        result_cache.put(filepath, 'packets', params, payload)
+
+        return cache_response(payload, hit=False)
+
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'cursor and page_size must be integers'
+        }), 400
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error in packets endpoint: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
+
+@app.route('/packet/<int:number>', methods=['GET'])
+def get_packet(number):
+    """
+    Dissect a single frame of a pcap file
+
+    Args:
+        number (int): 1-based frame number
+
+    Query parameters:
+        filename (str): Name of pcap file in evidence directory
+
+    Returns:
+        Full dissection and raw bytes of the frame with its offset and timestamp
+    """
+    try:
+        filename = request.args.get('filename')
+
+        if not filename:
+            return jsonify({
+                'success': False,
+                'error': 'filename is required'
+            }), 400
+
+        # Validate file path
+        valid, filepath, error = validate_file_path(filename)
+        if not valid:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 404
+
+        cached = result_cache.get(filepath, 'packet', {'number': number})
+        if cached is not None:
+            return cache_response(cached, hit=True)
+
+        success, index, error = load_frame_index(filepath)
+        if not success:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 400
+
+        if number < 1 or number > len(index):
+            return jsonify({
+                'success': False,
+                'error': f'Frame {number} not found (capture has {len(index)} frames)'
+            }), 404
+
+        success, packets, stderr = dissect_frames(filepath, index, [number], hex_dump=True)
+        if not success:
+            return jsonify({
+                'success': False,
+                'error': 'Failed to dissect packet',
+                'details': stderr
+            }), 500
+
+        payload = dict(index.frame_info(number), **{
+            'success': True,
+            'filename': filename,
+            'packet': packets[0] if packets else None
+        })
+        result_cache.put(filepath, 'packet', {'number': number}, payload)
+
+        return cache_response(payload, hit=False)
+
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error in packet endpoint: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
+
+@app.route('/session', methods=['POST'])
+def query_session():
+    """
+    Query a capture through a long-lived sharkd session
+
+    The first request for a capture loads it into a sharkd process; later
+    requests reuse the loaded capture, so repeated frame, filter, tap and
+    follow queries skip tshark's startup and the re-read of the file.
+
+    Request body:
+        filename (str): Name of pcap file in evidence directory
+        method (str): sharkd method: status, frames, frame, tap, follow,
+            check, complete or intervals
+        params (dict, optional): Method parameters as documented by sharkd,
+            e.g. {"filter": "dns", "skip": 0, "limit": 100} for frames,
+            {"frame": 5, "proto": true} for frame, {"tap0": "conv:TCP"} for
+            tap, or {"follow": "TCP", "filter": "tcp.stream eq 0"} for follow
+
+    Returns:
+        The sharkd result for the request
+    """
+    try:
+        # Parse request
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                'success': False,
+                'error': 'Request body required'
+            }), 400
+
+        filename = data.get('filename')
+        method = data.get('method')
+        params = data.get('params') or {}
+
+        if not filename:
+            return jsonify({
+                'success': False,
+                'error': 'filename is required'
+            }), 400
+
+        if method not in SHARKD_METHODS:
+            return jsonify({
+                'success': False,
+                'error': f"method must be one of: {', '.join(SHARKD_METHODS)}"
+            }), 400
+
+        if not isinstance(params, dict) or \
+                not all(isinstance(value, (str, int, float, bool)) for value in params.values()):
+            return jsonify({
+                'success': False,
+                'error': 'params must be an object of scalar values'
+            }), 400
+
+        # Validate file path
+        valid, filepath, error = validate_file_path(filename)
+        if not valid:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 404
+
+        started = time.monotonic()
+        try:
+            result = sharkd_pool.query(filepath, method, params)
+        except SharkdError as e:
+            return jsonify({
+                'success': False,
+                'error': f'sharkd {method} failed',
+                'details': str(e)
+            }), 500
+
+        return jsonify({
+            'success': True,
+            'filename': filename,
+            'method': method,
+            'elapsed_seconds': round(time.monotonic() - started, 3),
+            'result': result
+        }), 200
+
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error in session endpoint: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
+
+@app.route('/export', methods=['POST'])
+def export_filtered():
+    """
+    Save the packets matching a display filter as a capture file
+
+    Request body:
+        filename (str): Name of pcap file in evidence directory
+        filters (str, optional): Display filter (default: every packet)
+        format (str, optional): 'pcapng' (default) or 'pcap'
+        async (bool, optional): Queue the request and return a job_id (202)
+
+    Returns:
+        Export name, size and download URL (see /exports/<name>)
+    """
+    try:
+        # Parse request
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                'success': False,
+                'error': 'Request body required'
+            }), 400
+
+        filename = data.get('filename')
+        filters = data.get('filters', '')
+        export_format = data.get('format', 'pcapng')
+
+        if not filename:
+            return jsonify({
+                'success': False,
+                'error': 'filename is required'
+            }), 400
+
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({
+                'success': False,
+                'error': "format must be 'pcap' or 'pcapng'"
+            }), 400
+
+        if not isinstance(filters, str):
+            return jsonify({
+                'success': False,
+                'error': 'filters must be a string'
+            }), 400
+
+        # Validate file path
+        valid, filepath, error = validate_file_path(filename)
+        if not valid:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 404
+
+        if data.get('async'):
+            return submit_analysis_job(request.path, data)
+
+        success, export_name, stderr, reused = export_capture(filepath, filters, export_format)
+        if not success:
+            return jsonify({
+                'success': False,
+                'error': 'Failed to export packets',
+                'details': stderr
+            }), 500
+
+        return jsonify({
+            'success': True,
+            'filename': filename,
+            'filters': filters,
+            'format': export_format,
+            'export': export_name,
+            'size': os.path.getsize(os.path.join(EXPORT_DIR, export_name)),
+            'reused': reused,
+            'download_url': f"/exports/{export_name}?name={Path(filename).stem}-export.{export_format}"
+        }), 200
+
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error in export endpoint: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
+
+@app.route('/exports/<export_name>', methods=['GET'])
+def download_export(export_name):
+    """
+    Download an exported capture
+
+    Served straight from disk with conditional requests and HTTP Range
+    support. Under the ASGI front end, whole-file downloads are handed to
+    the server by path (http.response.pathsend) when it supports that, and
+    are otherwise sent in ASGI_FILE_CHUNK reads.
+
+    Args:
+        export_name (str): Name returned by /export
+
+    Query parameters:
+        name (str, optional): File name to offer in Content-Disposition
+    """
+    if not EXPORT_NAME_PATTERN.match(export_name):
+        return jsonify({
+            'success': False,
+            'error': 'Invalid export name'
+        }), 400
+
+    export_path = os.path.join(EXPORT_DIR, export_name)
+    if not os.path.isfile(export_path):
+        return jsonify({
+            'success': False,
+            'error': f'Export not found: {export_name}'
+        }), 404
+
+    download_name = os.path.basename(request.args.get('name') or export_name)
+    return send_file(export_path, mimetype='application/vnd.tcpdump.pcap', as_attachment=True,
+                     download_name=download_name, conditional=True, max_age=0)
+
+
+@app.route('/objects', methods=['POST'])
+def list_objects():
+    """
+    Extract the files transferred in a capture and list them
+
+    HTTP, SMB, TFTP and IMF objects are exported in one pass the first time
+    a capture's content is seen and kept in a content-addressed store;
+    later listings and downloads are served from the store.
+
+    Request body:
+        filename (str): Name of pcap file in evidence directory
+        protocol (str, optional): Only list objects of this protocol
+            (http, smb, tftp, imf)
+        limit (int, optional): Maximum objects to return (default: all)
+        offset (int, optional): Objects to skip (default: 0)
+        async (bool, optional): Queue the request and return a job_id (202)
+
+    Returns:
+        Objects with protocol, name, source frame, SHA-256, size, MIME type
+        and download URL (see /objects/<sha256>)
+    """
+    try:
+        # Parse request
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                'success': False,
+                'error': 'Request body required'
+            }), 400
+
+        filename = data.get('filename')
+        protocol = data.get('protocol')
+
+        if not filename:
+            return jsonify({
+                'success': False,
+                'error': 'filename is required'
+            }), 400
+
+        if protocol is not None and protocol not in OBJECT_PROTOCOLS:
+            return jsonify({
+                'success': False,
+                'error': f"protocol must be one of: {', '.join(OBJECT_PROTOCOLS)}"
+            }), 400
+
+        try:
+            limit = None if data.get('limit') is None else int(data['limit'])
+            offset = int(data.get('offset', 0))
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'error': 'limit and offset must be integers'
+            }), 400
+        if offset < 0 or (limit is not None and limit < 0):
+            return jsonify({
+                'success': False,
+                'error': 'limit and offset must be non-negative'
+            }), 400
+
+        # Validate file path
+        valid, filepath, error = validate_file_path(filename)
+        if not valid:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 404
+
+        if data.get('async'):
+            # Hashing an unseen capture reads all of it, so that happens in the job too
+            capture_hash = known_capture_sha256(filepath)
+            if capture_hash is None or not object_store.is_extracted(capture_hash):
+                return submit_analysis_job(request.path, data)
+
+        capture_hash = capture_sha256(filepath)
+        reused = object_store.is_extracted(capture_hash)
+        if not reused:
+            success, error = object_store.extract(filepath, filename, capture_hash)
+            if not success:
+                return jsonify({
+                    'success': False,
+                    'error': 'Failed to export objects',
+                    'details': error
+                }), 500
+
+        objects, total = object_store.list(capture_hash, protocol, limit, offset)
+        for item in objects:
+            item['download_url'] = f"/objects/{item['sha256']}?{urlencode({'name': item['name']})}"
+
+        return jsonify({
+            'success': True,
+            'filename': filename,
+            'capture_sha256': capture_hash,
+            'reused': reused,
+            'total': total,
+            'offset': offset,
+            'objects': objects
+        }), 200
+
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error in objects endpoint: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
+
+@app.route('/objects/<sha256>', methods=['GET'])
+def download_object(sha256):
+    """
+    Download an exported object from the object store
+
+    Served straight from disk with conditional requests and HTTP Range support.
+
+    Args:
+        sha256 (str): Object hash returned by /objects
+
+    Query parameters:
+        name (str, optional): File name to offer in Content-Disposition
+    """
+    if not OBJECT_HASH_PATTERN.match(sha256):
+        return jsonify({
+            'success': False,
+            'error': 'Invalid object hash'
+        }), 400
+
+    stored = object_store.get(sha256)
+    object_path = object_store.object_path(sha256)
+    if stored is None or not os.path.isfile(object_path):
+        return jsonify({
+            'success': False,
+            'error': f'Object not found: {sha256}'
+        }), 404
+
+    download_name = os.path.basename(request.args.get('name') or sha256)
+    return send_file(object_path, mimetype=stored['mime_type'], as_attachment=True,
+                     download_name=download_name, conditional=True, max_age=0)
+
+
+@app.route('/evidence/<path:filename>', methods=['GET'])
+def download_evidence(filename):
+    """
+    Download an original capture from the evidence directory
+
+    Served straight from disk with conditional requests and HTTP Range support.
+
+    Args:
+        filename (str): Name of pcap file in evidence directory
+    """
+    valid, filepath, error = validate_file_path(filename)
+    if not valid:
+        return jsonify({
+            'success': False,
+            'error': error
+        }), 404
+
+    return send_file(filepath, mimetype='application/vnd.tcpdump.pcap', as_attachment=True,
+                     download_name=os.path.basename(filename), conditional=True, max_age=0)
+
+
+@app.route('/follow', methods=['POST'])
+def follow_stream():
+    """
+    Follow a TCP or UDP stream, or list the streams of a capture
+
+    All streams are reassembled in one pass on first use and kept on disk,
+    so following any stream afterwards reads only its bytes.
+
+    Request body:
+        filename (str): Name of pcap file in evidence directory
+        protocol (str, optional): 'tcp' (default) or 'udp'
+        stream (int, optional): Stream index (tcp.stream / udp.stream);
+            without it the streams of the protocol are listed
+        encoding (str, optional): 'ascii' (default), 'hex' or 'raw' (base64)
+        offset (int, optional): Byte offset in the stream (default: 0)
+        length (int, optional): Bytes to return (default: 65536, max: 1 MiB)
+        async (bool, optional): Queue the request and return a job_id (202)
+
+    Returns:
+        Stream endpoints and the requested bytes as segments tagged with
+        direction and frame, or the list of streams
+    """
+    try:
+        # Parse request
+        data = request.get_json()
+        if not data:
+            return jsonify({
+                'success': False,
+                'error': 'Request body required'
+            }), 400
+
+        filename = data.get('filename')
+        protocol = data.get('protocol', 'tcp')
+        encoding = data.get('encoding', 'ascii')
+
+        if not filename:
+            return jsonify({
+                'success': False,
+                'error': 'filename is required'
+            }), 400
+
+        if protocol not in ('tcp', 'udp'):
+            return jsonify({
+                'success': False,
+                'error': "protocol must be 'tcp' or 'udp'"
+            }), 400
+
+        if encoding not in FOLLOW_ENCODINGS:
+            return jsonify({
+                'success': False,
+                'error': f"encoding must be one of: {', '.join(FOLLOW_ENCODINGS)}"
+            }), 400
+
+        try:
+            stream_id = None if data.get('stream') is None else int(data['stream'])
+            offset = int(data.get('offset', 0))
+            length = min(int(data.get('length', FOLLOW_PAGE_BYTES)), MAX_FOLLOW_PAGE_BYTES)
+        except (TypeError, ValueError):
+            return jsonify({
+                'success': False,
+                'error': 'stream, offset and length must be integers'
+            }), 400
+        if offset < 0 or length < 1:
+            return jsonify({
+                'success': False,
+                'error': 'offset must be non-negative and length positive'
+            }), 400
+
+        # Validate file path
+        valid, filepath, error = validate_file_path(filename)
+        if not valid:
+            return jsonify({
+                'success': False,
+                'error': error
+            }), 404
+
+        if data.get('async'):
+            return submit_analysis_job(request.path, data)
+
+        success, store, error = load_stream_store(filepath)
+        if not success:
+            return jsonify({
+                'success': False,
+                'error': 'Failed to reassemble streams',
+                'details': error
+            }), 500
+
+        if stream_id is None:
+            streams = [{key: value for key, value in stream.items() if key != 'first_segment'}
+                       for stream in store.streams.values() if stream['protocol'] == protocol]
+            return jsonify({
+                'success': True,
+                'filename': filename,
+                'protocol': protocol,
+                'stream_count': len(streams),
+                'streams': streams
+            }), 200
+
+        key = f"{protocol}:{stream_id}"
+        if key not in store.streams:
+            return jsonify({
+                'success': False,
+                'error': f'{protocol.upper()} stream {stream_id} not found or has no payload'
+            }), 404
+
+        stream = store.streams[key]
+        total = stream['client_bytes'] + stream['server_bytes']
+        segments = [
+            {
+                'direction': 'client' if direction == 0 else 'server',
+                'frame': frame,
+                'offset': start,
+                'length': len(chunk),
+                'data': encode_payload(chunk, encoding)
+            }
+            for direction, frame, start, chunk in store.read(key, offset, length)
+        ]
+        end = segments[-1]['offset'] + segments[-1]['length'] if segments else offset
+
+        return jsonify({
+            'success': True,
+            'filename': filename,
+            'stream': {key: value for key, value in stream.items() if key != 'first_segment'},
+            'encoding': encoding,
+            'offset': offset,
+            'total_bytes': total,
+            'next_offset': end if end < total else None,
+            'segments': segments
+        }), 200
+
+    except AdmissionRejected as e:
+        return busy_response(e)
+    except Exception as e:
+        logger.error(f"Error in follow endpoint: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
+
+@app.route('/search', methods=['GET'])
+def search_evidence():
+    """
+    Search every capture in the evidence directory for an indicator or string
+
+    Answers from the search index, which the evidence watcher fills as
+    captures are added; captures still being indexed are not included.
+    String searches of captures larger than SEARCH_GRAM_MAX_BYTES (512MB by
+    default) are not n-gram indexed and scan every frame on each query.
+
+    Query parameters:
+        q (str): Value to look for
+        kind (str, optional): dns, http_host, http_uri, user_agent, sni, ip,
+            string (payload bytes), or any (default: indicators, plus payload
+            bytes for queries of 3 or more characters)
+        match (str, optional): 'exact' (default) or 'prefix' for indicators
+        limit (int, optional): Frame numbers returned per match (default and
+            maximum: MAX_SEARCH_FRAMES)
+
+    Returns:
+        Matching captures with the indicators or strings found and their frames
+    """
+    try:
+        query = request.args.get('q', '')
+        kind = request.args.get('kind', 'any')
+        match = request.args.get('match', 'exact')
+
+        if not query.strip():
+            return jsonify({
+                'success': False,
+                'error': 'q is required'
+            }), 400
+
+        kinds = list(SEARCH_FIELDS) + ['string', 'any']
+        if kind not in kinds:
+            return jsonify({
+                'success': False,
+                'error': f"kind must be one of: {', '.join(kinds)}"
+            }), 400
+
+        if match not in ('exact', 'prefix'):
+            return jsonify({
+                'success': False,
+                'error': "match must be 'exact' or 'prefix'"
+            }), 400
+
+        if kind == 'string' and len(query.encode('utf-8')) < 3:
+            return jsonify({
+                'success': False,
+                'error': 'string searches need at least 3 characters'
+            }), 400
+
+        try:
+            limit = min(int(request.args.get('limit', MAX_SEARCH_FRAMES)), MAX_SEARCH_FRAMES)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'limit must be an integer'
+            }), 400
+
+        evidence_watcher.start()
+        started = time.monotonic()
+        files = OrderedDict()
+
+        def add(filename, match_kind, term, frames):
+            files.setdefault(filename, []).append({
+                'kind': match_kind,
+                'term': term,
+                'frame_count': len(frames),
+                'frames': list(frames[:max(limit, 0)])
+            })
+
+        if kind != 'string':
+            for filename, match_kind, term, frames in search_index.search_terms(
+                    query, None if kind == 'any' else kind, prefix=(match == 'prefix')):
+                add(filename, match_kind, term, frames)
+        if kind == 'string' or (kind == 'any' and len(query.encode('utf-8')) >= 3):
+            for filename, frames in search_index.search_string(query):
+                add(filename, 'string', query, frames)
+
+        return jsonify({
+            'success': True,
+            'query': query,
+            'kind': kind,
+            'match': match,
+            'file_count': len(files),
+            'results': [{'filename': filename, 'matches': matches} for filename, matches in files.items()],
+            'elapsed_ms': round((time.monotonic() - started) * 1000, 2)
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error in search endpoint: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
+
+@app.route('/files', methods=['GET'])
+def list_files():
+    """
+    List available pcap files in evidence directory
+
+    Answers from the evidence catalog, which the background watcher keeps
+    in sync with the directory.
+
+    Query parameters:
+        sort (str, optional): filename (default), size, modified,
+            packet_count, duration or first_timestamp
+        order (str, optional): 'asc' (default) or 'desc'
+        limit (int, optional): Files per page (default: PAGE_SIZE when
+            offset is given, otherwise every file)
+        offset (int, optional): Files to skip (default: 0)
+
+    Returns:
+        Array of file information objects with catalogued capture facts
+    """
+    try:
+        # Check if evidence directory exists
+        if not os.path.exists(EVIDENCE_DIR):
+            return jsonify({
+                'success': True,
+                'files': [],
+                'count': 0,
+                'total': 0
+            }), 200
+
+        sort = request.args.get('sort', 'filename')
+        order = request.args.get('order', 'asc')
+        if sort not in CATALOG_SORT_COLUMNS:
+            return jsonify({
+                'success': False,
+                'error': f"sort must be one of: {', '.join(CATALOG_SORT_COLUMNS)}"
+            }), 400
+        if order not in ('asc', 'desc'):
+            return jsonify({
+                'success': False,
+                'error': "order must be 'asc' or 'desc'"
+            }), 400
+
+        # Without paging parameters every file is listed, as before paging was added
+        paged = 'limit' in request.args or 'offset' in request.args
+        try:
+            limit = int(request.args.get('limit', PAGE_SIZE)) if paged else None
+            offset = int(request.args.get('offset', 0))
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'error': 'limit and offset must be integers'
+            }), 400
+        if (limit is not None and limit < 1) or offset < 0:
+            return jsonify({
+                'success': False,
+                'error': 'limit must be positive and offset non-negative'
+            }), 400
+
+        evidence_watcher.start()
+        files, total = evidence_catalog.page(sort, order, limit, offset)
+
+        return jsonify({
+            'success': True,
+            'files': files,
+            'count': len(files),
+            'total': total,
+            'offset': offset,
+            'next_offset': offset + len(files) if offset + len(files) < total else None
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error listing files: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
+
+@app.route('/job-status/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """
+    Get status and result of an async analysis job
+
+    Args:
+        job_id (str): Job ID to query
+
+    Query parameters:
+        wait (int, optional): Seconds to wait for the job to finish before
+            answering (long-poll, max: 60)
+
+    Returns:
+        Job status, and the endpoint's response body once finished
+    """
+    try:
+        with analysis_job_lock:
+            job = analysis_jobs.get(job_id)
+
+        if not job:
+            return jsonify({
+                'success': False,
+                'error': 'Job not found'
+            }), 404
+
+        wait = min(float(request.args.get('wait', 0)), MAX_LONG_POLL)
+        if wait > 0:
+            job.finished.wait(wait)
+
+        return jsonify({
+            'success': True,
+            'job': job.to_dict()
+        }), 200
+
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'wait must be a number'
+        }), 400
+    except Exception as e:
+        logger.error(f"Error getting job status: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """
+    List async analysis jobs and worker pool queue statistics
+
+    Returns:
+        Array of jobs without their results, plus queue depth and wait times
+    """
+    try:
+        with analysis_job_lock:
+            jobs = [dict(job.to_dict(), result=None) for job in analysis_jobs.values()]
+
+        return jsonify({
+            'success': True,
+            'jobs': jobs,
+            'count': len(jobs),
+            'queue': analysis_queue_stats()
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error listing jobs: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error',
+            'details': str(e)
+        }), 500
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Report internal counters used to size and monitor the service
+
+    Returns:
+        Result cache, async job queue, tshark admission, sharkd session and
+        search index statistics, and how the evidence watcher follows the
+        directory
+    """
+    return jsonify({
+        'success': True,
+        'cache': result_cache.stats(),
+        'jobs': analysis_queue_stats(),
+        'admission': tshark_admission.stats(),
+        'sharkd': sharkd_pool.stats(),
+        'search_index': search_index.stats(),
+        'object_store': object_store.stats(),
+        'watcher': evidence_watcher.mode
+    }), 200
+
+
+@app.errorhandler(404)
+def not_found(error):
+    """Handle 404 errors"""
+    return jsonify({
+        'success': False,
+        'error': 'Endpoint not found'
+    }), 404
+
+
+@app.errorhandler(500)
+def internal_error(error):
+    """Handle 500 errors"""
+    return jsonify({
+        'success': False,
+        'error': 'Internal server error'
+    }), 500
+
+
+asgi_app = AsgiServer(app, ASGI_THREADS, on_startup=evidence_watcher.start)
+
+
+@asgi_app.route('POST', '/analyze')
+async def analyze_stream_async(request, receive, send):
+    """
+    Stream /analyze NDJSON output from an asyncio tshark subprocess
+
+    Only valid streaming requests are handled here; everything else is
+    served by analyze_pcap().
+    """
+    args = streaming_analyze_args(request.get_json(), request.headers.get('accept', ''))
+    if args is None:
+        return False
+    filepath, filters, limit, fields = args
+    command = stream_packets_command(filepath, filters, limit, fields)
+
+    loop = asyncio.get_running_loop()
+    try:
+        # Waiting for a slot is the only step that needs a thread
+        await loop.run_in_executor(None, tshark_admission.acquire, request.client, True)
+    except AdmissionRejected as e:
+        await asgi_app.send_json(request, send, {
+            'success': False,
+            'error': str(e),
+            'retry_after': e.retry_after
+        }, 429, {'Retry-After': e.retry_after})
+        return True
+
+    started = time.monotonic()
+    deadline = started + STREAM_TIMEOUT
+    stderr_file = tempfile.TemporaryFile()
+    process = None
+    watcher = None
+    try:
+        logger.info(f"Streaming command: {' '.join(command)}")
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=stderr_file, limit=STREAM_READ_LIMIT)
+
+        async def kill_on_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            if process.returncode is None:
+                process.kill()
+
+        watcher = asyncio.ensure_future(kill_on_disconnect())
+
+        first = await asyncio.wait_for(process.stdout.readline(), deadline - time.monotonic())
+        if not first and await process.wait() != 0:
+            logger.error(f"Command failed with return code {process.returncode}")
+            stderr_file.seek(0)
+            await asgi_app.send_json(request, send, {
+                'success': False,
+                'error': 'Failed to analyze pcap',
+                'details': stderr_file.read().decode('utf-8', errors='replace')
+            }, 500)
+            return True
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': asgi_response_headers(request, 'application/x-ndjson', {
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'
+            })
+        })
+        line = first
+        try:
+            while line:
+                # Skip the bulk-index lines that -T ek emits before each packet
+                if not line.startswith(b'{"index"'):
+                    await send({'type': 'http.response.body', 'body': line, 'more_body': True})
+                line = await asyncio.wait_for(process.stdout.readline(), deadline - time.monotonic())
+        except asyncio.TimeoutError:
+            logger.error(f"Streaming command timed out after {STREAM_TIMEOUT} seconds")
+        await send({'type': 'http.response.body', 'body': b''})
+        return True
+
+    except asyncio.TimeoutError:
+        await asgi_app.send_json(request, send, {
+            'success': False,
+            'error': 'Failed to analyze pcap',
+            'details': f'Command timed out after {STREAM_TIMEOUT} seconds'
+        }, 500)
+        return True
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+        if process is not None and process.returncode is None:
+            process.kill()
+            await process.wait()
+        stderr_file.close()
+        tshark_admission.release(time.monotonic() - started)
+
+
+@asgi_app.route('GET', '/job-status/(?P<job_id>[^/]+)')
+async def job_status_long_poll(request, receive, send, job_id):
+    """
+    Wait for an async analysis job without holding a thread
+
+    The wait happens here; the status itself is then answered by
+    get_job_status() without the wait parameter.
+    """
+    try:
+        wait = min(float(request.args.get('wait', 0)), MAX_LONG_POLL)
+    except ValueError:
+        return False
+    with analysis_job_lock:
+        job = analysis_jobs.get(job_id)
+    if job is None or wait <= 0:
+        return False
+
+    await job.wait_async(wait)
+
+    args = {key: value for key, value in request.args.items() if key != 'wait'}
+    request.scope = dict(request.scope, query_string=urlencode(args).encode('latin-1'))
+    return False
+
+
+if __name__ == '__main__':
+    logger.info("Starting Wireshark Analysis API")
+    logger.info(f"Evidence directory: {EVIDENCE_DIR}")
+    logger.info(f"Output directory: {OUTPUT_DIR}")
+
+    # Ensure directories exist
+    os.makedirs(EVIDENCE_DIR, exist_ok=True)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    os.makedirs(OBJECT_DIR, exist_ok=True)
+
+    if SERVER_MODE == 'asgi':
+        # Serve through the ASGI front end; background services start on lifespan startup
+        import uvicorn
+        uvicorn.run(asgi_app, host='0.0.0.0', port=5001, log_level='info')
+    else:
+        # Catalogue evidence and pre-warm caches in the background
+        evidence_watcher.start()
+
+        # Run Flask application
+        app.run(
+            host='0.0.0.0',
+            port=5001,
+            debug=False
+        )